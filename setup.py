@@ -38,10 +38,20 @@ setup(
     install_requires=[
         'setuptools',
     ],
+    entry_points={
+        'console_scripts': [
+            'spinchimp = spinchimp.cli:main',
+        ],
+    },
     extras_require={
+        # list libs needed for the asyncio client (spinchimp.aio)
+        'async': [
+            'trollius',
+        ],
         # list libs needed for unittesting this project
         'test': [
             'mock',
+            'trollius',
             'unittest2',
         ],
         # list libs needed for releasing this project
@@ -1,10 +1,25 @@
 # -*- coding: utf-8 -*-
 
-import re
+import threading
+import time
 import urllib
-import urllib2
 
+from spinchimp import bulk
+from spinchimp import cache
+from spinchimp import chunking
+from spinchimp import density
+from spinchimp import errors
 from spinchimp import exceptions as ex
+from spinchimp import metrics
+from spinchimp import protect
+from spinchimp import schema
+from spinchimp import spintax
+from spinchimp import stream
+from spinchimp.pool import ConnectionPool
+from spinchimp.schema import SpinProfile
+from spinchimp.singleflight import SingleFlight
+
+__all__ = ['SpinChimp', 'SpinProfile']
 
 
 class SpinChimp(object):
@@ -17,90 +32,85 @@ class SpinChimp(object):
 
     TIMEOUT = 10
 
-    DEFAULT_PARAMS_SPIN = {
-        'quality': '4',
-        'posmatch': '3',
-        'protectedterms': '',
-        'rewrite': '0',
-        'phraseignorequality': '0',
-        'spinwithinspin': '0',
-        'spinwithinhtml': '0',
-        'applyinstantunique': '0',
-        'fullcharset': '0',
-        'spintidy': '0',
-        'tagprotect': '',
-        'maxspindepth': '0',
-    }
-
-    def __init__(self, email, apikey, aid=''):
-        """AID is Application ID or application name"""
+    MAX_WORDS = 5000
+    """Default maximum number of words in an article, lowered when the API
+    reports a smaller limit"""
+
+    CHUNK_WORKERS = 4
+    """Number of chunks of a long article spun concurrently"""
+
+    QUOTA_METHODS = ('GlobalSpin', 'GenerateSpin', 'CalcWordDensity')
+    """API methods that use up quota"""
+
+    DEFAULT_PARAMS_SPIN = dict(schema.GLOBAL_SPIN.defaults)
+    """Parameters sent to GlobalSpin unless given, see spinchimp.schema"""
+
+    _default_pool = None
+    _default_pool_lock = threading.Lock()
+
+    def __init__(self, email, apikey, aid='', pool=None, cache=None,
+                 local_density=False, max_words=None, scheduler=None,
+                 rate_limiter=None, retry=None, single_flight=False,
+                 local_protect=False, hooks=None):
+        """AID is Application ID or application name.
+
+        :param pool: connection pool to send requests through, a new
+            ConnectionPool is created if not given
+        :type pool: spinchimp.pool.ConnectionPool
+        :param cache: cache for responses of deterministic requests
+        :type cache: spinchimp.cache.LRUCache or spinchimp.cache.DiskCache
+        :param local_density: compute word_density() locally with
+            spinchimp.density instead of calling the API
+        :type local_density: boolean
+        :param max_words: maximum number of words in an article, articles
+            spun with chunked=True are split above it
+        :type max_words: integer
+        :param scheduler: admits requests based on remaining quota
+        :type scheduler: spinchimp.scheduler.QuotaScheduler
+        :param rate_limiter: limits the rate of requests sent
+        :type rate_limiter: spinchimp.ratelimit.TokenBucket
+        :param retry: retries failed requests
+        :type retry: spinchimp.retry.RetryPolicy
+        :param single_flight: share one request among concurrent identical
+            requests whose response may be cached
+        :type single_flight: boolean
+        :param local_protect: replace protected terms and tagprotect regions
+            with placeholders locally instead of sending them to the API,
+            see spinchimp.protect
+        :type local_protect: boolean
+        :param hooks: notified before and after every API request, see
+            spinchimp.metrics
+        :type hooks: list of spinchimp.metrics.Hooks
+        """
         self._email = email
         self._apikey = apikey
         self._aid = aid
-
-    def _get_param_value(self, param_name, params, def_params=DEFAULT_PARAMS_SPIN):
-        """ Returns parameter value or use default.
-        """
-        if param_name in params:
-            return params[param_name]
-
-        elif param_name in def_params:
-            return def_params[param_name]
-
-        else:
-            raise ex.WrongParameterName(param_name)
-
-    def _value_has(self, param, values, params):
-        """ Raise WrongParameterVal if
-        value of param is not in values.
-        """
-        val = self._get_param_value(param, params)
-        if val not in values:
-            raise ex.WrongParameterVal(param, val)
-
-    def _value_is_int(self, param, params):
-        """ Raise WrongParameterVal if
-        value of param is not integer.
-        """
-        val = self._get_param_value(param, params)
-        try:
-            int(val)
-        except ValueError:
-            raise ex.WrongParameterVal(param, val)
-
-    def _validate(self, params):
-        """ Checks every single parameter and
-        raise error on wrong key or value.
-        """
-
-        # remove entries with None value
-        for i, j in params.iteritems():
-            if j is None:
-                del(i)
-
-        self._value_has('quality', ['1', '2', '3', '4', '5'], params)
-
-        self._value_has('posmatch', ['0', '1', '2', '3', '4'], params)
-
-        self._value_has('rewrite', ['0', '1'], params)
-
-        self._value_has('phraseignorequality', ['0', '1'], params)
-
-        self._value_has('spinwithinspin', ['0', '1'], params)
-
-        self._value_has('spinwithinhtml', ['0', '1'], params)
-
-        self._value_has('applyinstantunique', ['0', '1'], params)
-
-        self._value_has('fullcharset', ['0', '1'], params)
-
-        self._value_has('spintidy', ['0', '1'], params)
-
-        self._value_has('maxspindepth', ['0', '1'], params)
-
-        return True
-
-    def unspun(self, text, dontincludeoriginal=0, reorderparagraphs=0):
+        self._credentials = urllib.urlencode(
+            [('email', email), ('apikey', apikey), ('aid', aid)])
+        self._urls = {}  # (method, params) -> URL
+        self._pool = pool or ConnectionPool(timeout=self.TIMEOUT)
+        self._cache = cache
+        self._local_density = local_density
+        self._max_words = max_words or self.MAX_WORDS
+        self._scheduler = scheduler
+        if scheduler is not None and scheduler.client is None:
+            scheduler.client = self
+        self._rate_limiter = rate_limiter
+        self._retry = retry
+        self._single_flight = SingleFlight() if single_flight else None
+        self._local_protect = local_protect
+        self._hooks = list(hooks or [])
+
+    @classmethod
+    def _shared_pool(cls):
+        """Connection pool used by static methods."""
+        with cls._default_pool_lock:
+            if SpinChimp._default_pool is None:
+                SpinChimp._default_pool = ConnectionPool(timeout=cls.TIMEOUT)
+        return SpinChimp._default_pool
+
+    def unspun(self, text, dontincludeoriginal=0, reorderparagraphs=0,
+               local=False):
         """ Generates an unspun doc from one with spintax.
         Optionally reorders paragraphs and removes original word.
 
@@ -110,18 +120,20 @@ class SpinChimp(object):
         :type dontincludeoriginal: integer
         :param reorderparagraphs: 0 (False) or 1 (True)
         :type reorderparagraphs: integer
+        :param local: unspin with spinchimp.spintax instead of calling the API
+        :type local: boolean
 
         :return: unique text
         :rtype: dictionary
         """
 
-        params = {
-            'dontincludeoriginal': str(dontincludeoriginal),
-            'reorderparagraphs': str(reorderparagraphs)
-        }
-
-        self._value_has('dontincludeoriginal', ['0', '1'], params)
-        self._value_has('reorderparagraphs', ['0', '1'], params)
+        params = self._unspun_params(dontincludeoriginal, reorderparagraphs)
+        if local:
+            return spintax.spin(
+                text,
+                dontincludeoriginal=params['dontincludeoriginal'] == '1',
+                reorderparagraphs=params['reorderparagraphs'] == '1',
+            )
 
         response = self._send_request(
             method='GenerateSpin',
@@ -130,6 +142,14 @@ class SpinChimp(object):
         )
         return response
 
+    def _unspun_params(self, dontincludeoriginal, reorderparagraphs):
+        """ Return validated parameters for GenerateSpin.
+        """
+        return schema.GENERATE_SPIN.compile(
+            dontincludeoriginal=str(dontincludeoriginal),
+            reorderparagraphs=str(reorderparagraphs),
+        )
+
     def word_density(self, text, minlength=3):
         """ Calculates the word densities of words and phrases in the article.
 
@@ -142,30 +162,39 @@ class SpinChimp(object):
         :rtype: dictionary
         """
 
-        params = {'minlength': str(minlength)}
-
-        self._value_is_int('minlength', params)
+        params = self._density_params(minlength)
+        if self._local_density:
+            return density.word_density(text, minlength)
 
         response = self._send_request(
             method='CalcWordDensity',
             text=text,
             params=params
         )
+        return self._parse_pairs(response)
+
+    def _density_params(self, minlength):
+        """ Return validated parameters for CalcWordDensity.
+        """
+        return schema.CALC_WORD_DENSITY.compile(minlength=str(minlength))
+
+    @staticmethod
+    def _parse_pairs(response):
+        """ Parse 'key,value|key,value' response into a dictionary.
+        """
         return dict([atr.split(',') for atr in response.split('|')])
 
     @staticmethod
-    def test_connection():
+    def test_connection(pool=None):
         """ Static method that checks server status.
         The server returns 'OK' on successful connection.
+
+        :param pool: connection pool to use, a shared one if not given
+        :type pool: spinchimp.pool.ConnectionPool
         """
+        pool = pool or SpinChimp._shared_pool()
         urldata = SpinChimp.URL.format(method='TestConnection')
-        req = urllib2.Request(urldata, data='')
-        try:
-            response = urllib2.urlopen(req, timeout=SpinChimp.TIMEOUT)
-        except urllib2.URLError as e:
-            raise ex.NetworkError(str(e))
-
-        return response.read()
+        return pool.request(urldata, data='', timeout=SpinChimp.TIMEOUT)
 
     def quota_all(self):
         """ The server returns:
@@ -177,7 +206,7 @@ class SpinChimp(object):
             text='',
             params={'simple': '0'}
         )
-        return dict([atr.split(',') for atr in response.split('|')])
+        return self._parse_pairs(response)
 
     def quota_left_total(self):
         """ The server returns remaining query times of this account.
@@ -188,143 +217,347 @@ class SpinChimp(object):
             params={'simple': '1'}
         )
 
-    def text_with_spintax(self, text, params=None):
+    def text_with_spintax(self, text, params=None, chunked=False):
         """ Return processed spun text with spintax.
 
         :param text: original text that needs to be changed
         :type text: string
         :param params: parameters to pass along with the request
-        :type params: dictionary
+        :type params: dictionary or spinchimp.SpinProfile
+        :param chunked: split articles longer than the word limit into
+            chunks that are spun concurrently and joined back together
+        :type chunked: boolean
 
         :return: processed text in spintax format
         :rtype: string
         """
 
-        if not params:
-            params = self.DEFAULT_PARAMS_SPIN.copy()
-        else:
-            self._validate(params)
+        params = self._spin_params(params, rewrite='0')
+        text, params, restore = self._protect(text, params)
+        if chunked:
+            return restore(self._spin_chunked(text, params))
 
-        params['rewrite'] = '0'
-
-        return self._send_request(
+        return restore(self._send_request(
             method='GlobalSpin',
             text=text,
             params=params
-        )
+        ))
 
-    def unique_variation(self, text, params=None):
+    def unique_variation(self, text, params=None, chunked=False):
         """ Return a unique variation of the given text.
 
         :param text: original text that needs to be changed
         :type text: string
         :param params: parameters to pass along with the request
-        :type params: dictionary
+        :type params: dictionary or spinchimp.SpinProfile
+        :param chunked: split articles longer than the word limit into
+            chunks that are spun concurrently and joined back together
+        :type chunked: boolean
 
         :return: processed text
         :rtype: string
         """
 
-        if not params:
-            params = self.DEFAULT_PARAMS_SPIN.copy()
-        else:
-            self._validate(params)
-
-        params['rewrite'] = '1'
+        params = self._spin_params(params, rewrite='1')
+        text, params, restore = self._protect(text, params)
+        if chunked:
+            return restore(self._spin_chunked(text, params))
 
-        return self._send_request(
+        return restore(self._send_request(
             method='GlobalSpin',
             text=text,
             params=params
+        ))
+
+    def spin_stream(self, source, output, params=None, mode='unique'):
+        """ Spin an article without holding it in memory.
+
+        The article is sent from source in blocks and the response is
+        decoded into output as it arrives, see spinchimp.stream. Responses
+        are not cached, local protection does not apply and, since neither
+        source nor output can always be replayed, failed requests are not
+        retried.
+
+        :param source: UTF-8 encoded article, read in blocks
+        :type source: file-like object, like an open file or mmap, or an
+            iterable of strings
+        :param output: receives the processed text in unicode blocks
+        :type output: file-like object with write()
+        :param params: parameters to pass along with the request
+        :type params: dictionary or spinchimp.SpinProfile
+        :param mode: 'unique' for a unique variation or 'spintax' for text
+            in spintax format
+        :type mode: string
+        """
+        rewrite = {'unique': '1', 'spintax': '0'}.get(mode)
+        if rewrite is None:
+            raise ex.WrongParameterVal('mode', mode)
+        self._send_request('GlobalSpin', source, self._spin_params(
+            params, rewrite=rewrite), output=output)
+
+    def spin_many(self, texts, params=None, workers=4, mode='unique',
+                  ordered=True):
+        """ Spin many texts concurrently on a pool of worker threads.
+
+        Results are yielded as they become available. A failed item yields
+        its SpinChimpError instead of aborting the whole batch.
+
+        :param texts: iterable of original texts
+        :type texts: iterable
+        :param params: parameters to pass along with every request
+        :type params: dictionary or spinchimp.SpinProfile
+        :param workers: number of concurrent requests
+        :type workers: integer
+        :param mode: 'unique' for unique_variation() or 'spintax' for
+            text_with_spintax()
+        :type mode: string
+        :param ordered: yield results in input order, otherwise yield
+            (index, result) tuples in completion order
+        :type ordered: boolean
+
+        :return: generator of results
+        :rtype: generator
+        """
+        spin = {
+            'unique': self.unique_variation,
+            'spintax': self.text_with_spintax,
+        }.get(mode)
+        if spin is None:
+            raise ex.WrongParameterVal('mode', mode)
+        params = schema.GLOBAL_SPIN.compile(params)
+
+        def call(text):
+            return spin(text, params)
+
+        return bulk.imap(call, texts, workers=workers, ordered=ordered)
+
+    def _spin_chunked(self, text, params):
+        """ Spin text in chunks of at most self._max_words words.
+        """
+        while True:
+            chunks, separators = self._split(text, params)
+            try:
+                if len(chunks) == 1:
+                    return self._send_request('GlobalSpin', text, params)
+
+                results = list(bulk.imap(
+                    lambda chunk: self._send_request(
+                        'GlobalSpin', chunk, params),
+                    chunks,
+                    workers=self.CHUNK_WORKERS,
+                ))
+                for result in results:
+                    if isinstance(result, ex.SpinChimpError):
+                        raise result
+                return chunking.join(results, separators)
+            except ex.ArticleError as e:
+                if not self._learn_max_words(e):
+                    raise
+
+    def _split(self, text, params):
+        """ Split text into chunks the API accepts, see chunking.split().
+        """
+        return chunking.split(
+            text,
+            self._max_words,
+            tagprotect=params.get('tagprotect', ''),
+            protectedterms=params.get('protectedterms', ''),
         )
 
-    def _send_request(self, method, text, params):
+    def _learn_max_words(self, error):
+        """ Lower the word limit to the maximum stated by an 'Article too
+        long' error. Returns False if the error is of another kind or the
+        limit is not above that maximum already, then chunks are rejected
+        for another reason and splitting them smaller would not help.
+        """
+        limit = chunking.max_words_from_error(error)
+        if limit is None or limit < 1 or limit >= self._max_words:
+            return False
+        self._max_words = limit
+        return True
+
+    def _spin_params(self, params, rewrite):
+        """ Return validated parameters for GlobalSpin.
+        """
+        return schema.GLOBAL_SPIN.compile(params, rewrite=rewrite)
+
+    def _protect(self, text, params):
+        """ Replace protected parts of text with placeholders if
+        local_protect is set. Returns text and params to send and a function
+        restoring the response.
+        """
+        if not self._local_protect:
+            return text, params, _unchanged
+        protector = protect.compile(
+            params['protectedterms'], params['tagprotect'])
+        if not protector:
+            return text, params, _unchanged
+
+        text, originals = protector.protect(text)
+        params = schema.GLOBAL_SPIN.compile(
+            params, protectedterms='', tagprotect=protect.TAGPROTECT)
+        return text, params, lambda response: protector.restore(
+            response, originals)
+
+    def _send_request(self, method, text, params, output=None):
         """ Invoke Spin Chimp API with given parameters and return its response.
 
+        :param text: article, or a stream of it if output is given
         :param params: parameters to pass along with the request
-        :type params: dictionary
+        :type params: dictionary or spinchimp.schema.Params
+        :param output: receives the decoded response instead of it being
+            returned
+        :type output: file-like object with write()
 
         :return: API's response (article)
         :rtype: string
         """
+        event = metrics.Event(method) if self._hooks else None
+        try:
+            clock = time.time()
+            params = schema.compile(method, params)
+            if event is not None:
+                clock = event.lap('validate', clock)
+            url, textdata = self._build_request(method, text, params)
+            if event is not None:
+                event.lap('encode', clock)
+                event.request_bytes = stream.length(textdata) or 0
+                self._fire('before', event)
+
+            result = None
+            key = None if output is not None else self._cache_key(
+                method, text, params)
+            if key is not None and self._cache is not None:
+                result = self._cache.get(key)
+                if event is not None:
+                    event.cached = result is not None
+            if result is None:
+                if key is not None and self._single_flight is not None:
+                    result = self._single_flight.do(
+                        key, self._dispatch, method, url, textdata, event)
+                else:
+                    result = self._dispatch(
+                        method, url, textdata, event, output)
+                if key is not None and self._cache is not None:
+                    self._cache.set(key, result)
+        except ex.SpinChimpError as e:
+            if event is not None:
+                event.finish(e)
+                self._fire('error', event)
+            raise
+
+        if event is not None:
+            event.finish()
+            self._fire('after', event)
+        return result
 
-        for k, v in params.items():
-            params[k] = v.encode("utf-8")
-
-        params['email'] = self._email
-        params['apikey'] = self._apikey
-        params['aid'] = self._aid
+    def _fire(self, name, event):
+        """Call method name of every hook with event."""
+        for hook in self._hooks:
+            getattr(hook, name)(event)
 
-        url = self.URL.format(method=method) + urllib.urlencode(params)
-        textdata = text.encode('utf-8')
+    def _dispatch(self, method, url, textdata, event=None, output=None):
+        """ Send the request once the scheduler admits it.
+        """
+        scheduled = (self._scheduler is not None and
+                     method in self.QUOTA_METHODS)
+        if scheduled:
+            clock = time.time()
+            self._scheduler.acquire()
+            if event is not None:
+                event.lap('wait', clock)
 
         try:
-            response = urllib2.urlopen(url, data=textdata, timeout=self.TIMEOUT)
-        except urllib2.URLError as e:
-            raise ex.NetworkError(str(e))
+            if self._retry is not None and output is None:
+                return self._retry.call(self._send, url, textdata, event)
+            return self._send(url, textdata, event, output)
+        except ex.QuotaLimitError:
+            if scheduled:
+                self._scheduler.exhausted()
+            raise
+
+    def _send(self, url, textdata, event=None, output=None):
+        """ Make a single attempt at an API request.
+        """
+        if self._rate_limiter is not None:
+            clock = time.time()
+            self._rate_limiter.acquire()
+            if event is not None:
+                event.lap('wait', clock)
+
+        kwargs = {}
+        if event is not None:
+            event.attempts += 1
+            kwargs['timings'] = event.timings
+        if output is not None:
+            output = kwargs['output'] = stream.ResponseDecoder(output)
+        response = self._pool.request(
+            url, data=textdata, timeout=self.TIMEOUT, **kwargs)
+        if output is not None:
+            # empty unless the API reported an error
+            response = output.close()
+        if event is not None:
+            event.response_bytes += (
+                output.size if output is not None else len(response))
+        return self._parse_response(response, event)
+
+    def _cache_key(self, method, text, params):
+        """ Return key of the request or None if its response may not be
+        shared by cache or single-flight.
+        """
+        if self._cache is None and self._single_flight is None:
+            return None
+        if not self._cacheable(method, params):
+            return None
+        return cache.make_key(method, text, params)
+
+    def _cacheable(self, method, params):
+        """ Whether the response of the request may be cached.
+        Requests that return a random variation or account status are not.
+        Override to opt other requests out of caching.
+        """
+        if method == 'GlobalSpin':
+            return params.get('rewrite') != '1'
+        return method == 'CalcWordDensity'
 
-        result = response.read().decode("utf-8")
+    def _build_request(self, method, text, params):
+        """ Return URL and encoded body of an API request, streamed bodies
+        are returned as they are.
+        """
+        params = schema.compile(method, params)
+        url = self._urls.get((method, params))
+        if url is None:
+            query = params.query
+            url = self.URL.format(method=method) + (
+                query + '&' + self._credentials if query
+                else self._credentials)
+            if len(self._urls) >= schema.Schema.CACHE_SIZE:
+                self._urls.clear()
+            self._urls[(method, params)] = url
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        return url, text
+
+    def _parse_response(self, response, event=None):
+        """ Decode API's response and raise on reported errors.
+        """
+        clock = time.time()
+        result = response.decode("utf-8")
+        if event is not None:
+            clock = event.lap('decode', clock)
 
         if result.lower().startswith('failed:'):
-            self._raise_error(result[7:])
+            try:
+                self._raise_error(result[7:])
+            finally:
+                if event is not None:
+                    event.lap('classify', clock)
 
         return result
 
     def _raise_error(self, errormsg):
-        if (
-            re.search(r"Credentials check result:InvalidEmail",
-                      errormsg,
-                      re.IGNORECASE
-                      ) or
-            re.search(r"Credentials check result:SubscriptionExpired",
-                      errormsg,
-                      re.IGNORECASE
-                      ) or
-            re.search(r"Credentials check result:InvalidAPIKey",
-                      errormsg,
-                      re.IGNORECASE
-                      ) or
-            re.search(r"Credentials check result:NotAPIRegistered",
-                      errormsg,
-                      re.IGNORECASE
-                      ) or
-            re.search(r"No Email specified",
-                      errormsg,
-                      re.IGNORECASE
-                      ) or
-            re.search(r"No API Key specified",
-                      errormsg,
-                      re.IGNORECASE
-                      ) or
-            re.search(r"No Application ID (aid) Specified",
-                      errormsg,
-                      re.IGNORECASE
-                      )
-        ):
-            raise ex.AuthenticationError(errormsg)
-
-        elif (
-            re.search(r"Credentials check result:MaxQueriesReached",
-                      errormsg,
-                      re.IGNORECASE
-                      )):
-            raise ex.QuotaLimitError(errormsg)
-
-        elif (re.search(r"Credentials check result:DatabaseFailure",
-                        errormsg,
-                        re.IGNORECASE
-                        )):
-            raise ex.InternalError(errormsg)
-
-        elif (re.search(r"There are no words in your article!",
-                        errormsg,
-                        re.IGNORECASE
-                        ) or
-              re.search(r"Article too long (\d words). Max is \d.",
-                        errormsg,
-                        re.IGNORECASE
-                        )):
-            raise ex.ArticleError(errormsg)
-
-        else:
-            raise ex.UnknownError(errormsg)
+        raise errors.classify(errormsg)
+
+
+def _unchanged(response):
+    return response
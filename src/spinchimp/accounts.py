@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""A client spreading requests over several Spin Chimp accounts.
+
+Every request is sent with the credentials of the healthy account with the
+most quota left. Accounts that run out of quota or fail authentication are
+taken out of rotation and the request is sent again with another one::
+
+    sc = AccountPool([
+        ('foo@bar.com', 'apikey1'),
+        ('baz@bar.com', 'apikey2', 'myapp'),
+    ])
+    sc.unique_variation(text)
+"""
+
+import threading
+import time
+import urllib
+
+from spinchimp import SpinChimp
+from spinchimp import exceptions as ex
+from spinchimp import stream
+
+
+class Account(object):
+    """Credentials of an account and what is known about its health."""
+
+    def __init__(self, email, apikey, aid=''):
+        self.email = email
+        self.credentials = urllib.urlencode(
+            [('email', email), ('apikey', apikey), ('aid', aid)])
+        self.remaining = None   # estimate of quota left, None if unknown
+        self.polled = None
+        self.disabled_until = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.refreshing = False
+
+    def available(self, now, quota=True):
+        """Whether requests may be sent with the account."""
+        if now < self.disabled_until:
+            return False
+        return not quota or self.remaining is None or self.remaining > 0
+
+    def stats(self):
+        """Return health of the account as a dictionary."""
+        return {
+            'email': self.email,
+            'remaining': self.remaining,
+            'requests': self.requests,
+            'failures': self.failures,
+            'healthy': self.available(time.time()),
+            'last_error': None if self.last_error is None
+            else type(self.last_error).__name__,
+        }
+
+
+class AccountPool(SpinChimp):
+    """SpinChimp client using the credentials of many accounts.
+
+    Remaining quota of every account is polled with QueryStats every
+    poll_interval seconds and counted down locally in between. Requests
+    are routed to the account with the most quota left, so concurrent
+    requests are spread over all accounts. On QuotaLimitError the account
+    is skipped until a poll reports quota again, on AuthenticationError it
+    is skipped for cooldown seconds.
+    """
+
+    def __init__(self, accounts, poll_interval=300, cooldown=3600, **kwargs):
+        """
+        :param accounts: (email, apikey) or (email, apikey, aid) of every
+            account
+        :type accounts: list of tuples
+        :param poll_interval: seconds between polls of remaining quota of
+            an account
+        :type poll_interval: float
+        :param cooldown: seconds an account is not used after
+            AuthenticationError
+        :type cooldown: float
+
+        Other keyword arguments are passed to SpinChimp, the connection
+        pool, cache and other settings are shared by all accounts.
+        """
+        if not accounts:
+            raise ValueError('At least one account is required')
+        super(AccountPool, self).__init__('', '', **kwargs)
+        # credentials of the chosen account are appended by _dispatch()
+        self._credentials = ''
+        self.accounts = [Account(*account) for account in accounts]
+        self.poll_interval = poll_interval
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def quota_all(self):
+        """ Poll all accounts and return daily limit, remaining daily limit,
+        extended quota and bulk quota summed over accounts that answered.
+        """
+        totals = {}
+        for account in self.accounts:
+            stats = self.refresh(account)
+            for name, value in (stats or {}).iteritems():
+                if value.isdigit():
+                    totals[name] = totals.get(name, 0) + int(value)
+        return dict((name, unicode(value))
+                    for name, value in totals.iteritems())
+
+    def quota_left_total(self):
+        """ Poll all accounts and return their remaining queries in total.
+        """
+        return self.quota_all().get('Remaining', u'0')
+
+    def stats(self):
+        """Return health of every account, see Account.stats()."""
+        with self._lock:
+            return [account.stats() for account in self.accounts]
+
+    def refresh(self, account):
+        """ Poll remaining quota of an account.
+
+        :param account: one of self.accounts
+        :type account: spinchimp.accounts.Account
+
+        :return: response of QueryStats or None if the poll failed
+        :rtype: dictionary
+        """
+        url, textdata = self._build_request(
+            'QueryStats', u'', {'simple': '0'})
+        try:
+            stats = self._parse_pairs(super(AccountPool, self)._dispatch(
+                'QueryStats', url + account.credentials, textdata))
+        except ex.SpinChimpError as e:
+            self._failed(account, e)
+            with self._lock:
+                account.polled = time.time()
+            return None
+
+        remaining = stats.get('Remaining', '')
+        with self._lock:
+            if remaining.isdigit():
+                account.remaining = int(remaining)
+            account.polled = time.time()
+            if account.remaining:
+                account.disabled_until = 0
+        return stats
+
+    def _refresh_due(self):
+        """Poll accounts whose estimate of remaining quota is stale."""
+        now = time.time()
+        with self._lock:
+            due = [account for account in self.accounts
+                   if not account.refreshing and
+                   now >= account.disabled_until and
+                   (account.polled is None or
+                    now - account.polled >= self.poll_interval)]
+            for account in due:
+                account.refreshing = True
+        for account in due:
+            try:
+                self.refresh(account)
+            finally:
+                account.refreshing = False
+
+    def _choose(self, method, tried):
+        """ Return the available account with the most quota left that was
+        not tried yet, or None.
+        """
+        self._refresh_due()
+        quota = method in self.QUOTA_METHODS
+        with self._lock:
+            now = time.time()
+            best = None
+            for account in self.accounts:
+                if account in tried or not account.available(now, quota):
+                    continue
+                # accounts whose quota is unknown come last
+                rank = -1 if account.remaining is None else account.remaining
+                if best is None or rank > best[0]:
+                    best = (rank, account)
+            if best is None:
+                return None
+            account = best[1]
+            account.requests += 1
+            if quota and account.remaining is not None:
+                account.remaining -= 1
+            return account
+
+    def _failed(self, account, error):
+        """Record an error of an account and take it out of rotation if
+        it is out of quota or can not authenticate.
+        """
+        with self._lock:
+            account.failures += 1
+            account.last_error = error
+            if isinstance(error, ex.QuotaLimitError):
+                account.remaining = 0
+            elif isinstance(error, ex.AuthenticationError):
+                account.disabled_until = time.time() + self.cooldown
+
+    def _unavailable(self):
+        """Return the error of a request no account is available for."""
+        now = time.time()
+        with self._lock:
+            if all(now < account.disabled_until for account in self.accounts):
+                return ex.AuthenticationError(
+                    'No account could authenticate.')
+        return ex.QuotaLimitError('No account with quota left.')
+
+    def _dispatch(self, method, url, textdata, event=None, output=None):
+        """ Send the request with the best account, failing over to the
+        others on QuotaLimitError and AuthenticationError.
+        """
+        streamed = not isinstance(textdata, basestring)
+        start = stream.position(textdata) if streamed else None
+        tried = set()
+        error = None
+        while True:
+            account = self._choose(method, tried)
+            if account is None:
+                raise error or self._unavailable()
+            tried.add(account)
+            try:
+                result = super(AccountPool, self)._dispatch(
+                    method, url + account.credentials, textdata, event,
+                    output)
+            except (ex.QuotaLimitError, ex.AuthenticationError) as e:
+                self._failed(account, e)
+                error = e
+                if streamed:
+                    if start is None:
+                        raise
+                    textdata.seek(start)
+                continue
+            except ex.SpinChimpError as e:
+                with self._lock:
+                    account.failures += 1
+                    account.last_error = e
+                raise
+            return result
@@ -0,0 +1,641 @@
+# -*- coding: utf-8 -*-
+"""Asyncio client for the Spin Chimp API.
+
+Requires the ``trollius`` package (``pip install spinchimp[async]``), the
+asyncio port for Python 2.
+"""
+
+import socket
+import time
+import urlparse
+
+import trollius as asyncio
+from trollius import From
+from trollius import Return
+
+from spinchimp import SpinChimp
+from spinchimp import chunking
+from spinchimp import density
+from spinchimp import exceptions as ex
+from spinchimp import metrics
+from spinchimp import schema
+from spinchimp import stream
+from spinchimp.pool import ConnectionPool
+
+
+class AsyncConnectionPool(object):
+    """A pool of keep-alive HTTP/1.1 stream connections for an event loop.
+
+    Unlike spinchimp.pool.ConnectionPool no threads are involved, requests
+    are written to and read from non-blocking sockets.
+    """
+
+    def __init__(self, maxsize_per_host=10, timeout=10, loop=None):
+        """
+        :param maxsize_per_host: maximum number of idle connections kept
+            per host
+        :type maxsize_per_host: integer
+        :param timeout: default timeout in seconds
+        :type timeout: float
+        """
+        self.maxsize_per_host = maxsize_per_host
+        self.timeout = timeout
+        self._loop = loop
+        self._idle = {}  # host key -> list of (reader, writer)
+
+    def _connection(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    @asyncio.coroutine
+    def _read_response(self, reader, write=None):
+        """Read a HTTP response. Returns status, body and keep-alive flag.
+
+        Unless the request failed with a HTTP error, blocks of the body are
+        passed to write if given and an empty body is returned.
+        """
+        status_line = yield From(reader.readline())
+        if not status_line:
+            raise socket.error('Connection closed by server.')
+        try:
+            version, status = status_line.split(None, 2)[:2]
+            status = int(status)
+        except ValueError:
+            raise ex.NetworkError(
+                'Bad status line: {!r}'.format(status_line))
+
+        headers = {}
+        while True:
+            line = yield From(reader.readline())
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (version == 'HTTP/1.1' and
+                      headers.get('connection', '').lower() != 'close')
+
+        chunks = []
+        if write is None or status >= 400:
+            write = chunks.append
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((yield From(reader.readline())).split(';')[0], 16)
+                if not size:
+                    break
+                write((yield From(reader.readexactly(size))))
+                yield From(reader.readexactly(2))
+            while (yield From(reader.readline())) not in ('\r\n', '\n', ''):
+                pass
+        elif 'content-length' in headers:
+            left = int(headers['content-length'])
+            while left:
+                block = yield From(
+                    reader.readexactly(min(left, stream.BLOCK_SIZE)))
+                write(block)
+                left -= len(block)
+        else:
+            while True:
+                block = yield From(reader.read(stream.BLOCK_SIZE))
+                if not block:
+                    break
+                write(block)
+            keep_alive = False
+
+        raise Return((status, ''.join(chunks), keep_alive))
+
+    @staticmethod
+    @asyncio.coroutine
+    def _write_stream(writer, head, data):
+        """Write a request with a body read from data in blocks, waiting
+        for the transport to drain after every block."""
+        length = stream.length(data)
+        if length is None:
+            writer.write(head + 'Transfer-Encoding: chunked\r\n\r\n')
+        else:
+            writer.write(head + 'Content-Length: {}\r\n\r\n'.format(length))
+        for block in stream.blocks(data):
+            if length is None:
+                block = '{:x}\r\n{}\r\n'.format(len(block), block)
+            writer.write(block)
+            yield From(writer.drain())
+        if length is None:
+            writer.write('0\r\n\r\n')
+
+    @asyncio.coroutine
+    def request(self, url, data='', timeout=None, timings=None, output=None):
+        """POST data to url over a pooled connection and return response body.
+
+        :param url: absolute URL including the query string
+        :type url: string
+        :param data: request body, a string or a file-like object or an
+            iterable of strings sent in blocks, see spinchimp.stream
+        :param timeout: timeout in seconds, pool default if None
+        :type timeout: float
+        :param timings: seconds spent to connect and until the response is
+            read (server) are added to it
+        :type timings: dictionary
+        :param output: the response body is written to it in blocks instead
+            of being returned, unless the request failed with a HTTP error
+        :type output: file-like object with write()
+
+        :return: response body
+        :rtype: string
+        """
+        parts = urlparse.urlsplit(url)
+        ssl = parts.scheme == 'https'
+        port = parts.port or (443 if ssl else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        timeout = timeout or self.timeout
+
+        head = (
+            'POST {} HTTP/1.1\r\n'
+            'Host: {}\r\n'
+            'Content-Type: application/x-www-form-urlencoded\r\n'
+            'Connection: keep-alive\r\n'
+        ).format(path, parts.netloc)
+        streamed = not isinstance(data, basestring)
+        # a body can only be sent again if it can be rewound
+        start = stream.position(data) if streamed else None
+        replayable = not streamed or start is not None
+        written = []    # whether output was written to
+
+        def write(block):
+            if not written:
+                written.append(True)
+            output.write(block)
+
+        while True:
+            clock = time.time()
+            conn = self._connection(key)
+            reused = conn is not None
+            try:
+                if conn is None:
+                    conn = yield From(asyncio.wait_for(
+                        asyncio.open_connection(
+                            parts.hostname, port, ssl=ssl, loop=self._loop),
+                        timeout, loop=self._loop))
+                if timings is not None:
+                    clock = metrics.lap(timings, 'connect', clock)
+                reader, writer = conn
+                if streamed:
+                    if start is not None:
+                        data.seek(start)
+                    yield From(self._write_stream(writer, head, data))
+                else:
+                    writer.write(head + 'Content-Length: {}\r\n\r\n'.format(
+                        len(data)) + data)
+                status, body, keep_alive = yield From(asyncio.wait_for(
+                    self._read_response(
+                        reader, None if output is None else write), timeout,
+                    loop=self._loop))
+                if timings is not None:
+                    metrics.lap(timings, 'server', clock)
+            except (socket.error, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError, ValueError) as e:
+                if conn is not None:
+                    conn[1].close()
+                if reused and replayable and not written:
+                    # the server may have dropped an idle keep-alive
+                    # connection, try again on a fresh one
+                    continue
+                raise ex.NetworkError(str(e) or e.__class__.__name__)
+            except BaseException:
+                # e.g. a bad status line or a cancelled task, the state of
+                # the connection is unknown
+                if conn is not None:
+                    conn[1].close()
+                raise
+
+            idle = self._idle.setdefault(key, [])
+            if keep_alive and len(idle) < self.maxsize_per_host:
+                idle.append(conn)
+            else:
+                writer.close()
+
+            if status >= 400:
+                raise ex.NetworkError('HTTP Error {}'.format(status))
+            raise Return(body)
+
+    def clear(self):
+        """Close all idle connections."""
+        for idle in self._idle.values():
+            for reader, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+class _QuotaPoller(object):
+    """Polls remaining quota for the QuotaScheduler of an AsyncSpinChimp.
+
+    The scheduler blocks while it polls, so AsyncSpinChimp calls it from
+    executor threads and polls with a blocking request here.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._pool = ConnectionPool(timeout=SpinChimp.TIMEOUT)
+
+    def quota_left_total(self):
+        client = self._client
+        sc = SpinChimp(client._email, client._apikey, client._aid,
+                       pool=self._pool)
+        sc.URL = client.URL
+        return sc.quota_left_total()
+
+
+class AsyncSpinChimp(SpinChimp):
+    """Coroutine based variant of SpinChimp.
+
+    Every public method of SpinChimp is available as a coroutine. Parameter
+    validation and error handling are shared with SpinChimp. At most `limit`
+    requests are in flight at once, the rest wait on the event loop.
+    """
+
+    def __init__(self, email, apikey, aid='', limit=100, pool=None,
+                 cache=None, local_density=False, max_words=None,
+                 scheduler=None, rate_limiter=None, retry=None,
+                 single_flight=False, local_protect=False, hooks=None,
+                 loop=None):
+        """AID is Application ID or application name.
+
+        :param limit: maximum number of concurrent requests
+        :type limit: integer
+        :param pool: connection pool to send requests through
+        :type pool: spinchimp.aio.AsyncConnectionPool
+        :param cache: cache for responses of deterministic requests
+        :type cache: spinchimp.cache.LRUCache or spinchimp.cache.DiskCache
+        :param local_density: compute word_density() locally
+        :type local_density: boolean
+        :param max_words: maximum number of words in an article, articles
+            spun with chunked=True are split above it
+        :type max_words: integer
+        :param scheduler: admits requests based on remaining quota, waits
+            for admission and polls run in executor threads, so priority()
+            of the scheduler does not apply to coroutines
+        :type scheduler: spinchimp.scheduler.QuotaScheduler
+        :param rate_limiter: limits the rate of requests sent
+        :type rate_limiter: spinchimp.ratelimit.TokenBucket
+        :param retry: retries failed requests
+        :type retry: spinchimp.retry.RetryPolicy
+        :param single_flight: share one request among concurrent identical
+            requests whose response may be cached
+        :type single_flight: boolean
+        :param local_protect: replace protected terms and tagprotect regions
+            with placeholders locally
+        :type local_protect: boolean
+        :param hooks: notified before and after every API request
+        :type hooks: list of spinchimp.metrics.Hooks
+        """
+        super(AsyncSpinChimp, self).__init__(
+            email, apikey, aid,
+            pool=pool or AsyncConnectionPool(
+                maxsize_per_host=limit, timeout=self.TIMEOUT, loop=loop),
+            cache=cache,
+            local_density=local_density,
+            max_words=max_words,
+            scheduler=scheduler,
+            rate_limiter=rate_limiter,
+            retry=retry,
+            single_flight=single_flight,
+            local_protect=local_protect,
+            hooks=hooks,
+        )
+        self._in_flight = {}
+        if scheduler is not None and scheduler.client is self:
+            scheduler.client = _QuotaPoller(self)
+        self._limit = limit
+        self._semaphore = asyncio.Semaphore(limit, loop=loop)
+        self._loop = loop
+
+    @asyncio.coroutine
+    def unspun(self, text, dontincludeoriginal=0, reorderparagraphs=0,
+               local=False):
+        """ Coroutine version of SpinChimp.unspun().
+        """
+        if local:
+            raise Return(super(AsyncSpinChimp, self).unspun(
+                text, dontincludeoriginal, reorderparagraphs, local=True))
+
+        response = yield From(self._send_request(
+            method='GenerateSpin',
+            text=text,
+            params=self._unspun_params(dontincludeoriginal, reorderparagraphs)
+        ))
+        raise Return(response)
+
+    @asyncio.coroutine
+    def word_density(self, text, minlength=3):
+        """ Coroutine version of SpinChimp.word_density().
+        """
+        params = self._density_params(minlength)
+        if self._local_density:
+            raise Return(density.word_density(text, minlength))
+
+        response = yield From(self._send_request(
+            method='CalcWordDensity',
+            text=text,
+            params=params
+        ))
+        raise Return(self._parse_pairs(response))
+
+    @staticmethod
+    @asyncio.coroutine
+    def test_connection(pool=None, loop=None):
+        """ Coroutine version of SpinChimp.test_connection().
+
+        :param pool: connection pool to use, a new one closed afterwards if
+            not given
+        :type pool: spinchimp.aio.AsyncConnectionPool
+        :param loop: event loop of the new pool
+        """
+        own = pool is None
+        if own:
+            pool = AsyncConnectionPool(timeout=SpinChimp.TIMEOUT, loop=loop)
+        urldata = SpinChimp.URL.format(method='TestConnection')
+        try:
+            response = yield From(
+                pool.request(urldata, data='', timeout=SpinChimp.TIMEOUT))
+        finally:
+            if own:
+                pool.clear()
+        raise Return(response)
+
+    @asyncio.coroutine
+    def quota_all(self):
+        """ Coroutine version of SpinChimp.quota_all().
+        """
+        response = yield From(self._send_request(
+            method='QueryStats',
+            text='',
+            params={'simple': '0'}
+        ))
+        raise Return(self._parse_pairs(response))
+
+    @asyncio.coroutine
+    def quota_left_total(self):
+        """ Coroutine version of SpinChimp.quota_left_total().
+        """
+        response = yield From(self._send_request(
+            method='QueryStats',
+            text='',
+            params={'simple': '1'}
+        ))
+        raise Return(response)
+
+    @asyncio.coroutine
+    def text_with_spintax(self, text, params=None, chunked=False):
+        """ Coroutine version of SpinChimp.text_with_spintax().
+        """
+        params = self._spin_params(params, rewrite='0')
+        text, params, restore = self._protect(text, params)
+        if chunked:
+            response = yield From(self._spin_chunked(text, params))
+            raise Return(restore(response))
+
+        response = yield From(self._send_request(
+            method='GlobalSpin',
+            text=text,
+            params=params
+        ))
+        raise Return(restore(response))
+
+    @asyncio.coroutine
+    def unique_variation(self, text, params=None, chunked=False):
+        """ Coroutine version of SpinChimp.unique_variation().
+        """
+        params = self._spin_params(params, rewrite='1')
+        text, params, restore = self._protect(text, params)
+        if chunked:
+            response = yield From(self._spin_chunked(text, params))
+            raise Return(restore(response))
+
+        response = yield From(self._send_request(
+            method='GlobalSpin',
+            text=text,
+            params=params
+        ))
+        raise Return(restore(response))
+
+    @asyncio.coroutine
+    def spin_many(self, texts, params=None, workers=None, mode='unique',
+                  ordered=True):
+        """ Coroutine version of SpinChimp.spin_many().
+
+        Returns a list of all results once every text is spun. A failed item
+        is returned as its SpinChimpError instead of aborting the whole
+        batch.
+
+        :param workers: number of concurrent requests, `limit` of the client
+            if None
+        :type workers: integer
+        :param ordered: return results in input order, otherwise return
+            (index, result) tuples in completion order
+        :type ordered: boolean
+        """
+        spin = {
+            'unique': self.unique_variation,
+            'spintax': self.text_with_spintax,
+        }.get(mode)
+        if spin is None:
+            raise ex.WrongParameterVal('mode', mode)
+        params = schema.GLOBAL_SPIN.compile(params)
+        # workers share the iterator, so texts are not all read up front
+        items = enumerate(texts)
+        results = []
+
+        @asyncio.coroutine
+        def worker():
+            for index, text in items:
+                try:
+                    result = yield From(spin(text, params))
+                except ex.SpinChimpError as e:
+                    result = e
+                results.append((index, result))
+
+        yield From(asyncio.gather(
+            *[worker() for i in xrange(workers or self._limit)],
+            loop=self._loop))
+        if ordered:
+            results.sort(key=lambda item: item[0])
+            results = [result for index, result in results]
+        raise Return(results)
+
+    @asyncio.coroutine
+    def spin_stream(self, source, output, params=None, mode='unique'):
+        """ Coroutine version of SpinChimp.spin_stream().
+
+        Blocks of source are written to the connection as the transport
+        drains, so reading a file source still blocks the event loop
+        briefly for every block.
+        """
+        rewrite = {'unique': '1', 'spintax': '0'}.get(mode)
+        if rewrite is None:
+            raise ex.WrongParameterVal('mode', mode)
+        yield From(self._send_request('GlobalSpin', source, self._spin_params(
+            params, rewrite=rewrite), output=output))
+
+    @asyncio.coroutine
+    def _spin_chunked(self, text, params):
+        """ Coroutine version of SpinChimp._spin_chunked().
+        """
+        while True:
+            chunks, separators = self._split(text, params)
+            try:
+                results = yield From(asyncio.gather(
+                    *[self._send_request('GlobalSpin', chunk, params)
+                      for chunk in chunks],
+                    loop=self._loop))
+                raise Return(chunking.join(results, separators))
+            except ex.ArticleError as e:
+                if not self._learn_max_words(e):
+                    raise
+
+    @asyncio.coroutine
+    def _send(self, url, textdata, event=None, output=None):
+        """ Coroutine version of SpinChimp._send().
+        """
+        clock = time.time()
+        if self._rate_limiter is not None:
+            wait = self._rate_limiter.reserve()
+            if wait > 0:
+                yield From(asyncio.sleep(wait, loop=self._loop))
+        kwargs = {}
+        if output is not None:
+            output = kwargs['output'] = stream.ResponseDecoder(output)
+        with (yield From(self._semaphore)):
+            if event is not None:
+                event.lap('wait', clock)
+                event.attempts += 1
+                kwargs['timings'] = event.timings
+            response = yield From(self._pool.request(
+                url, data=textdata, timeout=self.TIMEOUT, **kwargs))
+        if output is not None:
+            # empty unless the API reported an error
+            response = output.close()
+        if event is not None:
+            event.response_bytes += (
+                output.size if output is not None else len(response))
+        raise Return(self._parse_response(response, event))
+
+    @asyncio.coroutine
+    def _send_with_retry(self, url, textdata, event=None):
+        """ Like RetryPolicy.call() but sleeping on the event loop.
+        """
+        policy = self._retry
+        started = policy.start()
+        attempt = 0
+        while True:
+            try:
+                policy.before()
+                result = yield From(self._send(url, textdata, event))
+            except ex.SpinChimpError as e:
+                delay = policy.failure(e, attempt, started)
+                if delay is None:
+                    raise
+                yield From(asyncio.sleep(delay, loop=self._loop))
+                attempt += 1
+            else:
+                policy.success()
+                raise Return(result)
+
+    @asyncio.coroutine
+    def _send_request(self, method, text, params, output=None):
+        """ Coroutine version of SpinChimp._send_request().
+        """
+        event = metrics.Event(method) if self._hooks else None
+        try:
+            clock = time.time()
+            params = schema.compile(method, params)
+            if event is not None:
+                clock = event.lap('validate', clock)
+            url, textdata = self._build_request(method, text, params)
+            if event is not None:
+                event.lap('encode', clock)
+                event.request_bytes = stream.length(textdata) or 0
+                self._fire('before', event)
+
+            result = None
+            key = None if output is not None else self._cache_key(
+                method, text, params)
+            if key is not None and self._cache is not None:
+                result = self._cache.get(key)
+                if event is not None:
+                    event.cached = result is not None
+            if result is None:
+                if key is not None and self._single_flight is not None:
+                    result = yield From(self._coalesce(
+                        key, method, url, textdata, event))
+                else:
+                    result = yield From(self._dispatch(
+                        method, url, textdata, event, output))
+                if key is not None and self._cache is not None:
+                    self._cache.set(key, result)
+        except ex.SpinChimpError as e:
+            if event is not None:
+                event.finish(e)
+                self._fire('error', event)
+            raise
+
+        if event is not None:
+            event.finish()
+            self._fire('after', event)
+        raise Return(result)
+
+    @asyncio.coroutine
+    def _dispatch(self, method, url, textdata, event=None, output=None):
+        """ Coroutine version of SpinChimp._dispatch().
+        """
+        scheduled = (self._scheduler is not None and
+                     method in self.QUOTA_METHODS)
+        if scheduled:
+            clock = time.time()
+            loop = self._loop or asyncio.get_event_loop()
+            yield From(loop.run_in_executor(None, self._scheduler.acquire))
+            if event is not None:
+                event.lap('wait', clock)
+
+        try:
+            if self._retry is None or output is not None:
+                result = yield From(self._send(url, textdata, event, output))
+            else:
+                result = yield From(
+                    self._send_with_retry(url, textdata, event))
+        except ex.QuotaLimitError:
+            if scheduled:
+                self._scheduler.exhausted()
+            raise
+        raise Return(result)
+
+    @asyncio.coroutine
+    def _coalesce(self, key, method, url, textdata, event=None):
+        """ Share one request among concurrent requests with the same key.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._single_flight.shared += 1
+            result = yield From(asyncio.shield(future, loop=self._loop))
+            raise Return(result)
+
+        self._single_flight.calls += 1
+        future = self._in_flight[key] = asyncio.Future(loop=self._loop)
+        try:
+            result = yield From(self._dispatch(method, url, textdata, event))
+        except Exception as e:
+            future.set_exception(e)
+            # mark as retrieved, there may be no other caller waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            raise Return(result)
+        finally:
+            del self._in_flight[key]
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Client throughput benchmarks against spinchimp.testing.FakeServer.
+
+Run with ``python -m spinchimp.benchmark``. Every mode sends the same
+number of text_with_spintax() requests and reports requests per second,
+median and 99th percentile latency and peak memory of the process running
+the mode, a child process of its own:
+
+serial
+    a new client, and thus a new connection, for every request
+pooled
+    one client reusing its keep-alive connections, one request at a time
+threaded
+    SpinChimp.spin_many() on a pool of worker threads
+async
+    AsyncSpinChimp with concurrent coroutines, requires trollius
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+from spinchimp import SpinChimp
+from spinchimp.testing import FakeServer
+
+MODES = ('serial', 'pooled', 'threaded', 'async')
+
+TEXT = (u'The quick brown fox jumps over the lazy dog. Spinning turns this '
+        u'sentence into many unique variations of the same article.')
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def _timed(func, latencies):
+    def call(*args):
+        started = time.time()
+        try:
+            return func(*args)
+        finally:
+            latencies.append(time.time() - started)
+    return call
+
+
+def _client(server, cls=SpinChimp, **kwargs):
+    client = cls('bench@example.com', 'apikey', 'benchmark', **kwargs)
+    client.URL = server.url
+    return client
+
+
+def _serial(server, requests, concurrency, latencies):
+    for i in xrange(requests):
+        client = _client(server)
+        _timed(client.text_with_spintax, latencies)(TEXT)
+        client._pool.clear()
+
+
+def _pooled(server, requests, concurrency, latencies):
+    client = _client(server)
+    spin = _timed(client.text_with_spintax, latencies)
+    for i in xrange(requests):
+        spin(TEXT)
+    client._pool.clear()
+
+
+def _threaded(server, requests, concurrency, latencies):
+    client = _client(server)
+    client.text_with_spintax = _timed(client.text_with_spintax, latencies)
+    for result in client.spin_many([TEXT] * requests, workers=concurrency,
+                                   mode='spintax'):
+        pass
+    client._pool.clear()
+
+
+def _async(server, requests, concurrency, latencies):
+    import trollius as asyncio
+    from trollius import From
+    from spinchimp.aio import AsyncSpinChimp
+
+    loop = asyncio.new_event_loop()
+    client = _client(server, AsyncSpinChimp, limit=concurrency, loop=loop)
+    # like worker threads, time requests only once they may be sent and
+    # not while they queue for the client's semaphore
+    semaphore = asyncio.Semaphore(concurrency, loop=loop)
+
+    @asyncio.coroutine
+    def spin():
+        with (yield From(semaphore)):
+            started = loop.time()
+            yield From(client.text_with_spintax(TEXT))
+            latencies.append(loop.time() - started)
+
+    try:
+        loop.run_until_complete(asyncio.gather(
+            *[spin() for i in xrange(requests)], loop=loop))
+        client._pool.clear()
+        loop.run_until_complete(asyncio.sleep(0, loop=loop))
+    finally:
+        loop.close()
+
+
+_RUNNERS = {
+    'serial': _serial,
+    'pooled': _pooled,
+    'threaded': _threaded,
+    'async': _async,
+}
+
+
+def _isolated(mode, server, requests, concurrency):
+    """Run a mode in a forked child process and return its results."""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    child = multiprocessing.Process(target=lambda: sender.send(
+        run(mode, server, requests, concurrency)))
+    child.start()
+    sender.close()
+    try:
+        return receiver.recv()
+    except EOFError:
+        raise RuntimeError('Benchmark of {} mode failed.'.format(mode))
+    finally:
+        child.join()
+
+
+def run(mode, server, requests=1000, concurrency=8, isolated=False):
+    """ Benchmark a mode against a running server.
+
+    :param mode: one of MODES
+    :type mode: string
+    :param server: server to send requests to
+    :type server: spinchimp.testing.FakeServer
+    :param requests: number of requests sent
+    :type requests: integer
+    :param concurrency: number of concurrent requests of threaded and
+        async modes
+    :type concurrency: integer
+    :param isolated: run the mode in a child process, so that 'max_rss' is
+        not the peak of modes run before in the same process
+    :type isolated: boolean
+
+    :return: 'mode', 'requests', 'seconds', 'rps', 'p50' and 'p99'
+        latency in milliseconds and 'max_rss' in kilobytes
+    :rtype: dictionary
+    """
+    if isolated:
+        return _isolated(mode, server, requests, concurrency)
+    latencies = []
+    started = time.time()
+    _RUNNERS[mode](server, requests, concurrency, latencies)
+    seconds = time.time() - started
+    return {
+        'mode': mode,
+        'requests': requests,
+        'seconds': seconds,
+        'rps': requests / seconds if seconds else 0.0,
+        'p50': _percentile(latencies, 50) * 1000,
+        'p99': _percentile(latencies, 99) * 1000,
+        # peak of the whole process, see isolated
+        'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main(argv=None):
+    """Run benchmarks and print a table or JSON lines."""
+    parser = argparse.ArgumentParser(
+        prog='python -m spinchimp.benchmark',
+        description='Benchmark SpinChimp clients against a local fake API.')
+    parser.add_argument('modes', nargs='*', default=list(MODES),
+                        metavar='MODE',
+                        help='modes to run: ' + ', '.join(MODES))
+    parser.add_argument('-n', '--requests', type=int, default=1000,
+                        help='requests per mode (default: %(default)s)')
+    parser.add_argument('-c', '--concurrency', type=int, default=8,
+                        help='concurrent requests (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the server delays every response')
+    parser.add_argument('--json', action='store_true',
+                        help='print results as JSON lines')
+    args = parser.parse_args(argv)
+    for mode in args.modes:
+        if mode not in MODES:
+            parser.error('unknown mode: {}'.format(mode))
+
+    if not args.json:
+        print('{:<10}{:>10}{:>12}{:>10}{:>10}{:>12}'.format(
+            'mode', 'requests', 'req/s', 'p50 ms', 'p99 ms', 'max rss KB'))
+    with FakeServer(latency=args.latency) as server:
+        for mode in args.modes:
+            result = run(mode, server, args.requests, args.concurrency,
+                         isolated=True)
+            if args.json:
+                print(json.dumps(result, sort_keys=True))
+            else:
+                print('{mode:<10}{requests:>10}{rps:>12.1f}{p50:>10.2f}'
+                      '{p99:>10.2f}{max_rss:>12}'.format(**result))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import Queue
+import sys
+import threading
+
+from spinchimp import exceptions as ex
+
+
+def _worker(func, tasks, results):
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        index, item = task
+        try:
+            results.put((index, func(item), None))
+        except ex.SpinChimpError as e:
+            results.put((index, e, None))
+        except Exception:
+            results.put((index, None, sys.exc_info()))
+
+
+def imap(func, items, workers=4, ordered=True):
+    """Call func for every item on a bounded pool of worker threads.
+
+    Items are consumed lazily, at most twice as many items as there are
+    workers are in flight at once. A SpinChimpError raised by func is
+    returned in place of the result of that item, any other exception
+    aborts the whole run.
+
+    :param func: callable taking a single item
+    :param items: iterable of items
+    :param workers: number of worker threads
+    :type workers: integer
+    :param ordered: yield results in input order, otherwise yield
+        (index, result) tuples in completion order
+    :type ordered: boolean
+    """
+    tasks = Queue.Queue()
+    results = Queue.Queue()
+    threads = [
+        threading.Thread(target=_worker, args=(func, tasks, results))
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    items = enumerate(items)
+    window = workers * 2
+    pending = 0
+    done = {}
+    next_index = 0
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and pending + len(done) < window:
+                try:
+                    tasks.put(next(items))
+                    pending += 1
+                except StopIteration:
+                    exhausted = True
+            if not pending:
+                return
+
+            index, result, exc_info = results.get()
+            pending -= 1
+            if exc_info is not None:
+                raise exc_info[0], exc_info[1], exc_info[2]
+
+            if not ordered:
+                yield index, result
+                continue
+
+            done[index] = result
+            while next_index in done:
+                yield done.pop(next_index)
+                next_index += 1
+    finally:
+        for thread in threads:
+            tasks.put(None)
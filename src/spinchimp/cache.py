@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import hashlib
+import sqlite3
+import threading
+import time
+
+CREDENTIALS = ('email', 'apikey', 'aid')
+"""Parameters that do not affect API's response"""
+
+
+def _utf8(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def make_key(method, text, params):
+    """Return a content hash of an API request.
+
+    Parameters are sorted and credentials left out, so the same request
+    made by different accounts maps to the same key.
+    """
+    digest = hashlib.sha1(method)
+    for name in sorted(params):
+        if name not in CREDENTIALS:
+            digest.update('\0{}={}'.format(name, _utf8(params[name])))
+    digest.update('\0\0')
+    digest.update(_utf8(text))
+    return digest.hexdigest()
+
+
+class _Stats(object):
+    """Hit, miss and eviction counters shared by cache implementations."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """Return counters as a dictionary."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class LRUCache(_Stats):
+    """Thread-safe in-memory cache of API responses.
+
+    Least recently used entries are evicted when either max_entries or
+    max_bytes is exceeded. An optional backend (e.g. DiskCache) is consulted
+    on misses and written through on every set.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=None, backend=None):
+        """
+        :param max_entries: maximum number of entries kept in memory
+        :type max_entries: integer
+        :param max_bytes: maximum size of UTF-8 encoded values in memory
+        :type max_bytes: integer
+        :param backend: second level cache
+        :type backend: spinchimp.cache.DiskCache
+        """
+        super(LRUCache, self).__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._data = collections.OrderedDict()  # key -> (value, size)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Return cached value or None."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._data[key] = entry
+                self.hits += 1
+                return entry[0]
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """Store value under key."""
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def _store(self, key, value):
+        size = len(_utf8(value))
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._data[key] = (value, size)
+            self.bytes += size
+
+            while self._data and (
+                    len(self._data) > self.max_entries or
+                    (self.max_bytes is not None and
+                     self.bytes > self.max_bytes)):
+                evicted = self._data.popitem(last=False)[1]
+                self.bytes -= evicted[1]
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries from memory."""
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Return counters and current size as a dictionary."""
+        stats = super(LRUCache, self).stats()
+        stats.update(entries=len(self._data), bytes=self.bytes)
+        return stats
+
+
+class DiskCache(_Stats):
+    """Cache of API responses stored in a SQLite database.
+
+    Survives restarts of the process and can be shared by processes on the
+    same host. Least recently used entries are evicted above max_entries.
+    """
+
+    def __init__(self, path, max_entries=None):
+        """
+        :param path: path to the SQLite database file
+        :type path: string
+        :param max_entries: maximum number of entries kept on disk
+        :type max_entries: integer
+        """
+        super(DiskCache, self).__init__()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(key TEXT PRIMARY KEY, value TEXT, atime REAL)')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS responses_atime '
+                'ON responses (atime)')
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def get(self, key):
+        """Return cached value or None."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value FROM responses WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._db:
+                self._db.execute(
+                    'UPDATE responses SET atime = ? WHERE key = ?',
+                    (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        """Store value under key."""
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses VALUES (?, ?, ?)',
+                    (key, value, time.time()))
+                if self.max_entries is not None:
+                    evicted = self._db.execute(
+                        'DELETE FROM responses WHERE key IN '
+                        '(SELECT key FROM responses ORDER BY atime DESC '
+                        'LIMIT -1 OFFSET ?)', (self.max_entries,)).rowcount
+                    self.evictions += evicted
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            with self._db:
+                self._db.execute('DELETE FROM responses')
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Splitting of articles that are too long to be spun in one request."""
+
+import bisect
+import re
+
+from spinchimp import exceptions as ex
+
+_WORDS = re.compile(r'\w+', re.UNICODE)
+_GAPS = re.compile(r'\s+', re.UNICODE)
+_TAGS = re.compile(r'<[^>]*>')
+_SENTENCE_END = re.compile(ur'[.!?…]["\'”’)\]]*$', re.UNICODE)
+
+PARAGRAPH = 2
+SENTENCE = 1
+WORD = 0
+
+
+def _protected_spans(text, tagprotect, protectedterms):
+    """Return sorted, disjoint (start, end) spans that must not be split:
+    HTML tags, tagprotect regions and protected terms.
+    """
+    patterns = [_TAGS]
+    for pair in tagprotect.split(','):
+        if '|' in pair:
+            start, end = pair.split('|', 1)
+            patterns.append(re.compile(
+                re.escape(start) + '.*?' + re.escape(end), re.DOTALL))
+    terms = [t.strip() for t in protectedterms.split(',') if t.strip()]
+    if terms:
+        terms.sort(key=len, reverse=True)
+        patterns.append(re.compile(
+            '|'.join(re.escape(t) for t in terms),
+            re.IGNORECASE | re.UNICODE))
+
+    spans = sorted(m.span() for p in patterns for m in p.finditer(text))
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _inside(spans, starts, pos):
+    i = bisect.bisect_right(starts, pos) - 1
+    return i >= 0 and spans[i][0] < pos < spans[i][1]
+
+
+def _word_starts(text):
+    """Return positions of words in text, HTML tags are not words."""
+    text = _TAGS.sub(lambda m: u' ' * len(m.group()), text)
+    return [m.start() for m in _WORDS.finditer(text)]
+
+
+def count_words(text):
+    """Return number of words in text."""
+    return len(_word_starts(text))
+
+
+def split(text, max_words, tagprotect='', protectedterms=''):
+    """ Split text into chunks of at most max_words words.
+
+    Text is split at paragraph boundaries if possible, at sentence
+    boundaries otherwise and between words as a last resort. HTML tags,
+    tagprotect regions and protected terms are never split.
+
+    :raises ArticleError: if a protected region or term is longer than
+        max_words and can not be split any further
+
+    :param text: original text
+    :type text: unicode
+    :param max_words: maximum number of words in a chunk
+    :type max_words: integer
+    :param tagprotect: tagprotect parameter of GlobalSpin
+    :type tagprotect: string
+    :param protectedterms: protectedterms parameter of GlobalSpin
+    :type protectedterms: string
+
+    :return: chunks and whitespace separating them, join() reverses split()
+    :rtype: tuple of two lists
+    """
+    word_starts = _word_starts(text)
+    if len(word_starts) <= max_words:
+        return [text], []
+
+    spans = _protected_spans(text, tagprotect, protectedterms)
+    span_starts = [s[0] for s in spans]
+
+    # candidate cuts by priority: lists of (words before cut, start, end)
+    cuts = {PARAGRAPH: [], SENTENCE: [], WORD: []}
+    for gap in _GAPS.finditer(text):
+        start, end = gap.span()
+        if not start or end == len(text) or \
+                _inside(spans, span_starts, start):
+            continue
+        if '\n' in gap.group():
+            kind = PARAGRAPH
+        elif _SENTENCE_END.search(text, max(0, start - 3), start):
+            kind = SENTENCE
+        else:
+            kind = WORD
+        cuts[kind].append(
+            (bisect.bisect_left(word_starts, start), start, end))
+
+    chunks = []
+    separators = []
+    pos = 0
+    done = 0    # words before pos
+    while len(word_starts) - done > max_words:
+        limit = done + max_words
+        cut = None
+        for kind in (PARAGRAPH, SENTENCE, WORD):
+            candidates = cuts[kind]
+            i = bisect.bisect_right(candidates, (limit, len(text))) - 1
+            if i >= 0 and candidates[i][0] > done:
+                cut = candidates[i]
+                break
+        if cut is None:
+            # no boundary to split at, cut right before the word over limit
+            # or around the protected span it is in
+            start = word_starts[limit]
+            i = bisect.bisect_right(span_starts, start) - 1
+            if i >= 0 and spans[i][0] < start < spans[i][1]:
+                start, end = spans[i]
+                if bisect.bisect_left(word_starts, start) <= done:
+                    # max_words is left unset, the limit is not the problem
+                    raise ex.ArticleError(
+                        'Protected text of {} words is longer than {} '
+                        'words, the maximum of a chunk.'.format(
+                            bisect.bisect_left(word_starts, end) -
+                            bisect.bisect_left(word_starts, start),
+                            max_words))
+            words = bisect.bisect_left(word_starts, start)
+            if words >= len(word_starts):
+                break
+            cut = (words, start, start)
+
+        chunks.append(text[pos:cut[1]])
+        separators.append(text[cut[1]:cut[2]])
+        pos = cut[2]
+        done = cut[0]
+
+    chunks.append(text[pos:])
+    return chunks, separators
+
+
+def join(chunks, separators):
+    """ Join (spun) chunks with separators returned by split().
+
+    :rtype: unicode
+    """
+    parts = [chunks[0]]
+    for separator, chunk in zip(separators, chunks[1:]):
+        parts.append(separator)
+        parts.append(chunk)
+    return u''.join(parts)
+
+
+def max_words_from_error(error):
+    """ Return maximum number of words from an 'Article too long' error
+    or None if error does not state it.
+
+    :param error: error raised by the API
+    :type error: spinchimp.exceptions.ArticleError
+    """
+    return getattr(error, 'max_words', None)
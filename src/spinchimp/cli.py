@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""The ``spinchimp`` console command for spinning corpora in bulk.
+
+Articles are read lazily from a JSONL file, a directory tree or stdin,
+spun on a pool of worker threads and written as JSONL as they complete,
+so the corpus is never held in memory::
+
+    $ spinchimp articles.jsonl -o spun.jsonl --checkpoint spun.done \\
+          -w 8 -p quality=3 -p protectedterms=Ovca
+
+Every input line is a JSON object with a text and an optional id, the
+line number is used if id is missing. Files of a directory are read as
+UTF-8 text, their path relative to the directory is used as id. Output
+lines hold the id and either the spun text or the error, lines that are
+not valid items are reported with their line number as id.
+
+With --checkpoint, ids of completed items are appended to a file and
+skipped when the command is run again. A run stops on QuotaLimitError
+and AuthenticationError, after recording items that completed in the
+meantime; items that failed with NetworkError or InternalError are not
+checkpointed so that they are retried by the next run.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import sys
+
+from spinchimp import SpinChimp
+from spinchimp import bulk
+from spinchimp import exceptions as ex
+from spinchimp.ratelimit import TokenBucket
+from spinchimp.retry import RetryPolicy
+from spinchimp.schema import SpinProfile
+
+FATAL = (ex.QuotaLimitError, ex.AuthenticationError)
+"""Errors that stop the run, every following request would fail too"""
+
+TRANSIENT = (ex.NetworkError, ex.InternalError)
+"""Errors of items that are retried by the next run"""
+
+
+_ID_TYPES = (basestring, int, long, float, bool, type(None))
+
+
+def read_jsonl(lines):
+    """ Yield (id, text) of JSON objects, one per line.
+
+    Lines that are not valid items yield their line number as id and a
+    ValueError in place of the text, which is reported like a failed
+    spin.
+
+    :param lines: iterable of lines
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('not a JSON object')
+            id = record.get('id', number)
+            if not isinstance(id, _ID_TYPES):
+                raise ValueError('id must be a string or number')
+            text = record['text']
+            if not isinstance(text, basestring):
+                raise ValueError('text must be a string')
+        except KeyError:
+            yield number, ValueError('Line {}: no text'.format(number))
+        except ValueError as e:
+            yield number, ValueError('Line {}: {}'.format(number, e))
+        else:
+            yield id, text
+
+
+def read_tree(path, pattern='*'):
+    """ Yield (relative path, text) of files in a directory tree, in
+    sorted order.
+
+    :param path: directory to walk
+    :type path: string
+    :param pattern: glob pattern of file names to read
+    :type pattern: string
+    """
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(fnmatch.filter(files, pattern)):
+            filename = os.path.join(root, name)
+            with open(filename) as f:
+                text = f.read().decode('utf-8')
+            yield os.path.relpath(filename, path).decode(
+                sys.getfilesystemencoding()), text
+
+
+class Checkpoint(object):
+    """Ids of completed items, appended to a file as they complete."""
+
+    def __init__(self, path):
+        """
+        :param path: path of the checkpoint file, created if missing
+        :type path: string
+        """
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done.update(
+                    json.loads(line) for line in f if line.strip())
+        self._file = open(path, 'a')
+
+    def __contains__(self, id):
+        return id in self.done
+
+    def add(self, id):
+        """Mark item as completed."""
+        self.done.add(id)
+        self._file.write(json.dumps(id) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """Close the checkpoint file."""
+        self._file.close()
+
+
+def _param(value):
+    name, sep, val = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(
+            'expected NAME=VALUE, got {!r}'.format(value))
+    return name, val.decode('utf-8')
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='spinchimp',
+        description='Spin articles from a JSONL file, a directory tree or '
+                    'stdin and write the results as JSONL.')
+    parser.add_argument(
+        'input', nargs='?', default='-',
+        help='JSONL file, directory or - for JSONL on stdin (default)')
+    parser.add_argument(
+        '-o', '--output', default='-',
+        help='JSONL file to append results to, - for stdout (default)')
+    parser.add_argument(
+        '--checkpoint',
+        help='file recording completed ids, completed items are skipped')
+    parser.add_argument(
+        '--email', default=os.environ.get('SPINCHIMP_EMAIL'),
+        help='account email, defaults to $SPINCHIMP_EMAIL')
+    parser.add_argument(
+        '--apikey', default=os.environ.get('SPINCHIMP_APIKEY'),
+        help='API key, defaults to $SPINCHIMP_APIKEY')
+    parser.add_argument(
+        '--aid', default=os.environ.get('SPINCHIMP_AID', ''),
+        help='application ID, defaults to $SPINCHIMP_AID')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=4,
+        help='number of concurrent requests (default: %(default)s)')
+    parser.add_argument(
+        '-m', '--mode', choices=('unique', 'spintax'), default='unique',
+        help='unique variation or text with spintax (default: %(default)s)')
+    parser.add_argument(
+        '-p', '--param', type=_param, action='append', default=[],
+        metavar='NAME=VALUE', help='GlobalSpin parameter, may be repeated')
+    parser.add_argument(
+        '--chunked', action='store_true',
+        help='split articles over the word limit into chunks')
+    parser.add_argument(
+        '--pattern', default='*',
+        help='glob pattern of files read from a directory (default: *)')
+    parser.add_argument(
+        '--rate', type=float,
+        help='maximum number of requests per second')
+    parser.add_argument(
+        '--retries', type=int, default=3,
+        help='retries of network and server errors (default: %(default)s)')
+    return parser
+
+
+def run(client, items, output, profile=None, workers=4, mode='unique',
+        chunked=False, checkpoint=None, log=None):
+    """ Spin items and write results to output as JSONL.
+
+    :param client: client to spin with
+    :type client: spinchimp.SpinChimp
+    :param items: iterable of (id, text)
+    :param output: file-like object results are written to
+    :param profile: spin parameters
+    :type profile: spinchimp.SpinProfile
+    :param checkpoint: completed items, skipped and extended
+    :type checkpoint: spinchimp.cli.Checkpoint
+    :param log: file-like object for progress messages, stderr if None
+
+    :return: exit status, 0 if all items completed, 1 if some are left
+        for the next run, 2 if the run was stopped on a fatal error
+    :rtype: integer
+    """
+    log = log or sys.stderr
+    spin = client.unique_variation if mode == 'unique' \
+        else client.text_with_spintax
+    stopped = []    # the fatal error once the run is stopped
+
+    def call(item):
+        id, text = item
+        if isinstance(text, ValueError):
+            # invalid input item, see read_jsonl()
+            return id, text
+        if stopped:
+            # queued before the run stopped, left for the next run
+            return id, stopped[0]
+        try:
+            return id, spin(text, profile, chunked=chunked)
+        except FATAL as e:
+            stopped.append(e)
+            return id, e
+        except ex.SpinChimpError as e:
+            return id, e
+
+    def feed(items):
+        for item in items:
+            if stopped:
+                return
+            if checkpoint is None or item[0] not in checkpoint:
+                yield item
+
+    status = 0
+    logged = False
+    results = bulk.imap(call, feed(items), workers=workers, ordered=False)
+    try:
+        # after a fatal error no items are taken, but results of those in
+        # flight are still recorded, so that they are not spun again
+        for index, (id, result) in results:
+            if isinstance(result, FATAL):
+                if not logged:
+                    log.write('Stopped at {!r}: {}\n'.format(id, result))
+                    logged = True
+                continue
+            if isinstance(result, TRANSIENT):
+                log.write('Failed {!r}, left for next run: {}\n'.format(
+                    id, result))
+                status = 1
+                continue
+
+            if isinstance(result, (ex.SpinChimpError, ValueError)):
+                record = {'id': id, 'error': str(result),
+                          'type': type(result).__name__}
+            else:
+                record = {'id': id, 'text': result}
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+            if checkpoint is not None:
+                checkpoint.add(id)
+    finally:
+        results.close()
+    return 2 if stopped else status
+
+
+def main(argv=None):
+    """Entry point of the spinchimp command."""
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if not args.email or not args.apikey:
+        parser.error('--email and --apikey are required')
+
+    try:
+        profile = SpinProfile(dict(args.param))
+    except ex.SpinChimpError as e:
+        parser.error(str(e))
+
+    client = SpinChimp(
+        args.email, args.apikey, args.aid,
+        rate_limiter=TokenBucket(args.rate) if args.rate else None,
+        retry=RetryPolicy(retries={ex.NetworkError: args.retries,
+                                   ex.InternalError: args.retries}),
+    )
+
+    if args.input == '-':
+        return _spin(args, client, profile, read_jsonl(sys.stdin))
+    if os.path.isdir(args.input):
+        return _spin(args, client, profile,
+                     read_tree(args.input, args.pattern))
+    with open(args.input) as f:
+        return _spin(args, client, profile, read_jsonl(f))
+
+
+def _spin(args, client, profile, items):
+    """Run with output and checkpoint given by command line arguments."""
+    output = sys.stdout if args.output == '-' else open(args.output, 'a')
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    try:
+        return run(client, items, output, profile, workers=args.workers,
+                   mode=args.mode, chunked=args.chunked,
+                   checkpoint=checkpoint)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
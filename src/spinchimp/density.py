@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Local word density, counterpart of SpinChimp.word_density()."""
+
+import re
+
+_TOKENS = re.compile(ur"<[^>]*>|([^\W\d_]+(?:['’][^\W\d_]+)*)",
+                     re.UNICODE)
+"""HTML tags (skipped) and words"""
+
+PHRASE_LENGTHS = (2, 3)
+"""Number of words in counted phrases"""
+
+
+def _count(text, minlength):
+    """Count words and phrases of text in a single pass.
+
+    Returns total number of words, word counts and phrase counts. A phrase
+    is only formed by consecutive words that are at least minlength long.
+    """
+    words = {}
+    phrases = {}
+    longest = max(PHRASE_LENGTHS)
+    window = []     # last words that are at least minlength long
+    total = 0
+
+    for match in _TOKENS.finditer(text):
+        word = match.group(1)
+        if word is None:
+            continue
+        total += 1
+        if len(word) < minlength:
+            window = []
+            continue
+
+        word = word.lower()
+        words[word] = words.get(word, 0) + 1
+
+        window.append(word)
+        if len(window) > longest:
+            del window[0]
+        for n in PHRASE_LENGTHS:
+            if len(window) >= n:
+                phrase = u' '.join(window[-n:])
+                phrases[phrase] = phrases.get(phrase, 0) + 1
+
+    return total, words, phrases
+
+
+def densities(text, minlength=3):
+    """ Return density of words and phrases in text as percents.
+
+    Phrases are only reported if they occur more than once.
+
+    :param text: original text
+    :type text: string
+    :param minlength: minimum length of counted words
+    :type minlength: integer
+
+    :return: words and phrases as keys and percents as values
+    :rtype: dictionary
+    """
+    total, words, phrases = _count(text, int(minlength))
+    if not total:
+        return {}
+
+    result = {}
+    scale = 100.0 / total
+    for word, count in words.iteritems():
+        result[word] = count * scale
+    for phrase, count in phrases.iteritems():
+        if count > 1:
+            result[phrase] = count * (phrase.count(u' ') + 1) * scale
+    return result
+
+
+def word_density(text, minlength=3):
+    """ Calculate word densities in the shape of SpinChimp.word_density().
+
+    :param text: original text
+    :type text: string
+    :param minlength: minimum length of counted words
+    :type minlength: integer
+
+    :return: words as keys in dictionary and percents as values
+    :rtype: dictionary
+    """
+    return dict(
+        (term, '{:.2f}'.format(percent))
+        for term, percent in densities(text, minlength).iteritems()
+    )
+
+
+def word_density_many(texts, minlength=3):
+    """ Calculate word densities of many texts in a columnar layout.
+
+    :param texts: iterable of texts
+    :type texts: iterable
+    :param minlength: minimum length of counted words
+    :type minlength: integer
+
+    :return: three lists of the same length: 'text' (index of the text),
+        'term' and 'density' (percents as floats)
+    :rtype: dictionary
+    """
+    columns = {'text': [], 'term': [], 'density': []}
+    index_column = columns['text']
+    term_column = columns['term']
+    density_column = columns['density']
+    for index, text in enumerate(texts):
+        result = densities(text, minlength)
+        index_column.extend([index] * len(result))
+        term_column.extend(result.iterkeys())
+        density_column.extend(result.itervalues())
+    return columns
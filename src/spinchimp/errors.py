@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import re
+import threading
+
+from spinchimp import exceptions as ex
+
+_GROUP = re.compile(r'\(\?P<(\w+)>')
+
+RULES = (
+    (r'Credentials check result:(?:InvalidEmail|SubscriptionExpired|'
+     r'InvalidAPIKey|NotAPIRegistered)', ex.AuthenticationError),
+    (r'No Email specified', ex.AuthenticationError),
+    (r'No API Key specified', ex.AuthenticationError),
+    (r'No Application ID \(aid\) Specified', ex.AuthenticationError),
+    (r'Credentials check result:MaxQueriesReached', ex.QuotaLimitError),
+    (r'Credentials check result:DatabaseFailure', ex.InternalError),
+    (r'There are no words in your article!', ex.ArticleError),
+    (r'Article too long \((?P<words>\d+) words\)\. '
+     r'Max is (?P<max_words>\d+)\.', ex.ArticleError),
+)
+"""Built-in (pattern, exception class) pairs, in order of precedence"""
+
+
+class ErrorClassifier(object):
+    """Maps API error messages to exceptions.
+
+    All patterns are compiled into a single case-insensitive alternation
+    of lookaheads, so a message is classified in one pass that finds the
+    first matching rule at every position. Of those the earliest rule wins,
+    wherever it is in the message, so a message joining several errors is
+    classified by the most important one. Named groups of a pattern are set
+    as attributes of the raised exception, digits are converted to
+    integers.
+    """
+
+    def __init__(self, rules=RULES, default=ex.UnknownError):
+        """
+        :param rules: (pattern, exception class) pairs, earlier pairs win
+            when several patterns match
+        :type rules: iterable
+        :param default: exception class for unrecognized messages
+        :type default: class
+        """
+        self.default = default
+        self._lock = threading.Lock()
+        self._compile(tuple(rules))
+
+    def _compile(self, rules):
+        alternatives = []
+        for i, (pattern, _) in enumerate(rules):
+            # prefix named groups so that every rule can use the same names
+            pattern = _GROUP.sub(r'(?P<r{}_\1>'.format(i), pattern)
+            alternatives.append('(?P<r{}>{})'.format(i, pattern))
+        # a lookahead matches empty, so finditer() tries every position,
+        # including those inside a match of another rule
+        # swapped in one assignment, classify() runs without the lock
+        self._table = (
+            re.compile('(?=' + '|'.join(alternatives) + ')', re.IGNORECASE),
+            tuple(exception for _, exception in rules),
+            rules,
+        )
+
+    def register(self, pattern, exception):
+        """ Register a new error message, e.g. a new credentials check code::
+
+            classifier.register(
+                r'Credentials check result:AccountSuspended',
+                ex.AuthenticationError)
+
+        Registered patterns take precedence over the existing ones.
+
+        :param pattern: regular expression matched against error messages
+        :type pattern: string
+        :param exception: exception class raised for matching messages
+        :type exception: class
+        """
+        with self._lock:
+            self._compile(((pattern, exception),) + self._table[2])
+
+    def classify(self, errormsg):
+        """ Return exception for an error message returned by the API.
+
+        :param errormsg: raw error message
+        :type errormsg: string
+
+        :return: exception instance, not raised
+        :rtype: spinchimp.exceptions.SpinChimpError
+        """
+        pattern, exceptions, _ = self._table
+        best = None
+        for match in pattern.finditer(errormsg):
+            rule = int(match.lastgroup[1:])
+            if best is None or rule < best[0]:
+                best = (rule, match)
+                if rule == 0:
+                    break
+        if best is None:
+            return self.default(errormsg)
+
+        rule, match = best
+        prefix = match.lastgroup + '_'
+        error = exceptions[rule](errormsg)
+        for name, value in match.groupdict().iteritems():
+            if value is not None and name.startswith(prefix):
+                setattr(error, name[len(prefix):],
+                        int(value) if value.isdigit() else value)
+        return error
+
+
+classifier = ErrorClassifier()
+"""Classifier used by SpinChimp"""
+
+register = classifier.register
+classify = classifier.classify
@@ -73,9 +73,15 @@ class InternalError(SpinChimpError):
 
 
 class ArticleError(SpinChimpError):
-    """Raised when spinning article."""
-    def __init__(self, msg):
+    """Raised when spinning article.
+
+    For 'Article too long' errors words and max_words hold the word count
+    of the article and the maximum allowed by the API.
+    """
+    def __init__(self, msg, words=None, max_words=None):
         self.msg = msg
+        self.words = words
+        self.max_words = max_words
 
     def __str__(self):
         return self.msg
@@ -88,3 +94,16 @@ class UnknownError(SpinChimpError):
 
     def __str__(self):
         return self.msg
+
+
+class SpintaxError(SpinChimpError):
+    """Raised when spintax can not be parsed, like unbalanced braces."""
+    def __init__(self, msg):
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
+
+
+class CircuitOpenError(NetworkError):
+    """Raised without calling the API while the circuit breaker is open."""
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Incremental re-spinning of edited articles.
+
+Spun paragraphs are kept in a store keyed by a fingerprint of the
+paragraph and the spin parameters. When an edited article is spun again,
+only new and changed paragraphs are sent to GlobalSpin, all of them in a
+single request, and merged with the stored spins of unchanged paragraphs::
+
+    store = DiskCache('paragraphs.sqlite')
+    spun = respin(sc, article, store)
+    # after an editor changed one paragraph, only it is spun again
+    spun = respin(sc, edited_article, store)
+
+Any spinchimp.cache backend can be used as the store.
+"""
+
+import re
+
+from spinchimp import cache
+from spinchimp import chunking
+from spinchimp import exceptions as ex
+from spinchimp import protect
+from spinchimp import schema
+
+SEPARATOR = u'[%-%]'
+"""Separates paragraphs spun together, protected with protect.TAGPROTECT"""
+
+_BREAKS = re.compile(r'\s*\n\s*', re.UNICODE)
+
+
+def split(text):
+    """ Split text into paragraphs at line breaks.
+
+    :param text: article
+    :type text: unicode
+
+    :return: paragraphs and whitespace separating them, chunking.join()
+        reverses split()
+    :rtype: tuple of two lists
+    """
+    paragraphs = []
+    breaks = []
+    pos = 0
+    for match in _BREAKS.finditer(text):
+        paragraphs.append(text[pos:match.start()])
+        breaks.append(match.group())
+        pos = match.end()
+    paragraphs.append(text[pos:])
+    return paragraphs, breaks
+
+
+def fingerprint(paragraph, params):
+    """ Return key of a spun paragraph in the store.
+
+    :param paragraph: original paragraph
+    :type paragraph: unicode
+    :param params: GlobalSpin parameters, including rewrite
+    :type params: spinchimp.schema.Params
+    """
+    return cache.make_key('GlobalSpin', paragraph, params)
+
+
+def _spin(client, paragraphs, params, mode):
+    """Spin paragraphs in one request, one by one if they can not be
+    told apart in the response.
+    """
+    spin = client.unique_variation if mode == 'unique' \
+        else client.text_with_spintax
+    if len(paragraphs) == 1:
+        return [spin(paragraphs[0], params, chunked=True)]
+
+    tagprotect = params['tagprotect']
+    tagprotect = tagprotect + ',' + protect.TAGPROTECT if tagprotect \
+        else protect.TAGPROTECT
+    result = spin(
+        (u'\n' + SEPARATOR + u'\n').join(paragraphs),
+        schema.GLOBAL_SPIN.compile(params, tagprotect=tagprotect),
+        chunked=True,
+    )
+    parts = result.split(SEPARATOR)
+    if len(parts) == len(paragraphs):
+        return [part.strip(u'\n') for part in parts]
+
+    results = list(client.spin_many(paragraphs, params, mode=mode))
+    for result in results:
+        if isinstance(result, ex.SpinChimpError):
+            raise result
+    return results
+
+
+def respin(client, text, store, params=None, mode='unique'):
+    """ Spin text, reusing stored spins of paragraphs spun before.
+
+    :param client: client to spin with
+    :type client: spinchimp.SpinChimp
+    :param text: original article
+    :type text: unicode
+    :param store: spun paragraphs by fingerprint
+    :type store: spinchimp.cache.LRUCache or spinchimp.cache.DiskCache
+    :param params: parameters to pass along with the request
+    :type params: dictionary or spinchimp.SpinProfile
+    :param mode: 'unique' for a unique variation or 'spintax' for text in
+        spintax format
+    :type mode: string
+
+    :return: processed text
+    :rtype: unicode
+    """
+    rewrite = {'unique': '1', 'spintax': '0'}.get(mode)
+    if rewrite is None:
+        raise ex.WrongParameterVal('mode', mode)
+    params = schema.GLOBAL_SPIN.compile(params, rewrite=rewrite)
+
+    paragraphs, breaks = split(text)
+    keys = [fingerprint(paragraph, params) if paragraph.strip() else None
+            for paragraph in paragraphs]
+    results = [paragraph if key is None else store.get(key)
+               for paragraph, key in zip(paragraphs, keys)]
+
+    changed = [i for i, result in enumerate(results) if result is None]
+    if changed:
+        spun = _spin(client, [paragraphs[i] for i in changed], params, mode)
+        for i, result in zip(changed, spun):
+            results[i] = result
+            store.set(keys[i], result)
+    return chunking.join(results, breaks)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Persistent near-duplicate index of texts, MinHash with banding.
+
+Signatures are split into bands; texts that agree on all values of at
+least one band become candidates, whose similarity is then estimated from
+their full signatures. Band buckets and keys are kept in a SQLite database,
+signatures in a flat file of fixed-size records that is memory-mapped for
+reading, so opening an index loads nothing into memory.
+"""
+
+import array
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+
+from spinchimp.similarity import MinHash
+
+
+class LSHIndex(object):
+    """Near-duplicate index stored in a directory::
+
+        index = LSHIndex('variations.idx')
+        if not index.query(variation, threshold=0.8):
+            index.add(article_id, variation)
+            publish(variation)
+
+    Texts whose similarity is s become candidates with probability
+    1 - (1 - s ** rows) ** bands, where rows = num_perm / bands.
+    """
+
+    def __init__(self, path, minhash=None, bands=32):
+        """
+        :param path: directory of the index, created if missing
+        :type path: string
+        :param minhash: signs texts, ignored when opening an existing index
+            which remembers its settings
+        :type minhash: spinchimp.similarity.MinHash
+        :param bands: number of bands signatures are split into, ignored
+            when opening an existing index
+        :type bands: integer
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(path, 'index.sqlite'), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS meta '
+                '(name TEXT PRIMARY KEY, value INTEGER)')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS items '
+                '(item INTEGER PRIMARY KEY, key TEXT)')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS buckets '
+                '(bucket INTEGER, item INTEGER)')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS buckets_bucket '
+                'ON buckets (bucket)')
+
+        meta = dict(self._db.execute('SELECT name, value FROM meta'))
+        if meta:
+            minhash = MinHash(meta['num_perm'], meta['seed'], meta['size'])
+            bands = meta['bands']
+        else:
+            minhash = minhash or MinHash()
+            if minhash.num_perm % bands:
+                raise ValueError('num_perm must be a multiple of bands')
+            with self._db:
+                self._db.executemany('INSERT INTO meta VALUES (?, ?)', [
+                    ('num_perm', minhash.num_perm),
+                    ('seed', minhash.seed),
+                    ('size', minhash.size),
+                    ('bands', bands),
+                ])
+        self.minhash = minhash
+        self.bands = bands
+        self.rows = minhash.num_perm // bands
+        self._record = minhash.num_perm * array.array('I').itemsize
+
+        self._count = self._db.execute(
+            'SELECT COUNT(*) FROM items').fetchone()[0]
+        self._file = open(os.path.join(path, 'signatures'), 'a+b')
+        # drop signatures appended by an insert that was not committed
+        self._file.truncate(self._count * self._record)
+        self._map = None
+
+    def __len__(self):
+        return self._count
+
+    def _signature(self, text):
+        if isinstance(text, array.array):
+            return text
+        return self.minhash.signature(text)
+
+    def _buckets(self, signature):
+        rows = self.rows
+        return [
+            band << 32 | zlib.crc32(
+                signature[band * rows:(band + 1) * rows].tostring()
+            ) & 0xffffffff
+            for band in xrange(self.bands)
+        ]
+
+    def _stored(self, item):
+        """Return signature of an indexed item from the memory map."""
+        end = (item + 1) * self._record
+        if self._map is None or len(self._map) < end:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        signature = array.array('I')
+        signature.fromstring(self._map[end - self._record:end])
+        return signature
+
+    def add_many(self, items):
+        """ Index many texts in a single transaction.
+
+        :param items: iterable of (key, text or signature)
+        :type items: iterable
+        """
+        with self._lock:
+            count = self._count
+            self._file.seek(0, os.SEEK_END)
+            try:
+                with self._db:
+                    for key, text in items:
+                        signature = self._signature(text)
+                        self._db.execute(
+                            'INSERT INTO items VALUES (?, ?)', (count, key))
+                        self._db.executemany(
+                            'INSERT INTO buckets VALUES (?, ?)',
+                            [(bucket, count)
+                             for bucket in self._buckets(signature)])
+                        self._file.write(signature.tostring())
+                        count += 1
+                    self._file.flush()
+            except BaseException:
+                self._file.truncate(self._count * self._record)
+                raise
+            self._count = count
+
+    def add(self, key, text):
+        """ Index a text.
+
+        :param key: identifies the text in query results
+        :type key: string
+        :param text: text or its signature
+        :type text: unicode or array.array
+        """
+        self.add_many([(key, text)])
+
+    def query(self, text, threshold=0.0):
+        """ Find indexed texts similar to text.
+
+        :param text: text or its signature
+        :type text: unicode or array.array
+        :param threshold: minimum estimated Jaccard similarity
+        :type threshold: float
+
+        :return: (key, similarity) of candidates, most similar first
+        :rtype: list of tuples
+        """
+        signature = self._signature(text)
+        buckets = self._buckets(signature)
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT items.item, items.key FROM items WHERE item IN '
+                '(SELECT item FROM buckets WHERE bucket IN ({}))'.format(
+                    ', '.join('?' * len(buckets))),
+                buckets).fetchall()
+            results = []
+            for item, key in rows:
+                similarity = self.minhash.similarity(
+                    signature, self._stored(item))
+                if similarity >= threshold:
+                    results.append((key, similarity))
+        results.sort(key=lambda result: -result[1])
+        return results
+
+    def close(self):
+        """Close the database and the signature file."""
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+        self._db.close()
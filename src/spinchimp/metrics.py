@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Instrumentation hooks and an in-process metrics collector.
+
+Hooks are objects with before(), after() and error() methods, passed to
+the client with ``SpinChimp(..., hooks=[...])``. Every API request creates
+an Event that is handed to before() once the request is encoded and to
+after() or error() when it completes.
+"""
+
+import bisect
+import threading
+import time
+
+PHASES = ('validate', 'encode', 'wait', 'connect', 'server', 'read',
+          'decode', 'classify')
+"""Phases of the timing breakdown, in order. AsyncConnectionPool reports
+the body read as part of server."""
+
+
+def lap(timings, phase, since):
+    """ Add time elapsed since since to phase and return current time.
+
+    :param timings: seconds by phase
+    :type timings: dictionary
+    """
+    now = time.time()
+    timings[phase] = timings.get(phase, 0.0) + now - since
+    return now
+
+
+class Event(object):
+    """An API request as seen by hooks."""
+
+    __slots__ = ('method', 'request_bytes', 'response_bytes', 'timings',
+                 'attempts', 'cached', 'error', 'started', 'duration')
+
+    def __init__(self, method):
+        self.method = method
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.timings = {}   # seconds by phase, see PHASES
+        self.attempts = 0
+        self.cached = False
+        self.error = None
+        self.started = time.time()
+        self.duration = None
+
+    @property
+    def error_class(self):
+        """Class of the raised spinchimp.exceptions error or None."""
+        return None if self.error is None else type(self.error)
+
+    def lap(self, phase, since):
+        """Add time elapsed since since to phase, return current time."""
+        return lap(self.timings, phase, since)
+
+    def finish(self, error=None):
+        """Record total duration and the error raised, if any."""
+        self.duration = time.time() - self.started
+        self.error = error
+
+
+class Hooks(object):
+    """Base class for hooks, every method does nothing by default."""
+
+    def before(self, event):
+        """Called before the request is sent, once it is encoded."""
+
+    def after(self, event):
+        """Called after a successful request."""
+
+    def error(self, event):
+        """Called after a request failed with a SpinChimpError."""
+
+
+class MetricsCollector(Hooks):
+    """Counts requests, errors, bytes and latency per API method.
+
+    Use as a hook and scrape export() for Prometheus::
+
+        collector = MetricsCollector()
+        sc = SpinChimp(email, apikey, hooks=[collector])
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+               10.0)
+    """Upper bounds of latency histogram buckets in seconds"""
+
+    def __init__(self, buckets=BUCKETS, prefix='spinchimp'):
+        """
+        :param buckets: upper bounds of latency histogram buckets
+        :type buckets: tuple of floats
+        :param prefix: prefix of exported metric names
+        :type prefix: string
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def _record(self, event):
+        with self._lock:
+            m = self._methods.get(event.method)
+            if m is None:
+                m = self._methods[event.method] = {
+                    'requests': 0,
+                    'cached': 0,
+                    'errors': {},
+                    'request_bytes': 0,
+                    'response_bytes': 0,
+                    'histogram': [0] * (len(self.buckets) + 1),
+                    'duration': 0.0,
+                    'phases': {},
+                }
+            m['requests'] += 1
+            m['cached'] += event.cached
+            if event.error is not None:
+                name = type(event.error).__name__
+                m['errors'][name] = m['errors'].get(name, 0) + 1
+            m['request_bytes'] += event.request_bytes
+            m['response_bytes'] += event.response_bytes
+            m['histogram'][
+                bisect.bisect_left(self.buckets, event.duration)] += 1
+            m['duration'] += event.duration
+            for phase, seconds in event.timings.iteritems():
+                m['phases'][phase] = m['phases'].get(phase, 0.0) + seconds
+
+    def after(self, event):
+        self._record(event)
+
+    def error(self, event):
+        self._record(event)
+
+    def stats(self):
+        """Return a copy of collected metrics by method."""
+        with self._lock:
+            return dict(
+                (method, dict(m, errors=dict(m['errors']),
+                              histogram=list(m['histogram']),
+                              phases=dict(m['phases'])))
+                for method, m in self._methods.iteritems())
+
+    def export(self):
+        """ Return metrics in the Prometheus text exposition format.
+
+        :rtype: string
+        """
+        p = self.prefix
+        lines = []
+
+        def family(name, kind, help):
+            lines.append('# HELP {}_{} {}'.format(p, name, help))
+            lines.append('# TYPE {}_{} {}'.format(p, name, kind))
+
+        def sample(name, labels, value):
+            lines.append('{}_{}{{{}}} {}'.format(p, name, ','.join(
+                '{}="{}"'.format(k, v) for k, v in labels),
+                repr(value) if isinstance(value, float) else value))
+
+        stats = sorted(self.stats().iteritems())
+        family('requests_total', 'counter', 'API requests made.')
+        for method, m in stats:
+            sample('requests_total', [('method', method)], m['requests'])
+        family('cache_hits_total', 'counter', 'Requests served from cache.')
+        for method, m in stats:
+            sample('cache_hits_total', [('method', method)], m['cached'])
+        family('errors_total', 'counter', 'Failed requests by exception.')
+        for method, m in stats:
+            for name, count in sorted(m['errors'].iteritems()):
+                sample('errors_total',
+                       [('method', method), ('error', name)], count)
+        for name in ('request_bytes', 'response_bytes'):
+            family(name + '_total', 'counter', 'Bytes of {}s.'.format(
+                name.split('_')[0]))
+            for method, m in stats:
+                sample(name + '_total', [('method', method)], m[name])
+        family('phase_seconds_total', 'counter',
+               'Time spent in phases of requests.')
+        for method, m in stats:
+            for phase in PHASES:
+                if phase in m['phases']:
+                    sample('phase_seconds_total',
+                           [('method', method), ('phase', phase)],
+                           m['phases'][phase])
+
+        name = 'request_duration_seconds'
+        family(name, 'histogram', 'Duration of requests.')
+        for method, m in stats:
+            count = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',),
+                                     m['histogram']):
+                count += bucket
+                sample(name + '_bucket',
+                       [('method', method), ('le', bound)], count)
+            sample(name + '_sum', [('method', method)], m['duration'])
+            sample(name + '_count', [('method', method)], count)
+        return '\n'.join(lines) + '\n'
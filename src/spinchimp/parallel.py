@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Process pool for CPU-bound local operations.
+
+Expanding spintax, computing word densities and splitting HTML articles
+into chunks are pure Python and hold the GIL, so threads sharing a process
+with the HTTP client do not run them in parallel. ProcessPool runs them on
+worker processes instead. Texts are sent to the workers in batches, each
+batch is pickled once and results come back as a single list (densities
+as columns), which keeps the serialization overhead per text low.
+"""
+
+import collections
+import itertools
+import multiprocessing
+
+from spinchimp import chunking
+from spinchimp import density
+from spinchimp import spintax
+
+
+def _spin_batch(args):
+    start, texts, seed, options = args
+    return [
+        spintax.spin(text, seed=None if seed is None else (seed, index),
+                     **options)
+        for index, text in enumerate(texts, start)
+    ]
+
+
+def _density_batch(args):
+    start, texts, minlength = args
+    columns = density.word_density_many(texts, minlength)
+    columns['text'] = [start + i for i in columns['text']]
+    return columns
+
+
+def _split_batch(args):
+    start, texts, max_words, tagprotect, protectedterms = args
+    return [chunking.split(text, max_words, tagprotect, protectedterms)
+            for text in texts]
+
+
+def _batches(items, size):
+    items = iter(items)
+    start = 0
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield start, batch
+        start += len(batch)
+
+
+class ProcessPool(object):
+    """A pool of worker processes for spintax expansion, word density and
+    chunking.
+
+    Use as a context manager or call close() when done::
+
+        with ProcessPool() as pool:
+            for text in pool.spin_many(texts_with_spintax):
+                ...
+    """
+
+    def __init__(self, processes=None, batch_size=64):
+        """
+        :param processes: number of worker processes, defaults to the
+            number of CPUs
+        :type processes: integer
+        :param batch_size: number of texts sent to a worker at once
+        :type batch_size: integer
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+        self._pool = multiprocessing.Pool(self.processes)
+
+    def _map(self, func, tasks):
+        """Yield results of func for tasks in order, with at most two
+        tasks per process in flight."""
+        window = self.processes * 2
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(self._pool.apply_async(func, (task,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        for result in pending:
+            yield result.get()
+
+    def spin_many(self, texts, seed=None, dontincludeoriginal=False,
+                  reorderparagraphs=False):
+        """ Yield a random variation of every text, in input order.
+
+        Parallel counterpart of spinchimp.spintax.spin().
+
+        :param texts: iterable of texts in spintax format
+        :type texts: iterable
+        :param seed: seed for reproducible results, every text gets its own
+            generator seeded with (seed, index)
+
+        :return: generator of unspun texts
+        :rtype: generator
+        """
+        options = {
+            'dontincludeoriginal': dontincludeoriginal,
+            'reorderparagraphs': reorderparagraphs,
+        }
+        tasks = ((start, batch, seed, options)
+                 for start, batch in _batches(texts, self.batch_size))
+        for results in self._map(_spin_batch, tasks):
+            for result in results:
+                yield result
+
+    def word_density_many(self, texts, minlength=3):
+        """ Parallel counterpart of spinchimp.density.word_density_many().
+
+        :param texts: iterable of texts
+        :type texts: iterable
+        :param minlength: minimum length of counted words
+        :type minlength: integer
+
+        :return: columns 'text', 'term' and 'density'
+        :rtype: dictionary
+        """
+        columns = {'text': [], 'term': [], 'density': []}
+        tasks = ((start, batch, minlength)
+                 for start, batch in _batches(texts, self.batch_size))
+        for result in self._map(_density_batch, tasks):
+            for name, column in columns.iteritems():
+                column.extend(result[name])
+        return columns
+
+    def split_many(self, texts, max_words, tagprotect='', protectedterms=''):
+        """ Yield chunks and separators of every text, in input order.
+
+        Parallel counterpart of spinchimp.chunking.split(), which keeps HTML
+        tags, tagprotect regions and protected terms whole.
+
+        :param texts: iterable of texts
+        :type texts: iterable
+        :param max_words: maximum number of words in a chunk
+        :type max_words: integer
+
+        :return: generator of (chunks, separators) tuples
+        :rtype: generator
+        """
+        tasks = ((start, batch, max_words, tagprotect, protectedterms)
+                 for start, batch in _batches(texts, self.batch_size))
+        for results in self._map(_split_batch, tasks):
+            for result in results:
+                yield result
+
+    def close(self):
+        """Stop the worker processes."""
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import httplib
+import socket
+import threading
+import time
+import urlparse
+
+from spinchimp import exceptions as ex
+from spinchimp import metrics
+from spinchimp import stream
+
+
+class ConnectionPool(object):
+    """A thread-safe pool of persistent (keep-alive) HTTP connections.
+
+    Connections are kept per host and reused for subsequent requests instead
+    of opening a new socket for every API call. A single pool can be shared
+    by any number of threads.
+    """
+
+    def __init__(self, maxsize=10, maxsize_per_host=4, idle_timeout=60,
+                 timeout=10, block=True):
+        """
+        :param maxsize: maximum number of open connections in total
+        :type maxsize: integer
+        :param maxsize_per_host: maximum number of open connections per host
+        :type maxsize_per_host: integer
+        :param idle_timeout: seconds after which an idle connection is closed
+        :type idle_timeout: float
+        :param timeout: default socket timeout in seconds
+        :type timeout: float
+        :param block: wait for a free connection when the pool is exhausted,
+            otherwise raise NetworkError
+        :type block: boolean
+        """
+        self.maxsize = maxsize
+        self.maxsize_per_host = min(maxsize_per_host, maxsize)
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.block = block
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = {}    # host key -> list of (last used, connection)
+        self._open = {}    # host key -> number of open connections
+        self._total = 0
+
+    def _new_connection(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            return httplib.HTTPSConnection(host, port, timeout=self.timeout)
+        return httplib.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _evict_idle(self, now):
+        """Close connections that were idle for too long. Caller holds lock."""
+        for key, idle in self._idle.items():
+            fresh = [i for i in idle if now - i[0] < self.idle_timeout]
+            for last_used, conn in idle:
+                if now - last_used >= self.idle_timeout:
+                    self._discard(key, conn)
+            self._idle[key] = fresh
+
+    def _evict_oldest(self):
+        """Close the least recently used idle connection of any host.
+        Caller holds lock. Returns False if there is nothing to evict.
+        """
+        oldest = None
+        for key, idle in self._idle.items():
+            if idle and (oldest is None or idle[0][0] < oldest[1]):
+                oldest = (key, idle[0][0])
+        if oldest is None:
+            return False
+        key = oldest[0]
+        self._discard(key, self._idle[key].pop(0)[1])
+        return True
+
+    def _discard(self, key, conn):
+        """Close connection and forget about it. Caller holds lock."""
+        conn.close()
+        self._open[key] -= 1
+        self._total -= 1
+
+    def _acquire(self, key):
+        with self._cond:
+            while True:
+                now = time.time()
+                self._evict_idle(now)
+
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop()[1], True
+
+                if (self._open.get(key, 0) < self.maxsize_per_host and
+                        (self._total < self.maxsize or self._evict_oldest())):
+                    self._open[key] = self._open.get(key, 0) + 1
+                    self._total += 1
+                    return self._new_connection(key), False
+
+                if not self.block:
+                    raise ex.NetworkError('Connection pool is exhausted.')
+                self._cond.wait(self.idle_timeout)
+
+    def _release(self, key, conn, reusable):
+        with self._cond:
+            if reusable:
+                self._idle.setdefault(key, []).append((time.time(), conn))
+            else:
+                self._discard(key, conn)
+            self._cond.notify()
+
+    def request(self, url, data='', timeout=None, headers=None,
+                timings=None, output=None):
+        """POST data to url over a pooled connection and return response body.
+
+        :param url: absolute URL including the query string
+        :type url: string
+        :param data: request body, a string or a file-like object or an
+            iterable of strings sent in blocks, see spinchimp.stream
+        :param timeout: socket timeout in seconds, pool default if None
+        :type timeout: float
+        :param timings: seconds spent to connect, until the response
+            (server) and reading the body (read) are added to it
+        :type timings: dictionary
+        :param output: the response body is written to it in blocks instead
+            of being returned, unless the request failed with a HTTP error
+        :type output: file-like object with write()
+
+        :return: response body
+        :rtype: string
+        """
+        parts = urlparse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        request_headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Connection': 'keep-alive',
+        }
+        request_headers.update(headers or {})
+        streamed = not isinstance(data, basestring)
+        # a body can only be sent again if it can be rewound
+        start = stream.position(data) if streamed else None
+        replayable = not streamed or start is not None
+
+        while True:
+            clock = time.time()
+            conn, reused = self._acquire(key)
+            reusable = False
+            written = False
+            try:
+                conn.timeout = timeout or self.timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(conn.timeout)
+                elif timings is not None:
+                    conn.connect()
+                if timings is not None:
+                    clock = metrics.lap(timings, 'connect', clock)
+                if streamed:
+                    if start is not None:
+                        data.seek(start)
+                    self._send_stream(conn, path, data, request_headers)
+                else:
+                    conn.request('POST', path, data, request_headers)
+                response = conn.getresponse()
+                if timings is not None:
+                    clock = metrics.lap(timings, 'server', clock)
+                if output is None or response.status >= 400:
+                    body = response.read()
+                else:
+                    body = ''
+                    for block in stream.blocks(response):
+                        written = True
+                        output.write(block)
+                if timings is not None:
+                    metrics.lap(timings, 'read', clock)
+                reusable = not response.will_close
+            except (httplib.HTTPException, socket.error) as e:
+                if reused and replayable and not written:
+                    # the server may have dropped an idle keep-alive
+                    # connection, try again on a fresh one
+                    continue
+                raise ex.NetworkError(str(e) or e.__class__.__name__)
+            finally:
+                self._release(key, conn, reusable)
+
+            if response.status >= 400:
+                raise ex.NetworkError('HTTP Error {}: {}'.format(
+                    response.status, response.reason))
+            return body
+
+    @staticmethod
+    def _send_stream(conn, path, data, headers):
+        """Send a request with a body read from data in blocks."""
+        length = stream.length(data)
+        conn.putrequest('POST', path)
+        for name, value in headers.iteritems():
+            conn.putheader(name, value)
+        if length is None:
+            conn.putheader('Transfer-Encoding', 'chunked')
+        else:
+            conn.putheader('Content-Length', str(length))
+        conn.endheaders()
+        for block in stream.blocks(data):
+            if length is None:
+                block = '{:x}\r\n{}\r\n'.format(len(block), block)
+            conn.send(block)
+        if length is None:
+            conn.send('0\r\n\r\n')
+
+    def clear(self):
+        """Close all idle connections."""
+        with self._cond:
+            for key, idle in self._idle.items():
+                for last_used, conn in idle:
+                    self._discard(key, conn)
+            self._idle.clear()
+            self._cond.notify_all()
+
+    @property
+    def size(self):
+        """Number of connections currently open."""
+        return self._total
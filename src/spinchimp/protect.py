@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Local handling of protectedterms and tagprotect.
+
+Instead of sending a long list of protected terms with every request,
+protected terms and tagprotect regions are found locally in one pass of an
+Aho-Corasick automaton and replaced with short placeholders like ``[%0%]``,
+which are protected from spinning with ``tagprotect=[%|%]``. The originals
+are put back into the spun text.
+"""
+
+import re
+
+PLACEHOLDER = u'[%{}%]'
+"""Format of placeholders"""
+
+TAGPROTECT = '[%|%]'
+"""tagprotect parameter that protects placeholders"""
+
+_PLACEHOLDERS = re.compile(ur'\[%(\d+)%\]')
+
+CACHE_SIZE = 64
+"""Maximum number of compiled protectors kept by compile()"""
+
+_cache = {}
+
+
+class Matcher(object):
+    """Aho-Corasick automaton finding many patterns in one pass."""
+
+    def __init__(self, patterns):
+        """
+        :param patterns: strings to find, matched case-insensitively
+        :type patterns: list of unicode
+        """
+        self.patterns = patterns
+        goto = [{}]
+        output = [[]]   # pattern indexes ending at the node
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern.lower():
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = goto[node][char] = len(goto)
+                    goto.append({})
+                    output.append([])
+                node = next_node
+            output[node].append(index)
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].itervalues())
+        for node in queue:
+            for char, child in goto[node].iteritems():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                output[child] = output[child] + output[fail[child]]
+                queue.append(child)
+
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+
+    def finditer(self, text):
+        """ Yield (start, end, pattern index) of all matches in text, in
+        order of their end.
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        patterns = self.patterns
+        state = 0
+        for pos, char in enumerate(text.lower()):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield pos + 1 - len(patterns[index]), pos + 1, index
+
+
+def _is_word(text, pos):
+    return 0 <= pos < len(text) and (text[pos].isalnum() or text[pos] == '_')
+
+
+def _merge(spans, extra):
+    """Add sorted, disjoint extra spans that overlap none of spans."""
+    merged = []
+    i = 0
+    for start, end in extra:
+        while i < len(spans) and spans[i][1] <= start:
+            merged.append(spans[i])
+            i += 1
+        if i < len(spans) and spans[i][0] < end:
+            continue
+        merged.append((start, end))
+    merged.extend(spans[i:])
+    return merged
+
+
+class Protector(object):
+    """Replaces protected terms and tagprotect regions with placeholders."""
+
+    def __init__(self, protectedterms=u'', tagprotect=u''):
+        """
+        :param protectedterms: protectedterms parameter of GlobalSpin, comma
+            separated terms matched as whole words, ignoring case
+        :type protectedterms: unicode
+        :param tagprotect: tagprotect parameter of GlobalSpin, comma
+            separated start|end pairs
+        :type tagprotect: unicode
+        """
+        patterns = []
+        self._ends = []     # end marker of tagprotect patterns, else None
+        for term in protectedterms.split(u','):
+            if term.strip():
+                patterns.append(term.strip())
+                self._ends.append(None)
+        for pair in tagprotect.split(u','):
+            start, sep, end = pair.partition(u'|')
+            if sep and start and end:
+                patterns.append(start)
+                self._ends.append(end)
+        self._matcher = Matcher(patterns) if patterns else None
+
+    def __nonzero__(self):
+        return self._matcher is not None
+
+    def _spans(self, text):
+        """Return sorted, disjoint spans to protect, leftmost longest."""
+        candidates = []
+        for start, end, index in self._matcher.finditer(text):
+            if self._ends[index] is None and (
+                    _is_word(text, start - 1) or _is_word(text, end)):
+                continue
+            candidates.append((start, -end, index))
+        candidates.sort()
+
+        spans = []
+        pos = 0
+        for start, end, index in candidates:
+            if start < pos:
+                continue
+            end = -end
+            marker = self._ends[index]
+            if marker is not None:
+                found = text.find(marker, end)
+                if found < 0:
+                    continue
+                end = found + len(marker)
+            spans.append((start, end))
+            pos = end
+        return spans
+
+    def protect(self, text):
+        """ Replace protected parts of text with placeholders.
+
+        :param text: original text
+        :type text: unicode
+
+        :return: text with placeholders and the replaced originals
+        :rtype: tuple
+        """
+        if self._matcher is None:
+            return text, []
+        # text that looks like a placeholder is replaced as well, so that
+        # restore() puts it back literally
+        literal = [match.span() for match in _PLACEHOLDERS.finditer(text)]
+        spans = _merge(self._spans(text), literal)
+        parts = []
+        originals = []
+        pos = 0
+        for start, end in spans:
+            parts.append(text[pos:start])
+            parts.append(PLACEHOLDER.format(len(originals)))
+            originals.append(text[start:end])
+            pos = end
+        parts.append(text[pos:])
+        return u''.join(parts), originals
+
+    @staticmethod
+    def restore(text, originals):
+        """ Put originals back in place of placeholders.
+
+        :param text: spun text with placeholders
+        :type text: unicode
+        :param originals: originals returned by protect()
+        :type originals: list
+        """
+        if not originals:
+            return text
+
+        def replace(match):
+            index = int(match.group(1))
+            return originals[index] if index < len(originals) \
+                else match.group()
+        return _PLACEHOLDERS.sub(replace, text)
+
+
+def compile(protectedterms=u'', tagprotect=u''):
+    """ Return a Protector, compiled once for every distinct pair of
+    parameters.
+
+    :param protectedterms: protectedterms parameter, UTF-8 or unicode
+    :param tagprotect: tagprotect parameter, UTF-8 or unicode
+
+    :rtype: spinchimp.protect.Protector
+    """
+    key = (protectedterms, tagprotect)
+    protector = _cache.get(key)
+    if protector is None:
+        if isinstance(protectedterms, str):
+            protectedterms = protectedterms.decode('utf-8')
+        if isinstance(tagprotect, str):
+            tagprotect = tagprotect.decode('utf-8')
+        protector = Protector(protectedterms, tagprotect)
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        protector = _cache.setdefault(key, protector)
+    return protector
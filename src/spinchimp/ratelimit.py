@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket rate limiter.
+
+    Allows `rate` requests per second on average and bursts of up to
+    `burst` requests. Callers that have to wait are served in order of
+    arrival.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: requests per second
+        :type rate: float
+        :param burst: maximum number of requests sent at once
+        :type burst: integer
+        """
+        self.rate = float(rate)
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.time()
+
+        self.requests = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _take(self, tokens, available, updated, now):
+        """Return new token balance and seconds to wait for tokens."""
+        available = min(self.burst,
+                        available + max(0, now - updated) * self.rate)
+        available -= tokens
+        wait = -available / self.rate if available < 0 else 0.0
+        return available, wait
+
+    def _reserve(self, tokens):
+        with self._lock:
+            # the clock is read under the lock, a time read before it could
+            # be older than _updated and the elapsed time counted twice
+            now = time.time()
+            self._tokens, wait = self._take(
+                tokens, self._tokens, self._updated, now)
+            self._updated = now
+            return wait
+
+    def reserve(self, tokens=1):
+        """ Take tokens from the bucket without waiting.
+
+        :return: seconds the caller has to wait before sending
+        :rtype: float
+        """
+        wait = self._reserve(tokens)
+        with self._lock:
+            self.requests += 1
+            if wait > 0:
+                self.waits += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def acquire(self, tokens=1):
+        """Wait until tokens are available."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def stats(self):
+        """Return wait time statistics as a dictionary."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'waits': self.waits,
+                'total_wait': self.total_wait,
+                'max_wait': self.max_wait,
+                'mean_wait': (self.total_wait / self.requests
+                              if self.requests else 0.0),
+            }
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket shared by all processes on a host.
+
+    State of the bucket is kept in a small file locked with flock(2), every
+    process using the same path draws from the same bucket. Statistics are
+    kept per process.
+    """
+
+    _STATE = struct.Struct('<dd')  # tokens, last update
+
+    def __init__(self, path, rate, burst=1):
+        """
+        :param path: path of the state file, created if missing
+        :type path: string
+        :param rate: requests per second
+        :type rate: float
+        :param burst: maximum number of requests sent at once
+        :type burst: integer
+        """
+        import fcntl  # not available on Windows
+        self._fcntl = fcntl
+        super(FileTokenBucket, self).__init__(rate, burst)
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def _reserve(self, tokens):
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                data = os.read(self._fd, self._STATE.size)
+                if len(data) == self._STATE.size:
+                    available, updated = self._STATE.unpack(data)
+                else:
+                    available, updated = float(self.burst), now
+                available, wait = self._take(tokens, available, updated, now)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, self._STATE.pack(available, now))
+                return wait
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    def close(self):
+        """Close the state file."""
+        os.close(self._fd)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+import time
+
+from spinchimp import exceptions as ex
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker(object):
+    """Fails fast while the API is down.
+
+    After failure_threshold consecutive failures the circuit opens and
+    requests raise CircuitOpenError without calling the API. After
+    reset_timeout seconds a single trial request is let through, its
+    outcome closes or opens the circuit again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30,
+                 errors=(ex.NetworkError, ex.InternalError),
+                 trial_timeout=60):
+        """
+        :param failure_threshold: consecutive failures that open the circuit
+        :type failure_threshold: integer
+        :param reset_timeout: seconds before a trial request is let through
+        :type reset_timeout: float
+        :param errors: exception classes counted as failures
+        :type errors: tuple
+        :param trial_timeout: seconds after which a trial request whose
+            outcome was not recorded is replaced by a new one
+        :type trial_timeout: float
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.errors = errors
+        self.trial_timeout = trial_timeout
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = None     # or start of the half-open trial
+        self._lock = threading.Lock()
+
+    def before(self):
+        """Raise CircuitOpenError if requests may not be sent."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.time()
+            timeout = self.reset_timeout if self.state == OPEN \
+                else self.trial_timeout
+            if now - self._opened_at >= timeout:
+                self.state = HALF_OPEN
+                self._opened_at = now
+                return
+            raise ex.CircuitOpenError('Circuit breaker is {}.'.format(
+                self.state))
+
+    def success(self):
+        """Record a successful request."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def failure(self, error):
+        """Record a failed request. Errors that are not counted end a
+        half-open trial like a success, the API did answer.
+        """
+        if isinstance(error, ex.CircuitOpenError):
+            return
+        with self._lock:
+            if not isinstance(error, self.errors):
+                if self.state == HALF_OPEN:
+                    self.state = CLOSED
+                    self.failures = 0
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or \
+                    self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self._opened_at = time.time()
+
+    def stats(self):
+        """Return state and counters as a dictionary."""
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'opened': self.opened,
+        }
+
+
+class RetryPolicy(object):
+    """Retries failed requests with jittered exponential backoff.
+
+    The number of retries is configured per exception class, the most
+    specific class of a raised error wins. Errors caused by the request
+    itself (AuthenticationError, ArticleError) are never retried.
+    """
+
+    NEVER = (
+        ex.AuthenticationError,
+        ex.ArticleError,
+        ex.CircuitOpenError,
+        ex.WrongParameterName,
+        ex.WrongParameterVal,
+    )
+    """Exception classes that are never retried"""
+
+    def __init__(self, retries=None, base_delay=0.5, max_delay=30,
+                 deadline=None, breaker=None, rng=None):
+        """
+        :param retries: maximum number of retries by exception class,
+            defaults to 3 for NetworkError and InternalError
+        :type retries: dictionary
+        :param base_delay: delay before the first retry in seconds, doubled
+            for every next retry
+        :type base_delay: float
+        :param max_delay: maximum delay between retries in seconds
+        :type max_delay: float
+        :param deadline: maximum seconds spent on a call including retries
+        :type deadline: float
+        :param breaker: circuit breaker consulted before every attempt
+        :type breaker: spinchimp.retry.CircuitBreaker
+        """
+        if retries is None:
+            retries = {ex.NetworkError: 3, ex.InternalError: 3}
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker
+        self._rng = rng or random.Random()
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retried = {}   # exception class name -> number of retries
+        self.given_up = 0
+
+    def _max_retries(self, error):
+        if isinstance(error, self.NEVER):
+            return 0
+        for cls in type(error).__mro__:
+            if cls in self.retries:
+                return self.retries[cls]
+        return 0
+
+    def start(self):
+        """Called before the first attempt. Returns start time."""
+        with self._lock:
+            self.calls += 1
+        return time.time()
+
+    def before(self):
+        """Called before every attempt."""
+        with self._lock:
+            self.attempts += 1
+        if self.breaker is not None:
+            self.breaker.before()
+
+    def success(self):
+        """Called after a successful attempt."""
+        if self.breaker is not None:
+            self.breaker.success()
+
+    def failure(self, error, attempt, started):
+        """ Called after a failed attempt.
+
+        :param error: error raised by the attempt
+        :param attempt: number of retries made so far
+        :param started: time of the first attempt
+
+        :return: seconds to wait before retrying or None to give up
+        """
+        if self.breaker is not None:
+            self.breaker.failure(error)
+
+        delay = self._rng.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if attempt >= self._max_retries(error) or (
+                self.deadline is not None and
+                time.time() + delay - started > self.deadline):
+            with self._lock:
+                self.given_up += 1
+            return None
+
+        name = type(error).__name__
+        with self._lock:
+            self.retried[name] = self.retried.get(name, 0) + 1
+        return delay
+
+    def call(self, func, *args, **kwargs):
+        """Call func, retrying on SpinChimpError as configured."""
+        started = self.start()
+        attempt = 0
+        while True:
+            try:
+                self.before()
+                result = func(*args, **kwargs)
+            except ex.SpinChimpError as e:
+                delay = self.failure(e, attempt, started)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self.success()
+                return result
+
+    def stats(self):
+        """Return counters and breaker state as a dictionary."""
+        with self._lock:
+            stats = {
+                'calls': self.calls,
+                'attempts': self.attempts,
+                'retried': dict(self.retried),
+                'given_up': self.given_up,
+            }
+        if self.breaker is not None:
+            stats['breaker'] = self.breaker.stats()
+        return stats
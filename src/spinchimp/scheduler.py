@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+
+from spinchimp import exceptions as ex
+
+DAY = 24 * 60 * 60
+
+
+class QuotaScheduler(object):
+    """Admits API requests based on a local estimate of remaining quota.
+
+    The estimate is polled with QueryStats every poll_interval seconds and
+    decremented for every admitted request, so exhaustion is detected before
+    the API rejects a request. Waiting requests are admitted in order of
+    priority. With spread=True requests are paced so that the remaining
+    quota lasts until the daily reset.
+    """
+
+    def __init__(self, client=None, poll_interval=300, spread=False,
+                 reset_time=0, reserve=0):
+        """
+        :param client: client to poll quota with, set by SpinChimp if None
+        :type client: spinchimp.SpinChimp
+        :param poll_interval: seconds between polls of QueryStats
+        :type poll_interval: float
+        :param spread: pace requests evenly until the daily reset
+        :type spread: boolean
+        :param reset_time: seconds after midnight UTC when quota resets
+        :type reset_time: integer
+        :param reserve: number of requests never admitted, left for other
+            clients of the account
+        :type reserve: integer
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.spread = spread
+        self.reset_time = reset_time
+        self.reserve = reserve
+
+        self.remaining = None
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected = 0
+
+        self._polled = None
+        self._refreshing = False
+        self._spent = 0     # quota admitted in total, see refresh()
+        self._next_slot = 0
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (-priority, sequence number)
+        self._sequence = itertools.count()
+        self._local = threading.local()
+
+    def _day(self, now):
+        return int(now - self.reset_time) // DAY
+
+    def _seconds_to_reset(self, now):
+        return DAY - (now - self.reset_time) % DAY
+
+    def _due(self, now):
+        return (self._polled is None or
+                now - self._polled >= self.poll_interval or
+                self._day(now) != self._day(self._polled))
+
+    def refresh(self):
+        """Poll remaining quota of the account. Quota admitted while the
+        poll is in flight is subtracted from the polled value.
+        """
+        with self._cond:
+            spent = self._spent
+        remaining = int(self.client.quota_left_total())
+        with self._cond:
+            self.remaining = remaining - (self._spent - spent)
+            self._polled = time.time()
+            self._cond.notify_all()
+
+    def exhausted(self):
+        """Mark quota as exhausted, e.g. after the API raised
+        QuotaLimitError.
+        """
+        with self._cond:
+            self.remaining = 0
+
+    @contextlib.contextmanager
+    def priority(self, priority):
+        """Set priority of requests made by the current thread::
+
+            with scheduler.priority(10):
+                sc.unique_variation(text)
+        """
+        previous = getattr(self._local, 'priority', 0)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def acquire(self, cost=1, priority=None, block=True, timeout=None):
+        """ Wait until a request may be sent.
+
+        :param cost: number of queries the request uses
+        :type cost: integer
+        :param priority: higher priority requests are admitted first, see
+            priority() for the default
+        :type priority: integer
+        :param block: wait for pacing and higher priority requests,
+            otherwise reject right away
+        :type block: boolean
+        :param timeout: maximum number of seconds to wait
+        :type timeout: float
+
+        :raises QuotaLimitError: if there is not enough quota left or the
+            request was not admitted in time
+        """
+        if priority is None:
+            priority = getattr(self._local, 'priority', 0)
+        now = time.time()
+        deadline = None if timeout is None else now + timeout
+        with self._cond:
+            # only one thread polls at a time, the others go on with the
+            # estimate or, before the first poll, wait for it
+            while self._refreshing and self.remaining is None:
+                self._cond.wait()
+            poll = not self._refreshing and self._due(now)
+            if poll:
+                self._refreshing = True
+        if poll:
+            try:
+                self.refresh()
+            finally:
+                with self._cond:
+                    self._refreshing = False
+                    self._cond.notify_all()
+
+        with self._cond:
+            entry = (-priority, next(self._sequence))
+            heapq.heappush(self._waiting, entry)
+            waited = False
+            try:
+                while True:
+                    now = time.time()
+                    available = self.remaining - self.reserve
+                    if available < cost:
+                        self.rejected += 1
+                        raise ex.QuotaLimitError(
+                            'Estimated quota left: {}.'.format(
+                                self.remaining))
+
+                    wait = self._next_slot - now if self.spread else 0
+                    if self._waiting[0] == entry and wait <= 0:
+                        self.remaining -= cost
+                        self._spent += cost
+                        self.admitted += 1
+                        if self.spread:
+                            self._next_slot = max(now, self._next_slot) + \
+                                self._seconds_to_reset(now) / available
+                        return
+
+                    if not block or (deadline is not None and
+                                     now >= deadline):
+                        self.rejected += 1
+                        raise ex.QuotaLimitError(
+                            'Request was not admitted in time.')
+
+                    if not waited:
+                        waited = True
+                        self.delayed += 1
+                    if deadline is not None:
+                        wait = min(wait, deadline - now) if wait > 0 \
+                            else deadline - now
+                    self._cond.wait(wait if wait > 0 else None)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def stats(self):
+        """Return estimate and counters as a dictionary."""
+        return {
+            'remaining': self.remaining,
+            'admitted': self.admitted,
+            'delayed': self.delayed,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""Declarative schema of API parameters.
+
+Parameters are validated, completed with defaults and URL-encoded once per
+distinct set; the result is an immutable Params mapping that is interned,
+so passing the same parameters again costs a dictionary lookup.
+"""
+
+import collections
+import urllib
+
+from spinchimp import exceptions as ex
+
+
+class Param(object):
+    """A parameter of an API method."""
+
+    def __init__(self, default=None, values=None, integer=False):
+        """
+        :param default: value sent if the parameter is not given, None to
+            leave it out
+        :type default: string
+        :param values: allowed values, any value is allowed if None
+        :type values: iterable of strings
+        :param integer: value must be an integer
+        :type integer: boolean
+        """
+        self.default = default
+        self.values = None if values is None else frozenset(values)
+        self.integer = integer
+
+    def clean(self, name, value):
+        """ Return value as an UTF-8 encoded string.
+
+        :raises WrongParameterVal: if value is not allowed
+        """
+        if isinstance(value, bool):
+            value = '1' if value else '0'
+        elif isinstance(value, (int, long)):
+            value = str(value)
+        elif isinstance(value, unicode):
+            value = value.encode('utf-8')
+        elif not isinstance(value, str):
+            raise ex.WrongParameterVal(name, value)
+
+        if self.values is not None and value not in self.values:
+            raise ex.WrongParameterVal(name, value)
+        if self.integer:
+            try:
+                int(value)
+            except ValueError:
+                raise ex.WrongParameterVal(name, value)
+        return value
+
+
+class Params(collections.Mapping):
+    """Immutable mapping of validated and UTF-8 encoded parameters.
+
+    The query attribute holds the URL-encoded parameters, without
+    credentials, the schema attribute the schema they were validated with.
+    """
+
+    __slots__ = ('_values', '_hash', 'query', 'schema')
+
+    def __init__(self, values, schema=None):
+        self._values = values
+        self.schema = schema
+        self._hash = hash(frozenset(values.iteritems()))
+        self.query = urllib.urlencode(sorted(values.iteritems()))
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return 'Params({!r})'.format(self._values)
+
+
+class Schema(object):
+    """Parameters of an API method."""
+
+    CACHE_SIZE = 256
+    """Maximum number of distinct parameter sets kept per schema"""
+
+    def __init__(self, fields, strict=True):
+        """
+        :param fields: Param by parameter name
+        :type fields: dictionary
+        :param strict: raise WrongParameterName on unknown parameters,
+            otherwise send them as they are
+        :type strict: boolean
+        """
+        self.fields = fields
+        self.strict = strict
+        self.defaults = dict(
+            (name, field.default) for name, field in fields.iteritems()
+            if field.default is not None)
+        self._cache = {}
+        self._any = Param()
+
+    def compile(self, params=None, **overrides):
+        """ Return validated parameters completed with defaults.
+
+        :param params: parameters to validate, None values are left out
+        :type params: dictionary
+        :param overrides: parameters replacing those in params
+
+        :return: interned parameters, equal inputs return the same object
+        :rtype: spinchimp.schema.Params
+
+        :raises WrongParameterName: on unknown parameter in strict schema
+        :raises WrongParameterVal: on a value that is not allowed
+        """
+        params = params or {}
+        # parameters of another schema are validated again
+        if isinstance(params, Params) and params.schema is self:
+            if all(params.get(k) == v for k, v in overrides.iteritems()):
+                return params
+            if isinstance(params, SpinProfile) and overrides.keys() == [
+                    'rewrite'] and overrides['rewrite'] in params.variants:
+                return params.variants[overrides['rewrite']]
+
+        try:
+            key = (frozenset(params.iteritems()),
+                   frozenset(overrides.iteritems()))
+            compiled = self._cache.get(key)
+        except TypeError:  # unhashable value, can not be interned
+            key = compiled = None
+        if compiled is not None:
+            return compiled
+
+        values = dict(self.defaults)
+        for source in (params, overrides):
+            for name, value in source.iteritems():
+                if value is None:
+                    continue
+                field = self.fields.get(name)
+                if field is None:
+                    if self.strict:
+                        raise ex.WrongParameterName(name)
+                    field = self._any
+                values[name] = field.clean(name, value)
+
+        compiled = Params(values, self)
+        if key is not None:
+            if len(self._cache) >= self.CACHE_SIZE:
+                self._cache.clear()
+            compiled = self._cache.setdefault(key, compiled)
+        return compiled
+
+
+BOOLEAN = ('0', '1')
+
+GLOBAL_SPIN = Schema({
+    'quality': Param('4', ('1', '2', '3', '4', '5')),
+    'posmatch': Param('3', ('0', '1', '2', '3', '4')),
+    'protectedterms': Param(''),
+    'rewrite': Param('0', BOOLEAN),
+    'phraseignorequality': Param('0', BOOLEAN),
+    'spinwithinspin': Param('0', BOOLEAN),
+    'spinwithinhtml': Param('0', BOOLEAN),
+    'applyinstantunique': Param('0', BOOLEAN),
+    'fullcharset': Param('0', BOOLEAN),
+    'spintidy': Param('0', BOOLEAN),
+    'tagprotect': Param(''),
+    'maxspindepth': Param('0', BOOLEAN),
+})
+
+
+class SpinProfile(Params):
+    """Reusable GlobalSpin parameters, validated once::
+
+        profile = SpinProfile(quality='3', protectedterms='Ovca')
+        sc.unique_variation(text, profile)
+
+    Accepted anywhere params are. Query strings for text_with_spintax()
+    (rewrite=0) and unique_variation() (rewrite=1) are built up front, in
+    variants['0'].query and variants['1'].query.
+    """
+
+    __slots__ = ('variants',)
+
+    def __init__(self, params=None, **kwargs):
+        """
+        :param params: GlobalSpin parameters, completed with defaults
+        :type params: dictionary
+        :param kwargs: parameters replacing those in params
+
+        :raises WrongParameterName: on unknown parameter
+        :raises WrongParameterVal: on a value that is not allowed
+        """
+        values = dict(GLOBAL_SPIN.compile(params, **kwargs))
+        super(SpinProfile, self).__init__(values, GLOBAL_SPIN)
+        self.variants = dict(
+            (rewrite, GLOBAL_SPIN.compile(values, rewrite=rewrite))
+            for rewrite in BOOLEAN)
+
+    def __repr__(self):
+        return 'SpinProfile({!r})'.format(self._values)
+
+
+GENERATE_SPIN = Schema({
+    'dontincludeoriginal': Param('0', BOOLEAN),
+    'reorderparagraphs': Param('0', BOOLEAN),
+})
+
+CALC_WORD_DENSITY = Schema({
+    'minlength': Param('3', integer=True),
+})
+
+QUERY_STATS = Schema({
+    'simple': Param('0', BOOLEAN),
+})
+
+SCHEMAS = {
+    'GlobalSpin': GLOBAL_SPIN,
+    'GenerateSpin': GENERATE_SPIN,
+    'CalcWordDensity': CALC_WORD_DENSITY,
+    'QueryStats': QUERY_STATS,
+}
+"""Schema by API method"""
+
+_UNKNOWN = Schema({}, strict=False)
+
+
+def compile(method, params=None, **overrides):
+    """ Return validated parameters of an API method, see Schema.compile().
+    Parameters of unknown methods are only encoded.
+    """
+    return SCHEMAS.get(method, _UNKNOWN).compile(params, **overrides)
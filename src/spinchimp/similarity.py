@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Uniqueness of spun texts measured by shingling and MinHash.
+
+Texts are broken into shingles, runs of consecutive words, and compared by
+the Jaccard similarity of their shingle sets. MinHash signatures estimate
+the same similarity from compact fixed-size arrays, so signatures of many
+texts can be kept in memory and compared quickly.
+"""
+
+import array
+import itertools
+import operator
+import random
+import re
+import zlib
+
+from spinchimp import schema
+
+_WORDS = re.compile(ur"<[^>]*>|([^\W_]+(?:['’][^\W_]+)*)", re.UNICODE)
+"""HTML tags (skipped) and words"""
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = 0xffffffff
+
+
+def shingles(text, size=3):
+    """ Return hashes of all runs of size consecutive words in text.
+
+    Words are lowercased and HTML tags are skipped. Hashes are stable
+    across processes and Python versions.
+
+    :param text: text to shingle
+    :type text: unicode
+    :param size: number of words in a shingle
+    :type size: integer
+
+    :rtype: set of integers
+    """
+    words = [match.group(1).lower() for match in _WORDS.finditer(text)
+             if match.group(1) is not None]
+    if len(words) < size:
+        words = words and [u' '.join(words)]
+        size = 1
+    return set(
+        zlib.crc32(u' '.join(words[i:i + size]).encode('utf-8')) & _MAX_HASH
+        for i in xrange(len(words) - size + 1)
+    )
+
+
+def jaccard(a, b):
+    """ Return Jaccard similarity of two shingle sets, 1.0 if both are
+    empty.
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / float(len(a | b))
+
+
+def uniqueness(original, variation, size=3):
+    """ Return how different variation is from original, between 0.0
+    (same shingles) and 1.0 (no shingle in common).
+
+    :param original: text that was spun
+    :type original: unicode
+    :param variation: spun text
+    :type variation: unicode
+    :param size: number of words in a shingle
+    :type size: integer
+
+    :rtype: float
+    """
+    return 1.0 - jaccard(shingles(original, size), shingles(variation, size))
+
+
+class MinHash(object):
+    """Computes MinHash signatures of texts.
+
+    A signature is an array of num_perm unsigned 32-bit integers, the share
+    of positions two signatures agree on estimates the Jaccard similarity
+    of the texts. Signatures are only comparable if computed with the same
+    num_perm, seed and shingle size.
+    """
+
+    def __init__(self, num_perm=128, seed=1, size=3):
+        """
+        :param num_perm: number of hash functions, the length of signatures
+        :type num_perm: integer
+        :param seed: seed of the hash functions
+        :type seed: integer
+        :param size: number of words in a shingle
+        :type size: integer
+        """
+        self.num_perm = num_perm
+        self.seed = seed
+        self.size = size
+        rng = random.Random(seed)
+        self._perms = [(rng.randint(1, _PRIME - 1), rng.randint(0, _PRIME - 1))
+                       for i in xrange(num_perm)]
+
+    def signature(self, text):
+        """ Return MinHash signature of text.
+
+        :param text: text to sign
+        :type text: unicode
+
+        :rtype: array.array of type 'I'
+        """
+        hashes = shingles(text, self.size)
+        if not hashes:
+            return array.array('I', [_MAX_HASH]) * self.num_perm
+        return array.array('I', [
+            min((a * x + b) % _PRIME for x in hashes) & _MAX_HASH
+            for a, b in self._perms
+        ])
+
+    def similarity(self, a, b):
+        """ Estimate Jaccard similarity of texts from their signatures.
+
+        :rtype: float
+        """
+        return sum(itertools.imap(operator.eq, a, b)) / float(self.num_perm)
+
+    def compare(self, original, variations):
+        """ Estimate uniqueness of many variations of one original.
+
+        The signature of original is computed once.
+
+        :param original: text or signature of the text that was spun
+        :type original: unicode or array.array
+        :param variations: texts or signatures of spun texts
+        :type variations: iterable
+
+        :return: uniqueness of every variation, between 0.0 and 1.0
+        :rtype: list of floats
+        """
+        if not isinstance(original, array.array):
+            original = self.signature(original)
+        return [
+            1.0 - self.similarity(original, variation
+                                  if isinstance(variation, array.array)
+                                  else self.signature(variation))
+            for variation in variations
+        ]
+
+
+def spin_unique(client, text, threshold, params=None, attempts=5, size=3):
+    """ Spin text until the variation is at least threshold unique.
+
+    Quality is lowered by one after every variation that falls short,
+    which lets the API replace more words.
+
+    :param client: client to spin with
+    :type client: spinchimp.SpinChimp
+    :param text: original text
+    :type text: unicode
+    :param threshold: minimum uniqueness, see uniqueness()
+    :type threshold: float
+    :param params: parameters of the first attempt
+    :type params: dictionary or spinchimp.SpinProfile
+    :param attempts: maximum number of variations requested
+    :type attempts: integer
+    :param size: number of words in a shingle
+    :type size: integer
+
+    :return: most unique variation found and its uniqueness
+    :rtype: tuple
+    """
+    params = dict(schema.GLOBAL_SPIN.compile(params))
+    original = shingles(text, size)
+    best = None
+    for attempt in xrange(attempts):
+        variation = client.unique_variation(text, params)
+        score = 1.0 - jaccard(original, shingles(variation, size))
+        if best is None or score > best[1]:
+            best = (variation, score)
+        if score >= threshold:
+            break
+        params['quality'] = str(max(1, int(params['quality']) - 1))
+    return best
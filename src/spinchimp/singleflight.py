@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+
+
+class _Call(object):
+    __slots__ = ('done', 'result', 'exc_info')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls with the same key into one.
+
+    While a call for a key is in flight, other threads calling with the same
+    key wait for it and get its result or exception instead of making the
+    call themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """ Call func unless a call with the same key is in flight.
+
+        :param key: identifies equivalent calls
+        :type key: hashable
+
+        :return: result of func
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.exc_info is not None:
+                raise call.exc_info[0], call.exc_info[1], call.exc_info[2]
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Return number of calls made and shared as a dictionary."""
+        return {'calls': self.calls, 'shared': self.shared}
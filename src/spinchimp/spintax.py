@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""Local processing of spintax as returned by SpinChimp.text_with_spintax().
+
+Spintax is parsed once into a tree of nested tuples from which any number of
+variations can be generated without calling the API::
+
+    >>> from spinchimp import spintax
+    >>> doc = spintax.parse(u'{Hi|Hello} {world|{planet|globe} earth}!')
+    >>> list(doc.variations(2, seed=1))
+    [u'Hi globe earth!', u'Hi world!']
+"""
+
+import random
+import re
+
+from spinchimp import exceptions as ex
+
+_TOKENS = re.compile(r'[{|}]')
+_PARAGRAPHS = re.compile(r'(\r?\n(?:\s*\r?\n)*)')
+
+
+class Group(tuple):
+    """A {a|b|c} choice, a tuple of alternatives. Every alternative is
+    a sequence: a tuple of unicode strings and nested groups.
+    """
+    __slots__ = ()
+
+
+def _compact(parts):
+    """Return parts as a tuple with adjacent strings joined."""
+    seq = []
+    for part in parts:
+        if seq and part.__class__ is not Group and \
+                seq[-1].__class__ is not Group:
+            seq[-1] += part
+        else:
+            seq.append(part)
+    return tuple(seq)
+
+
+def _parse(text):
+    stack = []
+    group = None    # alternatives of the innermost open group
+    seq = []        # parts of the current alternative
+    pos = 0
+
+    for match in _TOKENS.finditer(text):
+        if match.start() > pos:
+            seq.append(text[pos:match.start()])
+        pos = match.end()
+        token = match.group()
+
+        if token == '{':
+            stack.append((group, seq))
+            group, seq = [], []
+        elif group is None:
+            if token == '}':
+                raise ex.SpintaxError(
+                    u"Unexpected '}}' at position {}.".format(match.start()))
+            seq.append(token)
+        elif token == '|':
+            group.append(_compact(seq))
+            seq = []
+        else:
+            group.append(_compact(seq))
+            alternatives = group
+            group, seq = stack.pop()
+            if len(alternatives) == 1:
+                seq.extend(alternatives[0])
+            else:
+                seq.append(Group(alternatives))
+
+    if stack:
+        raise ex.SpintaxError(u"Unclosed '{' in spintax.")
+    if pos < len(text):
+        seq.append(text[pos:])
+    return _compact(seq)
+
+
+def _render(seq, out, rand, skip):
+    """Append a random variation of seq to out. With skip=1 the first
+    (original) alternative of every group is never chosen.
+    """
+    for part in seq:
+        if part.__class__ is Group:
+            _render(part[skip + int(rand() * (len(part) - skip))],
+                    out, rand, skip)
+        else:
+            out.append(part)
+
+
+def _count(seq, counts, skip):
+    """Return number of variations of seq. Counts of seq and all nodes
+    below it are stored in counts, keyed by node id.
+    """
+    total = 1
+    for part in seq:
+        if part.__class__ is Group:
+            group_total = 0
+            for alternative in part[skip:]:
+                group_total += _count(alternative, counts, skip)
+            counts[id(part)] = group_total
+            total *= group_total
+    counts[id(seq)] = total
+    return total
+
+
+def _decode(seq, index, out, counts, skip):
+    """Append variation number index of seq to out. The last group of a
+    sequence is the least significant digit of index.
+    """
+    digits = []
+    for part in reversed(seq):
+        if part.__class__ is Group:
+            index, digit = divmod(index, counts[id(part)])
+            digits.append(digit)
+
+    for part in seq:
+        if part.__class__ is not Group:
+            out.append(part)
+            continue
+        digit = digits.pop()
+        for alternative in part[skip:]:
+            alternative_total = counts[id(alternative)]
+            if digit < alternative_total:
+                _decode(alternative, digit, out, counts, skip)
+                break
+            digit -= alternative_total
+
+
+def _reorder(text, rng):
+    """Shuffle paragraphs of text, keeping line breaks in place."""
+    parts = _PARAGRAPHS.split(text)
+    paragraphs = parts[::2]
+    rng.shuffle(paragraphs)
+    parts[::2] = paragraphs
+    return u''.join(parts)
+
+
+class Spintax(object):
+    """Parsed spintax document.
+
+    The first alternative of every group is the original text, as returned
+    by the API.
+    """
+
+    def __init__(self, text):
+        """
+        :param text: text in spintax format
+        :type text: unicode
+        """
+        self.tree = _parse(text)
+        self._counts = {}
+
+    def _compiled(self, dontincludeoriginal):
+        """Return variation counts of all nodes, computed on first use."""
+        skip = 1 if dontincludeoriginal else 0
+        counts = self._counts.get(skip)
+        if counts is None:
+            counts = {}
+            _count(self.tree, counts, skip)
+            self._counts[skip] = counts
+        return counts
+
+    def count(self, dontincludeoriginal=False):
+        """ Return the exact number of variations of the document.
+
+        Variations are counted by choices made, alternatives that read the
+        same are counted separately.
+
+        :param dontincludeoriginal: do not count original alternatives
+        :type dontincludeoriginal: boolean
+
+        :rtype: integer
+        """
+        return self._compiled(dontincludeoriginal)[id(self.tree)]
+
+    def variation(self, index, dontincludeoriginal=False):
+        """ Return variation number index, 0 <= index < count().
+
+        :param index: number of the variation
+        :type index: integer
+        :param dontincludeoriginal: see count()
+        :type dontincludeoriginal: boolean
+
+        :return: unspun text
+        :rtype: unicode
+        """
+        counts = self._compiled(dontincludeoriginal)
+        if not 0 <= index < counts[id(self.tree)]:
+            raise IndexError(index)
+        out = []
+        _decode(self.tree, index, out, counts,
+                1 if dontincludeoriginal else 0)
+        return u''.join(out)
+
+    def iterate(self, start=0, stop=None, dontincludeoriginal=False):
+        """ Generate variations start to stop (exclusive) in index order.
+
+        Use disjoint ranges to split generation among workers.
+
+        :param start: index of the first variation
+        :type start: integer
+        :param stop: index after the last variation, count() if None
+        :type stop: integer
+        :param dontincludeoriginal: see count()
+        :type dontincludeoriginal: boolean
+
+        :return: generator of unspun texts
+        :rtype: generator
+        """
+        counts = self._compiled(dontincludeoriginal)
+        skip = 1 if dontincludeoriginal else 0
+        total = counts[id(self.tree)]
+        stop = total if stop is None else min(stop, total)
+        index = start
+        while index < stop:
+            out = []
+            _decode(self.tree, index, out, counts, skip)
+            yield u''.join(out)
+            index += 1
+
+    def __iter__(self):
+        return self.iterate()
+
+    def sample(self, rng=random, dontincludeoriginal=False,
+               reorderparagraphs=False):
+        """ Return a single random variation.
+
+        :param rng: random number generator
+        :type rng: random.Random
+        :param dontincludeoriginal: never pick the original alternative
+        :type dontincludeoriginal: boolean
+        :param reorderparagraphs: shuffle paragraphs of the result
+        :type reorderparagraphs: boolean
+
+        :return: unspun text
+        :rtype: unicode
+        """
+        out = []
+        _render(self.tree, out, rng.random, 1 if dontincludeoriginal else 0)
+        text = u''.join(out)
+        if reorderparagraphs:
+            text = _reorder(text, rng)
+        return text
+
+    def variations(self, n, seed=None, unique=False, **options):
+        """ Generate n random variations.
+
+        :param n: number of variations
+        :type n: integer
+        :param seed: seed of the random number generator, for
+            reproducible output
+        :param unique: skip variations that were already generated, fewer
+            than n are returned if the document has not enough of them
+        :type unique: boolean
+        :param options: dontincludeoriginal and reorderparagraphs, see
+            sample()
+
+        :return: generator of unspun texts
+        :rtype: generator
+        """
+        rng = random.Random(seed)
+        if not unique:
+            for i in xrange(n):
+                yield self.sample(rng, **options)
+            return
+
+        seen = set()
+        misses = 0
+        while len(seen) < n and misses < 100:
+            text = self.sample(rng, **options)
+            if text in seen:
+                misses += 1
+                continue
+            misses = 0
+            seen.add(text)
+            yield text
+
+
+def parse(text):
+    """ Parse spintax into a Spintax document.
+
+    :param text: text in spintax format
+    :type text: unicode
+
+    :rtype: spinchimp.spintax.Spintax
+    """
+    return Spintax(text)
+
+
+def spin(text, seed=None, dontincludeoriginal=False, reorderparagraphs=False):
+    """ Return a single random variation of spintax text.
+
+    Local counterpart of SpinChimp.unspun().
+
+    :param text: text in spintax format
+    :type text: unicode
+    :param seed: seed of the random number generator
+
+    :return: unspun text
+    :rtype: unicode
+    """
+    return Spintax(text).sample(
+        random.Random(seed),
+        dontincludeoriginal=dontincludeoriginal,
+        reorderparagraphs=reorderparagraphs,
+    )
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Streaming of request bodies and responses.
+
+Articles can be sent from file-like objects, like open files or mmap
+objects, or from iterables of strings, block by block. Responses are
+decoded incrementally into an output, so no complete copy of a large
+article is built in memory::
+
+    with open('article.html', 'rb') as source, \\
+            io.open('spun.html', 'w', encoding='utf-8') as output:
+        sc.spin_stream(source, output)
+"""
+
+import codecs
+import functools
+import os
+
+BLOCK_SIZE = 64 * 1024
+"""Number of bytes read and sent at once"""
+
+FAILED = 'failed:'
+"""Prefix of API error responses"""
+
+
+def length(data):
+    """ Return number of bytes left to read from data, None if unknown.
+
+    :param data: string or file-like object
+    """
+    if isinstance(data, basestring):
+        return len(data)
+    try:
+        position = data.tell()
+        data.seek(0, os.SEEK_END)
+        end = data.tell()
+        data.seek(position)
+    except (AttributeError, IOError, ValueError):
+        return None
+    return end - position
+
+
+def position(data):
+    """ Return current position of a seekable file-like object, else None.
+    A body can be sent again from this position.
+    """
+    try:
+        return data.tell() if hasattr(data, 'seek') else None
+    except (IOError, ValueError):
+        return None
+
+
+def blocks(data, size=BLOCK_SIZE):
+    """ Yield non-empty, UTF-8 encoded blocks of data.
+
+    :param data: file-like object read in blocks of size, or an iterable of
+        strings or unicode
+    """
+    if hasattr(data, 'read'):
+        data = iter(functools.partial(data.read, size), '')
+    for block in data:
+        if isinstance(block, unicode):
+            block = block.encode('utf-8')
+        if block:
+            yield block
+
+
+class ResponseDecoder(object):
+    """Decodes a response written to it in blocks into an output.
+
+    Error responses, which start with FAILED, are not written to the output
+    but kept and returned by close().
+    """
+
+    def __init__(self, output):
+        """
+        :param output: receives decoded unicode blocks
+        :type output: file-like object with write()
+        """
+        self.output = output
+        self.size = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._head = ''     # beginning of the response, until it is known
+        self._failed = None     # whether the response is an error
+
+    def write(self, data):
+        self.size += len(data)
+        if self._failed is None:
+            self._head += data
+            if len(self._head) < len(FAILED):
+                return
+            self._failed = self._head[:len(FAILED)].lower() == FAILED
+            data = self._head
+            if not self._failed:
+                self._head = ''
+        elif self._failed:
+            self._head += data
+        if not self._failed:
+            self._decode(data)
+
+    def _decode(self, data, final=False):
+        text = self._decoder.decode(data, final)
+        if text:
+            self.output.write(text)
+
+    def close(self):
+        """ Flush decoded text to output.
+
+        :return: the error response or an empty string if the response was
+            written to output
+        :rtype: string
+        """
+        if self._failed is None:
+            # shorter than FAILED
+            self._failed = False
+            self._decode(self._head)
+            self._head = ''
+        if self._failed:
+            return self._head
+        self._decode('', final=True)
+        return ''
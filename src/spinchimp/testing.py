@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""A local stand-in for the Spin Chimp API, for tests and benchmarks.
+
+FakeServer answers GlobalSpin, GenerateSpin, CalcWordDensity, QueryStats
+and TestConnection like the real API does, including ``failed:`` error
+responses, with configurable latency, error rate and quota::
+
+    with FakeServer(latency=0.05, quota=100) as server:
+        sc = SpinChimp('foo@bar.com', 'apikey')
+        sc.URL = server.url
+        sc.text_with_spintax(u'My cat is cool.')
+"""
+
+import BaseHTTPServer
+import SocketServer
+import random
+import re
+import socket
+import threading
+import time
+import urlparse
+
+from spinchimp import chunking
+from spinchimp import density
+from spinchimp import spintax
+
+_LONG_WORDS = re.compile(r'\b([^\W\d_]{4,})\b', re.UNICODE)
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # send headers and body in one segment, a keep-alive client would
+    # otherwise wait for a delayed ACK on every response
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        text = self._read_body().decode('utf-8')
+        url = urlparse.urlsplit(self.path)
+        params = dict(urlparse.parse_qsl(url.query, keep_blank_values=True))
+        body = self.server.fake.respond(url.path.strip('/'), text, params)
+        body = body.encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def _read_body(self):
+        encoding = self.headers.getheader('transfer-encoding', '')
+        if encoding.lower() != 'chunked':
+            length = int(self.headers.getheader('content-length') or 0)
+            return self.rfile.read(length)
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(';')[0], 16)
+            if not size:
+                break
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+        while self.rfile.readline() not in ('\r\n', '\n', ''):
+            pass
+        return ''.join(chunks)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    # handlers of keep-alive connections clients still hold must not keep
+    # the interpreter from exiting
+    daemon_threads = True
+
+    def __init__(self, *args):
+        BaseHTTPServer.HTTPServer.__init__(self, *args)
+        self.connections = set()
+        self._connections_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._connections_lock:
+            self.connections.add(request)
+        SocketServer.ThreadingMixIn.process_request(
+            self, request, client_address)
+
+    def shutdown_request(self, request):
+        with self._connections_lock:
+            self.connections.discard(request)
+        BaseHTTPServer.HTTPServer.shutdown_request(self, request)
+
+    def close_connections(self):
+        """End handlers blocked reading from open connections."""
+        with self._connections_lock:
+            connections = list(self.connections)
+        for request in connections:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+class FakeServer(object):
+    """HTTP server emulating the Spin Chimp API on localhost."""
+
+    QUOTA_METHODS = ('GlobalSpin', 'GenerateSpin', 'CalcWordDensity')
+
+    def __init__(self, latency=0.0, error_rate=0.0, quota=None,
+                 max_words=5000, seed=None, port=0):
+        """
+        :param latency: seconds every response is delayed
+        :type latency: float
+        :param error_rate: share of requests that fail with DatabaseFailure
+        :type error_rate: float
+        :param quota: number of requests that use quota allowed before
+            MaxQueriesReached, unlimited if None
+        :type quota: integer
+        :param max_words: maximum number of words in an article
+        :type max_words: integer
+        :param seed: seed of the random number generator
+        :param port: port to listen on, any free port if 0
+        :type port: integer
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota = quota
+        self.max_words = max_words
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """URL template to set as SpinChimp.URL."""
+        return 'http://127.0.0.1:{}/{{method}}?'.format(
+            self._server.server_address[1])
+
+    def start(self):
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving, close the socket and connections clients keep
+        alive."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._server.close_connections()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, method, text, params):
+        """ Return response body of an API request.
+
+        :param method: API method
+        :type method: string
+        :param text: decoded request body
+        :type text: unicode
+        :param params: query parameters
+        :type params: dictionary
+
+        :rtype: unicode
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        if method == 'TestConnection':
+            return u'OK'
+
+        with self._lock:
+            self.requests += 1
+            error = self._check(method, params)
+            seed = self._rng.random()
+        if error is not None:
+            return u'failed:' + error
+
+        if method == 'GlobalSpin':
+            return self._global_spin(text, params, seed)
+        if method == 'GenerateSpin':
+            return spintax.spin(
+                text,
+                seed=seed,
+                dontincludeoriginal=params.get('dontincludeoriginal') == '1',
+                reorderparagraphs=params.get('reorderparagraphs') == '1',
+            )
+        if method == 'CalcWordDensity':
+            result = density.word_density(
+                text, int(params.get('minlength', 3)))
+            return u'|'.join(u'{},{}'.format(*i) for i in result.items())
+        if method == 'QueryStats':
+            left = 100000 if self.quota is None else self.quota
+            if params.get('simple') == '1':
+                return unicode(left)
+            return (u'Daily limit,100000|Remaining,{}|'
+                    u'Extended quota,0|Bulk quota,0'.format(left))
+        return u'failed:Unknown method ' + method
+
+    def _check(self, method, params):
+        """Return error message of the request or None, called locked."""
+        if not params.get('email'):
+            return u'No Email specified'
+        if not params.get('apikey'):
+            return u'No API Key specified'
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return u'Credentials check result:DatabaseFailure'
+        if self.quota is not None and method in self.QUOTA_METHODS:
+            if self.quota <= 0:
+                return u'Credentials check result:MaxQueriesReached'
+            self.quota -= 1
+        return None
+
+    def _global_spin(self, text, params, seed):
+        words = chunking.count_words(text)
+        if not words:
+            return u'failed:There are no words in your article!'
+        if words > self.max_words:
+            return u'failed:Article too long ({} words). Max is {}.'.format(
+                words, self.max_words)
+
+        # every long word gets a made up synonym
+        result = _LONG_WORDS.sub(
+            lambda m: u'{{{0}|{1}}}'.format(m.group(1), m.group(1)[::-1]),
+            text)
+        if params.get('rewrite') == '1':
+            result = spintax.spin(result, seed=seed)
+        return result
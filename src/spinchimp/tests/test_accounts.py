@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import exceptions as ex
+from spinchimp.accounts import AccountPool
+
+import io
+import mock
+import unittest2 as unittest
+import urlparse
+
+
+class FakeAPI(object):
+    """Answers requests by the email in their URL."""
+
+    def __init__(self, quota):
+        self.quota = quota  # remaining queries by email, None for bad key
+        self.sent = []
+
+    def __call__(self, url, data, timeout, output=None, **kwargs):
+        response = self.respond(url, data)
+        if output is None:
+            return response
+        output.write(response)
+        return ''
+
+    def respond(self, url, data):
+        parts = urlparse.urlsplit(url)
+        email = urlparse.parse_qs(parts.query)['email'][0]
+        method = parts.path.strip('/')
+        if self.quota[email] is None:
+            return 'failed:Credentials check result:InvalidAPIKey'
+        if method == 'QueryStats':
+            return 'Daily limit,100|Remaining,{}|Extended quota,0|' \
+                   'Bulk quota,0'.format(self.quota[email])
+        if hasattr(data, 'read'):
+            data = data.read()
+        self.sent.append((email, data))
+        if self.quota[email] <= 0:
+            return 'failed:Credentials check result:MaxQueriesReached'
+        self.quota[email] -= 1
+        return 'spun'
+
+
+class TestAccountPool(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeAPI({'a@x.com': 2, 'b@x.com': 3, 'c@x.com': None})
+        patcher = mock.patch('spinchimp.pool.ConnectionPool.request',
+                             side_effect=self.api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sc = AccountPool([('a@x.com', 'key'), ('b@x.com', 'key', 'app'),
+                               ('c@x.com', 'bad')])
+
+    def test_routing(self):
+        """Requests go to the account with the most quota left."""
+        for i in xrange(5):
+            self.assertEquals(self.sc.unique_variation(u'foo'), u'spun')
+        self.assertEquals([email for email, text in self.api.sent],
+                          ['b@x.com', 'a@x.com', 'b@x.com', 'a@x.com',
+                           'b@x.com'])
+
+        with self.assertRaises(ex.QuotaLimitError):
+            self.sc.unique_variation(u'foo')
+        # estimates reached zero, no request was sent
+        self.assertEquals(len(self.api.sent), 5)
+
+    def test_health(self):
+        """Accounts that fail authentication are taken out of rotation."""
+        self.sc.unique_variation(u'foo')
+        stats = dict((s['email'], s) for s in self.sc.stats())
+        self.assertFalse(stats['c@x.com']['healthy'])
+        self.assertEquals(stats['c@x.com']['last_error'],
+                          'AuthenticationError')
+        self.assertEquals(stats['b@x.com']['remaining'], 2)
+        self.assertEquals(stats['b@x.com']['requests'], 1)
+        self.assertTrue(stats['a@x.com']['healthy'])
+
+    def test_failover(self):
+        """Requests are sent again with another account on quota errors."""
+        self.sc.quota_all()
+        self.api.quota['b@x.com'] = 0
+        self.assertEquals(self.sc.unique_variation(u'foo'), u'spun')
+        self.assertEquals([email for email, text in self.api.sent],
+                          ['b@x.com', 'a@x.com'])
+        stats = dict((s['email'], s) for s in self.sc.stats())
+        self.assertEquals(stats['b@x.com']['remaining'], 0)
+        self.assertEquals(stats['b@x.com']['last_error'], 'QuotaLimitError')
+
+    def test_failover_stream(self):
+        """Streamed bodies are rewound for the next account."""
+        self.sc.quota_all()
+        self.api.quota['b@x.com'] = 0
+        output = io.StringIO()
+        self.sc.spin_stream(io.BytesIO('foo'), output)
+        self.assertEquals(output.getvalue(), u'spun')
+        self.assertEquals(self.api.sent, [('b@x.com', 'foo'),
+                                          ('a@x.com', 'foo')])
+
+    def test_all_failed(self):
+        """The last error is raised when no account is left."""
+        sc = AccountPool([('c@x.com', 'bad')])
+        with self.assertRaises(ex.AuthenticationError):
+            sc.unique_variation(u'foo')
+        with self.assertRaises(ValueError):
+            AccountPool([])
+
+    def test_quota(self):
+        """Quota is summed over accounts."""
+        self.assertEquals(self.sc.quota_left_total(), u'5')
+        self.assertEquals(self.sc.quota_all()['Daily limit'], u'200')
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import SpinChimp
+from spinchimp import exceptions as ex
+from spinchimp import metrics
+from spinchimp.scheduler import QuotaScheduler
+from spinchimp.testing import FakeServer
+
+import BaseHTTPServer
+import io
+import mock
+import SocketServer
+import threading
+import unittest2 as unittest
+
+try:
+    import trollius as asyncio
+    from spinchimp.aio import AsyncConnectionPool
+    from spinchimp.aio import AsyncSpinChimp
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        text = self.rfile.read(int(self.headers.getheader('content-length')))
+        method = self.path[1:].split('?')[0]
+        if method == 'CalcWordDensity':
+            body = 'cat,50|cool,50'
+        elif method == 'QueryStats':
+            body = 'failed:Credentials check result:MaxQueriesReached'
+        else:
+            body = text.upper()
+        self.server.ports.add(self.client_address[1])
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = False
+
+
+@unittest.skipIf(asyncio is None, 'trollius is not installed')
+class TestAsyncSpinChimp(unittest.TestCase):
+
+    def setUp(self):
+        """Start a local HTTP server and a fresh event loop."""
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.ports = set()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.loop = asyncio.new_event_loop()
+        self.sc = AsyncSpinChimp('foo@bar.com', 'test_api_key', 'test',
+                                 limit=3, loop=self.loop)
+        self.sc.URL = 'http://127.0.0.1:{}/{{method}}?'.format(
+            self.server.server_address[1])
+
+    def tearDown(self):
+        self.sc._pool.clear()
+        # let the loop close transports of cleared connections
+        self.loop.run_until_complete(asyncio.sleep(0, loop=self.loop))
+        self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_unique_variation(self):
+        """Coroutine returns decoded response."""
+        result = self.loop.run_until_complete(
+            self.sc.unique_variation(u'My cat is über cool.'))
+        self.assertEquals(result, u'MY CAT IS üBER COOL.')
+
+    def test_concurrency_limit(self):
+        """Many concurrent calls share at most `limit` connections."""
+        texts = [u'text {}'.format(i) for i in range(20)]
+        results = self.loop.run_until_complete(asyncio.gather(
+            *[self.sc.text_with_spintax(t) for t in texts], loop=self.loop))
+        self.assertEquals(results, [t.upper() for t in texts])
+        self.assertLessEqual(len(self.server.ports), 3)
+
+    def test_spin_many(self):
+        """Results of a coroutine batch are spun text, errors included."""
+        texts = [u'text {}'.format(i) for i in range(10)]
+        results = self.loop.run_until_complete(
+            self.sc.spin_many(texts, mode='spintax'))
+        self.assertEquals(results, [t.upper() for t in texts])
+        self.assertLessEqual(len(self.server.ports), 3)
+
+        results = self.loop.run_until_complete(
+            self.sc.spin_many(iter([u'foo', u'bar']), workers=1,
+                              ordered=False))
+        self.assertEquals(results, [(0, u'FOO'), (1, u'BAR')])
+
+        with mock.patch.object(self.sc, 'unique_variation') as spin:
+            spin.side_effect = ex.QuotaLimitError('MaxQueriesReached')
+            results = self.loop.run_until_complete(
+                self.sc.spin_many([u'foo']))
+        self.assertIsInstance(results[0], ex.QuotaLimitError)
+
+        with self.assertRaises(ex.WrongParameterVal):
+            self.loop.run_until_complete(
+                self.sc.spin_many([u'foo'], mode='foo'))
+
+    def test_test_connection(self):
+        """A pool created for the check is closed afterwards."""
+        with mock.patch.object(SpinChimp, 'URL', self.sc.URL), \
+                mock.patch.object(AsyncConnectionPool, 'clear',
+                                  autospec=True,
+                                  side_effect=AsyncConnectionPool.clear) \
+                as clear:
+            self.assertEquals(self.loop.run_until_complete(
+                AsyncSpinChimp.test_connection(loop=self.loop)), '')
+            self.assertEquals(clear.call_count, 1)
+
+    def test_close_on_error(self):
+        """Connections are closed on errors other than socket errors."""
+        self.loop.run_until_complete(self.sc.text_with_spintax(u'foo'))
+        with mock.patch.object(AsyncConnectionPool, '_read_response',
+                               side_effect=ex.NetworkError('Bad status')), \
+                mock.patch.object(asyncio.StreamWriter, 'close',
+                                  autospec=True,
+                                  side_effect=asyncio.StreamWriter.close) \
+                as close:
+            with self.assertRaises(ex.NetworkError):
+                self.loop.run_until_complete(self.sc.text_with_spintax(u'bar'))
+            self.assertEquals(close.call_count, 1)
+        self.assertEquals(self.sc._pool._idle.values(), [[]])
+
+    def test_word_density(self):
+        """Response is parsed like in SpinChimp.word_density()."""
+        result = self.loop.run_until_complete(
+            self.sc.word_density(u'cat cool'))
+        self.assertEquals(result, {'cat': '50', 'cool': '50'})
+
+    def test_errors(self):
+        """Errors are mapped to spinchimp.exceptions."""
+        with self.assertRaises(ex.QuotaLimitError):
+            self.loop.run_until_complete(self.sc.quota_all())
+        with self.assertRaises(ex.WrongParameterVal):
+            self.loop.run_until_complete(
+                self.sc.unique_variation(u'foo', {'quality': '9'}))
+
+    def test_single_flight(self):
+        """Concurrent identical requests share one connection."""
+        sc = AsyncSpinChimp('foo@bar.com', 'test_api_key', 'test',
+                            single_flight=True, loop=self.loop)
+        sc.URL = self.sc.URL
+        results = self.loop.run_until_complete(asyncio.gather(
+            *[sc.text_with_spintax(u'foo') for i in range(5)],
+            loop=self.loop))
+        sc._pool.clear()
+        self.assertEquals(results, [u'FOO'] * 5)
+        self.assertEquals(
+            sc._single_flight.stats(), {'calls': 1, 'shared': 4})
+
+
+@unittest.skipIf(asyncio is None, 'trollius is not installed')
+class TestAsyncSpinStream(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer(seed=1).start()
+        self.loop = asyncio.new_event_loop()
+        self.collector = metrics.MetricsCollector()
+        self.sc = AsyncSpinChimp('foo@bar.com', 'test_api_key',
+                                 hooks=[self.collector], loop=self.loop)
+        self.sc.URL = self.server.url
+
+    def tearDown(self):
+        self.sc._pool.clear()
+        self.loop.run_until_complete(asyncio.sleep(0, loop=self.loop))
+        self.loop.close()
+        self.server.stop()
+
+    def spin_stream(self, source, output, **kwargs):
+        return self.loop.run_until_complete(
+            self.sc.spin_stream(source, output, **kwargs))
+
+    def test_file(self):
+        """Bodies of known length are streamed and decoded into output."""
+        output = io.StringIO()
+        self.spin_stream(io.BytesIO(u'My cat is über cool.'.encode('utf-8')),
+                         output, mode='spintax')
+        self.assertEquals(output.getvalue(),
+                          u'My cat is {über|rebü} {cool|looc}.')
+        stats = self.collector.stats()['GlobalSpin']
+        self.assertEquals(stats['request_bytes'], 21)
+        self.assertEquals(stats['response_bytes'], 36)
+
+    def test_iterable(self):
+        """Bodies of unknown length are sent with chunked encoding."""
+        output = io.StringIO()
+        self.spin_stream((p for p in [u'My cat ', u'is cool.']), output,
+                         mode='spintax')
+        self.assertEquals(output.getvalue(), u'My cat is {cool|looc}.')
+
+        # the connection is still usable
+        self.assertEquals(
+            self.loop.run_until_complete(self.sc.text_with_spintax(u'cool')),
+            u'{cool|looc}')
+        self.assertEquals(
+            [len(idle) for idle in self.sc._pool._idle.values()], [1])
+
+    def test_error(self):
+        """API errors are raised, nothing is written to output."""
+        output = io.StringIO()
+        with self.assertRaises(ex.ArticleError):
+            self.spin_stream(io.BytesIO(''), output)
+        self.assertEquals(output.getvalue(), u'')
+
+        with self.assertRaises(ex.WrongParameterVal):
+            self.spin_stream(io.BytesIO(''), output, mode='foo')
+
+
+@unittest.skipIf(asyncio is None, 'trollius is not installed')
+class TestAsyncOptions(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer(seed=1, quota=3, max_words=3).start()
+        self.loop = asyncio.new_event_loop()
+        self.pools = []
+
+    def tearDown(self):
+        for pool in self.pools:
+            pool.clear()
+        self.loop.run_until_complete(asyncio.sleep(0, loop=self.loop))
+        self.loop.close()
+        self.server.stop()
+
+    def client(self, **kwargs):
+        sc = AsyncSpinChimp('foo@bar.com', 'test_api_key', loop=self.loop,
+                            **kwargs)
+        sc.URL = self.server.url
+        self.pools.append(sc._pool)
+        return sc
+
+    def test_scheduler(self):
+        """Requests are admitted by the scheduler, polled over HTTP."""
+        scheduler = QuotaScheduler()
+        sc = self.client(scheduler=scheduler)
+        self.pools.append(scheduler.client._pool)
+        for i in range(3):
+            self.loop.run_until_complete(sc.text_with_spintax(u'cool'))
+        with self.assertRaises(ex.QuotaLimitError):
+            self.loop.run_until_complete(sc.text_with_spintax(u'cool'))
+        # rejected locally, the server saw three requests and one poll
+        self.assertEquals(self.server.requests, 4)
+        self.assertEquals(scheduler.stats()['admitted'], 3)
+
+    def test_max_words(self):
+        """Articles are split above max_words."""
+        sc = self.client(max_words=2)
+        self.assertEquals(
+            self.loop.run_until_complete(
+                sc.text_with_spintax(u'cool cat. cool cat.', chunked=True)),
+            u'{cool|looc} cat. {cool|looc} cat.')
+        self.assertEquals(self.server.requests, 2)
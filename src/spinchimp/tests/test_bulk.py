@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import bulk
+from spinchimp import exceptions as ex
+
+import random
+import threading
+import time
+import unittest2 as unittest
+
+
+class TestImap(unittest.TestCase):
+
+    def test_ordered(self):
+        """Results come back in input order regardless of completion."""
+        def func(i):
+            time.sleep(random.random() / 100)
+            return i * 2
+
+        self.assertEquals(
+            list(bulk.imap(func, range(50), workers=8)),
+            [i * 2 for i in range(50)],
+        )
+
+    def test_unordered(self):
+        """Unordered results are (index, result) tuples."""
+        results = list(bulk.imap(lambda i: -i, range(20), ordered=False))
+        self.assertEquals(sorted(results), [(i, -i) for i in range(20)])
+
+    def test_bounded(self):
+        """No more than `workers` calls run at once."""
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def func(i):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.001)
+            with lock:
+                running[0] -= 1
+
+        list(bulk.imap(func, range(40), workers=3))
+        self.assertLessEqual(running[1], 3)
+
+    def test_errors(self):
+        """SpinChimpError is returned per item, other errors propagate."""
+        def func(i):
+            if i == 1:
+                raise ex.ArticleError('There are no words in your article!')
+            if i == 3:
+                raise KeyError(i)
+            return i
+
+        results = bulk.imap(func, range(5), workers=1)
+        self.assertEquals(next(results), 0)
+        self.assertIsInstance(next(results), ex.ArticleError)
+        self.assertEquals(next(results), 2)
+        with self.assertRaises(KeyError):
+            next(results)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import cache
+
+import os
+import shutil
+import tempfile
+import unittest2 as unittest
+
+
+class TestMakeKey(unittest.TestCase):
+
+    def test_normalized(self):
+        """Key ignores parameter order and credentials."""
+        self.assertEquals(
+            cache.make_key('GlobalSpin', u'über', {'a': '1', 'b': '2'}),
+            cache.make_key('GlobalSpin', u'über',
+                           {'b': '2', 'a': '1', 'email': 'foo@bar.com'}),
+        )
+        self.assertNotEquals(
+            cache.make_key('GlobalSpin', u'über', {'a': '1'}),
+            cache.make_key('GlobalSpin', u'über', {'a': '2'}),
+        )
+        self.assertNotEquals(
+            cache.make_key('GlobalSpin', u'foo', {}),
+            cache.make_key('CalcWordDensity', u'foo', {}),
+        )
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_max_entries(self):
+        """Least recently used entries are evicted first."""
+        c = cache.LRUCache(max_entries=2)
+        c.set('a', u'1')
+        c.set('b', u'2')
+        c.get('a')
+        c.set('c', u'3')
+        self.assertEquals(c.get('a'), u'1')
+        self.assertIsNone(c.get('b'))
+        self.assertEquals(
+            c.stats(),
+            {'hits': 2, 'misses': 1, 'evictions': 1, 'entries': 2,
+             'bytes': 2},
+        )
+
+    def test_max_bytes(self):
+        """Entries are evicted when UTF-8 size exceeds max_bytes."""
+        c = cache.LRUCache(max_bytes=5)
+        c.set('a', u'üü')
+        c.set('b', u'üü')
+        self.assertEquals(len(c), 1)
+        self.assertEquals(c.bytes, 4)
+        self.assertIsNone(c.get('a'))
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_persistent(self):
+        """Entries survive reopening the database."""
+        c = cache.DiskCache(self.path)
+        c.set('a', u'über')
+        c.close()
+        c = cache.DiskCache(self.path)
+        self.assertEquals(c.get('a'), u'über')
+        self.assertIsNone(c.get('b'))
+        self.assertEquals(c.stats(), {'hits': 1, 'misses': 1, 'evictions': 0})
+
+    def test_max_entries(self):
+        """Entries above max_entries are evicted."""
+        c = cache.DiskCache(self.path, max_entries=2)
+        for key in 'abc':
+            c.set(key, key)
+        self.assertEquals(len(c), 2)
+        self.assertEquals(c.evictions, 1)
+
+    def test_backend(self):
+        """LRUCache falls back to and writes through to its backend."""
+        disk = cache.DiskCache(self.path)
+        c = cache.LRUCache(backend=disk)
+        c.set('a', u'1')
+        self.assertEquals(
+            cache.LRUCache(backend=disk).get('a'), u'1')
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import chunking
+from spinchimp import errors
+from spinchimp import exceptions as ex
+
+import unittest2 as unittest
+
+
+class TestSplit(unittest.TestCase):
+
+    def test_short(self):
+        """Text under the limit is not split."""
+        self.assertEquals(chunking.split(u'One two.', 2), ([u'One two.'], []))
+
+    def test_paragraphs(self):
+        """Paragraph boundaries are preferred over sentence boundaries."""
+        text = u'One two. Three.\n\nFour five. Six.'
+        chunks, separators = chunking.split(text, 4)
+        self.assertEquals(chunks, [u'One two. Three.', u'Four five. Six.'])
+        self.assertEquals(separators, [u'\n\n'])
+        self.assertEquals(chunking.join(chunks, separators), text)
+
+    def test_sentences(self):
+        """Long paragraphs are split between sentences, then words."""
+        chunks, separators = chunking.split(u'One two. Three four five.', 3)
+        self.assertEquals(chunks, [u'One two.', u'Three four five.'])
+        chunks, separators = chunking.split(u'One two three four', 3)
+        self.assertEquals(chunks, [u'One two three', u'four'])
+
+    def test_protected(self):
+        """HTML tags, tagprotect regions and protected terms stay whole."""
+        text = u'<a href="x">One</a> [two three] four five'
+        chunks, separators = chunking.split(text, 3, tagprotect='[|]')
+        self.assertEquals(chunks, [u'<a href="x">One</a> [two three]',
+                                   u'four five'])
+        chunks, separators = chunking.split(
+            u'one two New York City', 3, protectedterms='new york city')
+        self.assertEquals(chunks, [u'one two', u'New York City'])
+
+    def test_protected_fallback(self):
+        """Without a boundary to cut at, text is cut around protected spans,
+        those longer than max_words can not be split.
+        """
+        text = u'x[a b]y z w'
+        chunks, separators = chunking.split(text, 2, tagprotect='[|]')
+        self.assertEquals(chunks, [u'x', u'[a b]', u'y z', u'w'])
+        self.assertEquals(chunking.join(chunks, separators), text)
+
+        for text, params in [
+                (u'x [a b c d e] f g', {'tagprotect': '[|]'}),
+                (u'x[a b c]y z', {'tagprotect': '[|]'}),
+                (u'I love New York City', {'protectedterms': 'New York City'}),
+        ]:
+            with self.assertRaises(ex.ArticleError) as e:
+                chunking.split(text, 2, **params)
+            self.assertIsNone(chunking.max_words_from_error(e.exception))
+
+    def test_max_words_from_error(self):
+        """Word limit is read from 'Article too long' errors."""
+        self.assertEquals(
+            chunking.max_words_from_error(errors.classify(
+                'Article too long (6000 words). Max is 5000.')),
+            5000,
+        )
+        self.assertIsNone(chunking.max_words_from_error(
+            ex.ArticleError('There are no words in your article!')))
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import cli
+
+import json
+import mock
+import os
+import shutil
+import StringIO
+import tempfile
+import threading
+import unittest2 as unittest
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.input = os.path.join(self.tmp, 'in.jsonl')
+        self.output = os.path.join(self.tmp, 'out.jsonl')
+        self.checkpoint = os.path.join(self.tmp, 'done')
+        with open(self.input, 'w') as f:
+            for i, text in enumerate([u'foo', u'', u'bar', u'baz']):
+                f.write(json.dumps({'id': i, 'text': text}) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _main(self, *args):
+        argv = [self.input, '-o', self.output, '--checkpoint',
+                self.checkpoint, '--email', 'foo@bar.com', '--apikey',
+                'test_api_key', '-w', '1', '-p', 'quality=3'] + list(args)
+        with mock.patch('sys.stderr', StringIO.StringIO()):
+            return cli.main(argv)
+
+    def _records(self):
+        with open(self.output) as f:
+            return dict((r['id'], r) for r in map(json.loads, f))
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_resume(self, request):
+        """A run stopped by QuotaLimitError resumes where it stopped."""
+        def respond(url, data, timeout):
+            self.assertIn('quality=3', url)
+            if data == 'baz':
+                return 'failed:Credentials check result:MaxQueriesReached'
+            if not data:
+                return 'failed:There are no words in your article!'
+            return data.upper()
+        request.side_effect = respond
+
+        self.assertEquals(self._main(), 2)
+        records = self._records()
+        self.assertEquals(records[0]['text'], u'FOO')
+        self.assertEquals(records[1]['type'], 'ArticleError')
+        self.assertEquals(records[2]['text'], u'BAR')
+        self.assertNotIn(3, records)
+
+        request.reset_mock()
+        request.side_effect = lambda url, data, timeout: data.upper()
+        self.assertEquals(self._main(), 0)
+        self.assertEquals(request.call_count, 1)
+        self.assertEquals(self._records()[3]['text'], u'BAZ')
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_stop_in_flight(self, request):
+        """Results completed after a fatal error are still recorded."""
+        quota_used = threading.Event()
+
+        def respond(url, data, timeout):
+            if data == 'foo':
+                # finishes after the request of bar failed
+                quota_used.wait(1)
+                return data.upper()
+            if data == 'bar':
+                quota_used.set()
+                return 'failed:Credentials check result:MaxQueriesReached'
+            if not data:
+                return 'failed:There are no words in your article!'
+            self.fail('{} was sent after the run stopped'.format(data))
+        request.side_effect = respond
+
+        self.assertEquals(self._main('-w', '2'), 2)
+        records = self._records()
+        self.assertEquals(records[0]['text'], u'FOO')
+        self.assertEquals(sorted(records), [0, 1])
+        with open(self.checkpoint) as f:
+            self.assertEquals(sorted(map(json.loads, f)), [0, 1])
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_transient(self, request):
+        """Items failed by network errors are left for the next run."""
+        request.side_effect = lambda url, data, timeout: \
+            'failed:Credentials check result:DatabaseFailure' \
+            if data == 'bar' else data.upper()
+
+        self.assertEquals(self._main('--retries', '0'), 1)
+        self.assertNotIn(2, self._records())
+        self.assertEquals(len(self._records()), 3)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_input_closed(self, request):
+        """The input file is closed after the run."""
+        request.side_effect = lambda url, data, timeout: data.upper()
+        files = []
+
+        def tracked(*args):
+            files.append(open(*args))
+            return files[-1]
+
+        with mock.patch('spinchimp.cli.open', tracked, create=True):
+            self.assertEquals(self._main('--checkpoint', ''), 0)
+        self.assertEquals(files[0].name, self.input)
+        self.assertTrue(all(f.closed for f in files))
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_invalid_lines(self, request):
+        """Invalid input lines are reported per item."""
+        request.side_effect = lambda url, data, timeout: data.upper()
+        with open(self.input, 'w') as f:
+            f.write('{"id": "a", "text": "foo"}\n'
+                    '{"id": "b", "text": \n'
+                    '{"id": ["c"], "text": "bar"}\n'
+                    '{"id": "d"}\n'
+                    '[1, 2]\n'
+                    '{"text": "baz"}\n')
+        self.assertEquals(self._main(), 0)
+        records = self._records()
+        self.assertEquals(records['a']['text'], u'FOO')
+        self.assertEquals(records[6]['text'], u'BAZ')
+        for number in (2, 3, 4, 5):
+            self.assertEquals(records[number]['type'], 'ValueError')
+            self.assertTrue(records[number]['error'].startswith(
+                'Line {}: '.format(number)))
+        self.assertEquals(request.call_count, 2)
+
+        # reported lines are not read again
+        self.assertEquals(self._main(), 0)
+        self.assertEquals(request.call_count, 2)
+
+    def test_read_tree(self):
+        """Files of a directory tree are read in sorted order."""
+        os.makedirs(os.path.join(self.tmp, 'tree', 'b'))
+        for name in ['b/two.txt', 'a.txt', 'c.md']:
+            with open(os.path.join(self.tmp, 'tree', name), 'w') as f:
+                f.write(u'über {}'.format(name).encode('utf-8'))
+        self.assertEquals(
+            list(cli.read_tree(os.path.join(self.tmp, 'tree'), '*.txt')),
+            [(u'a.txt', u'über a.txt'), (u'b/two.txt', u'über b/two.txt')],
+        )
+
+    def test_params(self):
+        """Invalid spin parameters are reported as usage errors."""
+        with self.assertRaises(SystemExit):
+            self._main('-p', 'quality=9')
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import density
+
+import unittest2 as unittest
+
+
+class TestDensity(unittest.TestCase):
+
+    def test_word_density(self):
+        """Words and repeated phrases are reported as percent strings."""
+        result = density.word_density(
+            u'<p>My cat is cool.</p> My cat is über cool, my cat!')
+        self.assertEquals(result['cat'], '27.27')
+        self.assertEquals(result['cool'], '18.18')
+        self.assertEquals(result[u'über'], '9.09')
+        self.assertNotIn('is', result)
+        self.assertNotIn('p', result)
+        # phrases do not span over short words
+        self.assertNotIn('cat cool', result)
+
+    def test_phrases(self):
+        """Phrase density accounts for every word of the phrase."""
+        result = density.densities(u'big red dog, big red dog, cat', 3)
+        self.assertAlmostEqual(result['big red dog'], 6 * 100.0 / 7)
+        self.assertAlmostEqual(result['red dog'], 4 * 100.0 / 7)
+        self.assertNotIn('dog cat', result)
+
+    def test_minlength(self):
+        """Words shorter than minlength are counted but not reported."""
+        self.assertEquals(
+            density.word_density(u'a bb ccc', minlength=2),
+            {'bb': '33.33', 'ccc': '33.33'},
+        )
+        self.assertEquals(density.word_density(u''), {})
+
+    def test_word_density_many(self):
+        """Batch results are returned as columns."""
+        columns = density.word_density_many([u'cat', u'', u'dog dog'])
+        self.assertEquals(
+            sorted(zip(columns['text'], columns['term'], columns['density'])),
+            [(0, u'cat', 100.0), (2, u'dog', 100.0)],
+        )
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import exceptions as ex
+from spinchimp.errors import ErrorClassifier
+
+import unittest2 as unittest
+
+
+class TestErrorClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = ErrorClassifier()
+
+    def test_builtin_rules(self):
+        """Known messages map to their exception classes."""
+        for message, cls in [
+            ('Credentials check result:InvalidAPIKey', ex.AuthenticationError),
+            ('credentials check result:notapiregistered',
+             ex.AuthenticationError),
+            ('No Application ID (aid) Specified', ex.AuthenticationError),
+            ('Credentials check result:MaxQueriesReached', ex.QuotaLimitError),
+            ('Credentials check result:DatabaseFailure', ex.InternalError),
+            ('There are no words in your article!', ex.ArticleError),
+            ('Cars are foo!', ex.UnknownError),
+        ]:
+            error = self.classifier.classify(message)
+            self.assertIs(type(error), cls, message)
+            self.assertEquals(str(error), message)
+
+    def test_fields(self):
+        """Named groups are set as attributes of the exception."""
+        error = self.classifier.classify(
+            'Article too long (12345 words). Max is 5000.')
+        self.assertIsInstance(error, ex.ArticleError)
+        self.assertEquals(error.words, 12345)
+        self.assertEquals(error.max_words, 5000)
+
+        error = self.classifier.classify('There are no words in your article!')
+        self.assertIsNone(error.max_words)
+
+    def test_register(self):
+        """Registered patterns are recognized and take precedence."""
+        self.classifier.register(
+            r'Credentials check result:(?P<code>Account\w+)',
+            ex.AuthenticationError)
+        error = self.classifier.classify(
+            'Credentials check result:AccountSuspended')
+        self.assertIsInstance(error, ex.AuthenticationError)
+        self.assertEquals(error.code, 'AccountSuspended')
+
+        self.classifier.register(
+            r'Credentials check result:DatabaseFailure', ex.NetworkError)
+        self.assertIsInstance(self.classifier.classify(
+            'Credentials check result:DatabaseFailure'), ex.NetworkError)
+        # built-in fields still work with shifted rule indexes
+        self.assertEquals(self.classifier.classify(
+            'Article too long (6 words). Max is 5.').max_words, 5)
+
+    def test_register_overlapping(self):
+        """Registered patterns win even if a built-in one matches earlier
+        in the message.
+        """
+        self.classifier.register(r'words in your article', ex.NetworkError)
+        self.assertIsInstance(self.classifier.classify(
+            'There are no words in your article!'), ex.NetworkError)
+
+    def test_precedence(self):
+        """Messages joining several errors are classified by the most
+        important one, regardless of order.
+        """
+        for message, cls in [
+            ('There are no words in your article!|'
+             'Credentials check result:InvalidEmail', ex.AuthenticationError),
+            ('Credentials check result:DatabaseFailure|'
+             'Credentials check result:MaxQueriesReached', ex.QuotaLimitError),
+            ('There are no words in your article!|'
+             'Credentials check result:DatabaseFailure', ex.InternalError),
+        ]:
+            self.assertIs(type(self.classifier.classify(message)), cls)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import SpinChimp
+from spinchimp import exceptions as ex
+from spinchimp import incremental
+from spinchimp.cache import LRUCache
+from spinchimp.testing import FakeServer
+
+import mock
+import unittest2 as unittest
+
+ARTICLE = u'First cool paragraph.\n\nSecond nice one.\r\n  \nThird good one.'
+
+
+class TestSplit(unittest.TestCase):
+
+    def test_split(self):
+        """Paragraphs are split at line breaks, join() reverses split()."""
+        paragraphs, breaks = incremental.split(ARTICLE)
+        self.assertEquals(paragraphs, [u'First cool paragraph.',
+                                       u'Second nice one.',
+                                       u'Third good one.'])
+        self.assertEquals(breaks, [u'\n\n', u'\r\n  \n'])
+        self.assertEquals(incremental.chunking.join(paragraphs, breaks),
+                          ARTICLE)
+
+    def test_edges(self):
+        self.assertEquals(incremental.split(u'\nfoo \n'),
+                          ([u'', u'foo', u''], [u'\n', u' \n']))
+
+
+class TestRespin(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer(seed=1).start()
+        self.sc = SpinChimp('foo@bar.com', 'test_api_key')
+        self.sc.URL = self.server.url
+        self.store = LRUCache()
+
+    def tearDown(self):
+        self.sc._pool.clear()
+        self.server.stop()
+
+    def respin(self, text, **kwargs):
+        return incremental.respin(self.sc, text, self.store, mode='spintax',
+                                  **kwargs)
+
+    def test_respin(self):
+        """Only changed paragraphs are spun again, in one request."""
+        self.assertEquals(
+            self.respin(ARTICLE),
+            u'{First|tsriF} {cool|looc} {paragraph|hpargarap}.\n\n'
+            u'{Second|dnoceS} {nice|ecin} one.\r\n  \n'
+            u'{Third|drihT} {good|doog} one.')
+        self.assertEquals(self.server.requests, 1)
+        self.assertEquals(len(self.store), 3)
+
+        # unchanged article, no request
+        self.respin(ARTICLE)
+        self.assertEquals(self.server.requests, 1)
+
+        edited = ARTICLE.replace(u'Second nice', u'Second fine') + \
+            u'\nFourth okay one.'
+        self.assertEquals(
+            self.respin(edited),
+            u'{First|tsriF} {cool|looc} {paragraph|hpargarap}.\n\n'
+            u'{Second|dnoceS} {fine|enif} one.\r\n  \n'
+            u'{Third|drihT} {good|doog} one.\n'
+            u'{Fourth|htruoF} {okay|yako} one.')
+        self.assertEquals(self.server.requests, 2)
+
+    def test_params(self):
+        """Spins with other parameters are not reused."""
+        self.respin(ARTICLE)
+        self.respin(ARTICLE, params={'quality': 3})
+        self.assertEquals(self.server.requests, 2)
+        incremental.respin(self.sc, ARTICLE, self.store)
+        self.assertEquals(self.server.requests, 3)
+
+        with self.assertRaises(ex.WrongParameterVal):
+            self.respin(ARTICLE, params={'quality': 9})
+        with self.assertRaises(ex.WrongParameterVal):
+            incremental.respin(self.sc, ARTICLE, self.store, mode='foo')
+
+    def test_tagprotect(self):
+        """Paragraphs are separated by a protected marker."""
+        with mock.patch.object(self.sc, 'text_with_spintax') as spin:
+            spin.return_value = u'a\n[%-%]\nb'
+            self.assertEquals(
+                self.respin(u'foo\nbar', params={'tagprotect': '<b>|</b>'}),
+                u'a\nb')
+        text, params = spin.call_args[0]
+        self.assertEquals(text, u'foo\n[%-%]\nbar')
+        self.assertEquals(params['tagprotect'], '<b>|</b>,[%|%]')
+
+    def test_fallback(self):
+        """Paragraphs are spun one by one if the marker got lost."""
+        with mock.patch.object(self.sc, 'text_with_spintax') as spin:
+            spin.side_effect = [u'lost', u'a', u'b']
+            self.assertEquals(self.respin(u'foo\nbar'), u'a\nb')
+        self.assertEquals(spin.call_count, 3)
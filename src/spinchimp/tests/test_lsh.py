@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp.lsh import LSHIndex
+from spinchimp.similarity import MinHash
+
+import os
+import shutil
+import tempfile
+import unittest2 as unittest
+
+TEXT = (u'The quick brown fox jumps over the lazy dog near the river bank '
+        u'while the farmer watches from the old wooden fence.')
+
+
+class TestLSHIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'index')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_query(self):
+        """Near-duplicates are found, unrelated texts are not."""
+        index = LSHIndex(self.path, MinHash(num_perm=64), bands=16)
+        index.add('original', TEXT)
+        index.add_many([
+            ('other', u'Completely unrelated sentence about spinning text.'),
+            ('copy', TEXT.replace(u'wooden', u'wood')),
+        ])
+        self.assertEquals(len(index), 3)
+
+        results = index.query(TEXT)
+        self.assertEquals([key for key, similarity in results],
+                          ['original', 'copy'])
+        self.assertEquals(results[0][1], 1.0)
+        self.assertEquals(
+            index.query(index.minhash.signature(TEXT), threshold=1.0),
+            [('original', 1.0)])
+        self.assertEquals(index.query(u'Nothing like it at all.'), [])
+        index.close()
+
+    def test_persistence(self):
+        """Reopened index keeps its settings and entries."""
+        index = LSHIndex(self.path, MinHash(num_perm=64, seed=7), bands=16)
+        index.add('original', TEXT)
+        index.close()
+
+        index = LSHIndex(self.path)
+        self.assertEquals(len(index), 1)
+        self.assertEquals(index.minhash.num_perm, 64)
+        self.assertEquals(index.bands, 16)
+        index.add('second', u'Another text with a few words in it.')
+        self.assertEquals(index.query(TEXT), [('original', 1.0)])
+        index.close()
+
+    def test_failed_insert(self):
+        """Signatures of a failed insert are not kept."""
+        index = LSHIndex(self.path, MinHash(num_perm=64), bands=16)
+
+        def items():
+            yield 'first', TEXT
+            raise RuntimeError('boom')
+        with self.assertRaises(RuntimeError):
+            index.add_many(items())
+        self.assertEquals(len(index), 0)
+        index.add('second', TEXT)
+        self.assertEquals(index.query(TEXT), [('second', 1.0)])
+        index.close()
+
+    def test_bands(self):
+        """Number of bands must divide signature length."""
+        with self.assertRaises(ValueError):
+            LSHIndex(self.path, MinHash(num_perm=64), bands=10)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import SpinChimp
+from spinchimp import exceptions as ex
+from spinchimp import metrics
+from spinchimp.cache import LRUCache
+from spinchimp.testing import FakeServer
+
+import mock
+import unittest2 as unittest
+
+try:
+    import trollius
+except ImportError:  # pragma: no cover
+    trollius = None
+
+
+class Recorder(metrics.Hooks):
+
+    def __init__(self):
+        self.calls = []
+
+    def before(self, event):
+        self.calls.append(('before', event.method, event.request_bytes))
+
+    def after(self, event):
+        self.calls.append(('after', event))
+
+    def error(self, event):
+        self.calls.append(('error', event))
+
+
+def _event(method, duration, error=None, **kwargs):
+    event = metrics.Event(method)
+    for name, value in kwargs.items():
+        setattr(event, name, value)
+    event.finish(error)
+    event.duration = duration
+    return event
+
+
+class TestMetricsCollector(unittest.TestCase):
+
+    def test_stats(self):
+        """Requests, errors, bytes and phases are counted by method."""
+        collector = metrics.MetricsCollector(buckets=(0.1, 1.0))
+        collector.after(_event('GlobalSpin', 0.05, request_bytes=10,
+                               response_bytes=20,
+                               timings={'server': 0.04}))
+        collector.after(_event('GlobalSpin', 0.5, cached=True))
+        collector.error(_event('GlobalSpin', 2.0,
+                               ex.QuotaLimitError('MaxQueriesReached')))
+        collector.after(_event('QueryStats', 0.01))
+
+        stats = collector.stats()
+        spin = stats['GlobalSpin']
+        self.assertEquals(spin['requests'], 3)
+        self.assertEquals(spin['cached'], 1)
+        self.assertEquals(spin['errors'], {'QuotaLimitError': 1})
+        self.assertEquals(spin['request_bytes'], 10)
+        self.assertEquals(spin['response_bytes'], 20)
+        self.assertEquals(spin['histogram'], [1, 1, 1])
+        self.assertAlmostEqual(spin['duration'], 2.55)
+        self.assertEquals(spin['phases'], {'server': 0.04})
+        self.assertEquals(stats['QueryStats']['requests'], 1)
+
+        # stats() returns a copy
+        spin['errors'].clear()
+        self.assertEquals(collector.stats()['GlobalSpin']['errors'],
+                          {'QuotaLimitError': 1})
+
+    def test_export(self):
+        """Metrics are exported in the Prometheus text format."""
+        collector = metrics.MetricsCollector(buckets=(0.1, 1.0))
+        collector.after(_event('GlobalSpin', 0.05, request_bytes=10,
+                               timings={'server': 0.25}))
+        collector.error(_event('GlobalSpin', 2.0,
+                               ex.QuotaLimitError('MaxQueriesReached')))
+
+        lines = collector.export().splitlines()
+        self.assertIn('# TYPE spinchimp_requests_total counter', lines)
+        self.assertIn('spinchimp_requests_total{method="GlobalSpin"} 2',
+                      lines)
+        self.assertIn('spinchimp_errors_total{method="GlobalSpin",'
+                      'error="QuotaLimitError"} 1', lines)
+        self.assertIn('spinchimp_request_bytes_total{method="GlobalSpin"} 10',
+                      lines)
+        self.assertIn('spinchimp_phase_seconds_total{method="GlobalSpin",'
+                      'phase="server"} 0.25', lines)
+        self.assertIn('# TYPE spinchimp_request_duration_seconds histogram',
+                      lines)
+        self.assertEquals(
+            [line for line in lines
+             if line.startswith('spinchimp_request_duration_seconds')],
+            ['spinchimp_request_duration_seconds_bucket'
+             '{method="GlobalSpin",le="0.1"} 1',
+             'spinchimp_request_duration_seconds_bucket'
+             '{method="GlobalSpin",le="1.0"} 1',
+             'spinchimp_request_duration_seconds_bucket'
+             '{method="GlobalSpin",le="+Inf"} 2',
+             'spinchimp_request_duration_seconds_sum'
+             '{method="GlobalSpin"} 2.05',
+             'spinchimp_request_duration_seconds_count'
+             '{method="GlobalSpin"} 2'])
+
+    def test_empty(self):
+        """Nothing but metric descriptions is exported without requests."""
+        for line in metrics.MetricsCollector().export().splitlines():
+            self.assertTrue(line.startswith('#'))
+
+
+class TestHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.hooks = Recorder()
+        self.sc = SpinChimp('foo@bar.com', 'test_api_key',
+                            hooks=[self.hooks], cache=LRUCache())
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_after(self, request):
+        """Hooks see sizes, attempts and timings of requests."""
+        request.side_effect = lambda url, data, timeout, timings: 'spun'
+        self.assertEquals(self.sc.text_with_spintax(u'über'), u'spun')
+
+        self.assertEquals(self.hooks.calls[0], ('before', 'GlobalSpin', 5))
+        name, event = self.hooks.calls[1]
+        self.assertEquals(name, 'after')
+        self.assertEquals(event.response_bytes, 4)
+        self.assertEquals(event.attempts, 1)
+        self.assertFalse(event.cached)
+        self.assertIsNone(event.error_class)
+        self.assertTrue(event.duration >= 0)
+        self.assertEquals(set(event.timings),
+                          set(['validate', 'encode', 'decode']))
+
+        # cached responses are reported without attempts
+        self.sc.text_with_spintax(u'über')
+        event = self.hooks.calls[3][1]
+        self.assertTrue(event.cached)
+        self.assertEquals(event.attempts, 0)
+        self.assertEquals(request.call_count, 1)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_error(self, request):
+        """Failed requests are reported with the exception raised."""
+        request.return_value = 'failed:Credentials check result:' \
+                               'MaxQueriesReached'
+        with self.assertRaises(ex.QuotaLimitError):
+            self.sc.text_with_spintax(u'foo')
+
+        name, event = self.hooks.calls[1]
+        self.assertEquals(name, 'error')
+        self.assertEquals(event.error_class, ex.QuotaLimitError)
+        self.assertIn('classify', event.timings)
+
+    def test_invalid(self):
+        """Invalid parameters are reported without before()."""
+        with self.assertRaises(ex.WrongParameterName):
+            self.sc._send_request('GlobalSpin', u'foo', {'foo': 1})
+        self.assertEquals(len(self.hooks.calls), 1)
+        self.assertEquals(self.hooks.calls[0][0], 'error')
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_no_hooks(self, request):
+        """Timings are not collected without hooks."""
+        request.return_value = 'spun'
+        SpinChimp('foo@bar.com', 'test_api_key').text_with_spintax(u'foo')
+        request.assert_called_once_with(
+            mock.ANY, data='foo', timeout=SpinChimp.TIMEOUT)
+
+
+class TestNetworkTimings(unittest.TestCase):
+
+    def test_pool(self):
+        """ConnectionPool reports connect, server and read phases."""
+        collector = metrics.MetricsCollector()
+        with FakeServer() as server:
+            sc = SpinChimp('foo@bar.com', 'test_api_key', hooks=[collector])
+            sc.URL = server.url
+            sc.text_with_spintax(u'My cat is cool.')
+            sc.text_with_spintax(u'My cat is cool.')
+            sc._pool.clear()
+
+        stats = collector.stats()['GlobalSpin']
+        self.assertEquals(stats['requests'], 2)
+        self.assertEquals(set(stats['phases']), set(metrics.PHASES) -
+                          set(['wait', 'classify']))
+
+    @unittest.skipIf(trollius is None, 'trollius is not installed')
+    def test_async(self):
+        """AsyncSpinChimp reports to hooks too."""
+        from spinchimp.aio import AsyncSpinChimp
+
+        collector = metrics.MetricsCollector()
+        loop = trollius.new_event_loop()
+        try:
+            with FakeServer() as server:
+                sc = AsyncSpinChimp('foo@bar.com', 'test_api_key',
+                                    hooks=[collector], loop=loop)
+                sc.URL = server.url
+                loop.run_until_complete(
+                    sc.text_with_spintax(u'My cat is cool.'))
+                sc._pool.clear()
+                loop.run_until_complete(trollius.sleep(0, loop=loop))
+        finally:
+            loop.close()
+
+        stats = collector.stats()['GlobalSpin']
+        self.assertEquals(stats['requests'], 1)
+        self.assertIn('connect', stats['phases'])
+        self.assertIn('server', stats['phases'])
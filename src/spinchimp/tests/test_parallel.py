@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import chunking
+from spinchimp import density
+from spinchimp import spintax
+from spinchimp.parallel import ProcessPool
+
+import unittest2 as unittest
+
+
+class TestProcessPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ProcessPool(processes=2, batch_size=3)
+        self.texts = [u'{Hello|Hi|Hey} world {{number|no.}|#} ' + unicode(i)
+                      for i in range(10)]
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_spin_many(self):
+        """Results match serial spinning, in input order."""
+        self.assertEquals(
+            list(self.pool.spin_many(self.texts, seed=42)),
+            [spintax.spin(text, seed=(42, i))
+             for i, text in enumerate(self.texts)],
+        )
+        self.assertEquals(
+            list(self.pool.spin_many(iter([u'{a|b}'] * 7),
+                                     dontincludeoriginal=True)),
+            [u'b'] * 7,
+        )
+
+    def test_word_density_many(self):
+        """Columns match serial computation across batches."""
+        texts = [u'cat dog cat', u'', u'cool cool cat'] * 3
+        self.assertEquals(
+            self.pool.word_density_many(texts),
+            density.word_density_many(texts),
+        )
+
+    def test_split_many(self):
+        """Chunks match serial splitting, HTML tags are kept whole."""
+        texts = [u'<p class="a b">One two.</p>\n<p>Three four.</p>',
+                 u'five [six seven] eight'] * 4
+        results = list(self.pool.split_many(texts, 2, tagprotect='[|]'))
+        self.assertEquals(
+            results,
+            [chunking.split(text, 2, '[|]') for text in texts],
+        )
+        self.assertEquals(results[0][0],
+                          [u'<p class="a b">One two.</p>',
+                           u'<p>Three four.</p>'])
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import exceptions as ex
+from spinchimp.pool import ConnectionPool
+
+import BaseHTTPServer
+import SocketServer
+import threading
+import unittest2 as unittest
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.getheader('content-length')))
+        self.server.ports.add(self.client_address[1])
+        status = 500 if self.path.startswith('/Broken') else 200
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = False
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        """Start a local keep-alive HTTP server echoing request bodies."""
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.ports = set()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:{}/GlobalSpin?a=1'.format(
+            self.server.server_address[1])
+        self.pools = []
+
+    def _pool(self, **kwargs):
+        pool = ConnectionPool(**kwargs)
+        self.pools.append(pool)
+        return pool
+
+    def tearDown(self):
+        for pool in self.pools:
+            pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        """Consecutive requests reuse the same connection."""
+        pool = self._pool()
+        self.assertEquals(pool.request(self.url, 'foo'), 'foo')
+        self.assertEquals(pool.request(self.url, 'bar'), 'bar')
+        self.assertEquals(len(self.server.ports), 1)
+        self.assertEquals(pool.size, 1)
+
+    def test_idle_eviction(self):
+        """Connections idle for longer than idle_timeout are closed."""
+        pool = self._pool(idle_timeout=0)
+        pool.request(self.url, 'foo')
+        pool.request(self.url, 'bar')
+        self.assertEquals(len(self.server.ports), 2)
+        self.assertEquals(pool.size, 1)
+
+    def test_per_host_limit(self):
+        """Concurrent requests never open more than maxsize_per_host."""
+        pool = self._pool(maxsize_per_host=2)
+        results = []
+
+        def worker():
+            for i in range(5):
+                results.append(pool.request(self.url, str(i)))
+
+        threads = [threading.Thread(target=worker) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEquals(len(results), 30)
+        self.assertLessEqual(pool.size, 2)
+
+    def test_non_blocking(self):
+        """Exhausted non-blocking pool raises NetworkError."""
+        pool = self._pool(maxsize=1, block=False)
+        pool._acquire(('http', '127.0.0.1', 1))
+        with self.assertRaises(ex.NetworkError):
+            pool.request(self.url, 'foo')
+
+    def test_errors(self):
+        """HTTP errors and connection failures raise NetworkError."""
+        pool = self._pool()
+        with self.assertRaises(ex.NetworkError):
+            pool.request(self.url.replace('GlobalSpin', 'Broken'), 'foo')
+        with self.assertRaises(ex.NetworkError):
+            pool.request('http://127.0.0.1:1/GlobalSpin', 'foo')
+        # only the keep-alive connection of the HTTP 500 response is left
+        self.assertEquals(pool.size, 1)
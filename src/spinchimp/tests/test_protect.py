@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import protect
+from spinchimp.protect import Matcher
+from spinchimp.protect import Protector
+
+import unittest2 as unittest
+
+
+class TestMatcher(unittest.TestCase):
+
+    def test_finditer(self):
+        """All occurrences of all patterns are found, ignoring case."""
+        matcher = Matcher([u'he', u'she', u'his', u'hers'])
+        self.assertEquals(
+            sorted(matcher.finditer(u'uSHErs')),
+            [(1, 4, 1), (2, 4, 0), (2, 6, 3)],
+        )
+        self.assertEquals(list(matcher.finditer(u'xyz')), [])
+
+
+class TestProtector(unittest.TestCase):
+
+    def test_roundtrip(self):
+        """Terms and regions become placeholders and are restored."""
+        protector = Protector(u'New York, New York City, Ovca',
+                              u'[|],<code>|</code>')
+        text = (u'I love new york city and NewYork. Ovcas are [not Ovca] '
+                u'<code>x = 1</code>, says Ovca.')
+        protected, originals = protector.protect(text)
+        self.assertEquals(
+            protected,
+            u'I love [%0%] and NewYork. Ovcas are [%1%] [%2%], says [%3%].')
+        self.assertEquals(
+            originals,
+            [u'new york city', u'[not Ovca]', u'<code>x = 1</code>', u'Ovca'])
+        self.assertEquals(protector.restore(protected, originals), text)
+        self.assertEquals(
+            protector.restore(u'We adore [%0%] [%7%]', originals),
+            u'We adore new york city [%7%]')
+
+    def test_literal_placeholder(self):
+        """Text looking like a placeholder is restored literally."""
+        protector = Protector(u'Ovca', u'<b>|</b>')
+        text = u'Use [%0%] literally, Ovca here, <b>[%1%]</b> [%x%]'
+        protected, originals = protector.protect(text)
+        self.assertEquals(protected,
+                          u'Use [%0%] literally, [%1%] here, [%2%] [%x%]')
+        self.assertEquals(originals, [u'[%0%]', u'Ovca', u'<b>[%1%]</b>'])
+        self.assertEquals(protector.restore(protected, originals), text)
+
+    def test_unclosed_region(self):
+        """Regions without an end marker are left alone."""
+        protector = Protector(tagprotect=u'[|]')
+        self.assertEquals(protector.protect(u'a [b c'), (u'a [b c', []))
+        self.assertFalse(Protector())
+
+    def test_compile(self):
+        """Protectors are compiled once per parameters."""
+        protector = protect.compile('\xc3\xbcber', '')
+        self.assertIs(protect.compile('\xc3\xbcber', ''), protector)
+        self.assertEquals(protector.protect(u'so über'),
+                          (u'so [%0%]', [u'über']))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp.ratelimit import FileTokenBucket
+from spinchimp.ratelimit import TokenBucket
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest2 as unittest
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst(self):
+        """Burst is sent at once, further requests wait."""
+        bucket = TokenBucket(rate=10, burst=3)
+        self.assertEquals([bucket.reserve() for i in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+        stats = bucket.stats()
+        self.assertEquals(stats['requests'], 5)
+        self.assertEquals(stats['waits'], 2)
+        self.assertAlmostEqual(stats['max_wait'], 0.2, places=2)
+
+    def test_threads(self):
+        """Rate is kept across threads."""
+        bucket = TokenBucket(rate=100, burst=1)
+        start = time.time()
+        threads = [threading.Thread(target=bucket.acquire) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.time() - start, 0.045)
+
+
+class TestFileTokenBucket(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'bucket')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shared(self):
+        """Buckets with the same path draw from the same tokens."""
+        first = FileTokenBucket(self.path, rate=10, burst=2)
+        second = FileTokenBucket(self.path, rate=10, burst=2)
+        self.assertEquals(first.reserve(), 0)
+        self.assertEquals(second.reserve(), 0)
+        self.assertAlmostEqual(first.reserve(), 0.1, places=2)
+        self.assertEquals(second.stats()['waits'], 0)
+        first.close()
+        second.close()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import exceptions as ex
+from spinchimp.retry import CircuitBreaker
+from spinchimp.retry import RetryPolicy
+
+import mock
+import time
+import unittest2 as unittest
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_retry(self):
+        """Transient errors are retried."""
+        policy = RetryPolicy(base_delay=0)
+        func = mock.Mock(side_effect=[
+            ex.NetworkError('timed out'),
+            ex.InternalError('Credentials check result:DatabaseFailure'),
+            'OK',
+        ])
+        self.assertEquals(policy.call(func), 'OK')
+        self.assertEquals(
+            policy.stats(),
+            {'calls': 1, 'attempts': 3, 'given_up': 0,
+             'retried': {'NetworkError': 1, 'InternalError': 1}},
+        )
+
+    def test_give_up(self):
+        """Retries are limited per exception class."""
+        policy = RetryPolicy(retries={ex.NetworkError: 2}, base_delay=0)
+        func = mock.Mock(side_effect=ex.NetworkError('timed out'))
+        with self.assertRaises(ex.NetworkError):
+            policy.call(func)
+        self.assertEquals(func.call_count, 3)
+        self.assertEquals(policy.given_up, 1)
+
+    def test_never(self):
+        """Authentication and article errors are never retried."""
+        policy = RetryPolicy(retries={ex.SpinChimpError: 5}, base_delay=0)
+        func = mock.Mock(side_effect=ex.AuthenticationError('InvalidEmail'))
+        with self.assertRaises(ex.AuthenticationError):
+            policy.call(func)
+        func = mock.Mock(side_effect=ex.ArticleError('No words'))
+        with self.assertRaises(ex.ArticleError):
+            policy.call(func)
+        self.assertEquals(policy.attempts, 2)
+
+    def test_deadline(self):
+        """No retry is made past the deadline."""
+        policy = RetryPolicy(base_delay=10, deadline=0.001)
+        func = mock.Mock(side_effect=ex.NetworkError('timed out'))
+        with self.assertRaises(ex.NetworkError):
+            policy.call(func)
+        self.assertEquals(func.call_count, 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_open(self):
+        """Circuit opens after consecutive failures and fails fast."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        policy = RetryPolicy(base_delay=0, breaker=breaker)
+        func = mock.Mock(side_effect=ex.NetworkError('timed out'))
+        with self.assertRaises(ex.CircuitOpenError):
+            policy.call(func)
+        self.assertEquals(func.call_count, 2)
+        self.assertEquals(
+            breaker.stats(), {'state': 'open', 'failures': 2, 'opened': 1})
+
+    def test_half_open(self):
+        """A trial request closes or reopens the circuit."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.failure(ex.InternalError('DatabaseFailure'))
+        self.assertEquals(breaker.state, 'open')
+        breaker.before()
+        self.assertEquals(breaker.state, 'half-open')
+        with self.assertRaises(ex.CircuitOpenError):
+            breaker.before()
+        breaker.success()
+        self.assertEquals(breaker.state, 'closed')
+
+        # other errors do not count
+        breaker.failure(ex.ArticleError('No words'))
+        self.assertEquals(breaker.state, 'closed')
+
+    def test_half_open_other_error(self):
+        """A trial failing with an error that is not counted closes the
+        circuit, a counted one reopens it.
+        """
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.failure(ex.NetworkError('timed out'))
+        breaker.before()
+        breaker.failure(ex.QuotaLimitError('MaxQueriesReached'))
+        self.assertEquals(breaker.state, 'closed')
+        breaker.before()
+
+        breaker.failure(ex.NetworkError('timed out'))
+        breaker.before()
+        breaker.failure(ex.InternalError('DatabaseFailure'))
+        self.assertEquals(breaker.state, 'open')
+        self.assertEquals(breaker.opened, 3)
+
+    def test_lost_trial(self):
+        """A new trial is let through if the outcome of one is lost."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60,
+                                 trial_timeout=60)
+        breaker.failure(ex.NetworkError('timed out'))
+        with mock.patch('spinchimp.retry.time.time',
+                        return_value=time.time() + 61):
+            breaker.before()
+            with self.assertRaises(ex.CircuitOpenError):
+                breaker.before()
+        with mock.patch('spinchimp.retry.time.time',
+                        return_value=time.time() + 122):
+            breaker.before()
+        self.assertEquals(breaker.state, 'half-open')
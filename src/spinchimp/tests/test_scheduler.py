@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import exceptions as ex
+from spinchimp.scheduler import QuotaScheduler
+
+import mock
+import threading
+import time
+import unittest2 as unittest
+
+
+class TestQuotaScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.quota_left_total.return_value = '3'
+
+    def test_estimate(self):
+        """Quota is polled once and decremented locally."""
+        scheduler = QuotaScheduler(self.client)
+        scheduler.acquire()
+        scheduler.acquire(cost=2)
+        with self.assertRaises(ex.QuotaLimitError):
+            scheduler.acquire()
+        self.assertEquals(self.client.quota_left_total.call_count, 1)
+        self.assertEquals(
+            scheduler.stats(),
+            {'remaining': 0, 'admitted': 2, 'delayed': 0, 'rejected': 1},
+        )
+
+    def test_poll_interval(self):
+        """Estimate is refreshed after poll_interval."""
+        scheduler = QuotaScheduler(self.client, poll_interval=0)
+        for i in range(5):
+            scheduler.acquire()
+        self.assertEquals(self.client.quota_left_total.call_count, 5)
+
+    def test_reserve(self):
+        """Reserved quota is never admitted."""
+        scheduler = QuotaScheduler(self.client, reserve=2)
+        scheduler.acquire()
+        with self.assertRaises(ex.QuotaLimitError):
+            scheduler.acquire()
+
+    def test_spread(self):
+        """Requests are paced until the daily reset."""
+        scheduler = QuotaScheduler(
+            self.client, spread=True, reset_time=time.time() + 0.2)
+        scheduler.acquire()
+        with self.assertRaises(ex.QuotaLimitError):
+            scheduler.acquire(block=False)
+        start = time.time()
+        scheduler.acquire()
+        self.assertGreater(time.time() - start, 0.03)
+        self.assertEquals(scheduler.delayed, 1)
+
+    def test_priority(self):
+        """Higher priority requests are admitted first."""
+        self.client.quota_left_total.return_value = '100'
+        scheduler = QuotaScheduler(
+            self.client, spread=True, reset_time=time.time() + 1)
+        scheduler.acquire()
+        order = []
+
+        def request(priority):
+            with scheduler.priority(priority):
+                scheduler.acquire()
+            order.append(priority)
+
+        threads = [threading.Thread(target=request, args=(p,))
+                   for p in (1, 5, 3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        self.assertEquals(order, [5, 3, 1])
+
+    def test_concurrent_refresh(self):
+        """One thread polls, requests admitted meanwhile are counted."""
+        scheduler = QuotaScheduler(self.client)
+
+        def poll():
+            time.sleep(0.05)
+            return '100'
+
+        self.client.quota_left_total.side_effect = poll
+        threads = [threading.Thread(target=scheduler.acquire)
+                   for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(self.client.quota_left_total.call_count, 1)
+        self.assertEquals(scheduler.remaining, 84)
+
+        # the next poll is in flight while two requests are admitted
+        polling = threading.Event()
+        done = threading.Event()
+
+        def slow_poll():
+            polling.set()
+            done.wait()
+            return '50'
+
+        self.client.quota_left_total.side_effect = slow_poll
+        scheduler.poll_interval = 0
+        thread = threading.Thread(target=scheduler.acquire)
+        thread.start()
+        polling.wait()
+        scheduler.acquire()
+        scheduler.acquire()
+        done.set()
+        thread.join()
+        self.assertEquals(self.client.quota_left_total.call_count, 2)
+        self.assertEquals(scheduler.remaining, 47)
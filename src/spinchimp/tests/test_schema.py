@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import exceptions as ex
+from spinchimp import schema
+
+import unittest2 as unittest
+
+
+class TestSchema(unittest.TestCase):
+
+    def test_defaults(self):
+        """Missing and None parameters are completed with defaults."""
+        params = schema.GLOBAL_SPIN.compile({'quality': '3', 'posmatch': None})
+        self.assertEquals(params['quality'], '3')
+        self.assertEquals(params['posmatch'], '3')
+        self.assertEquals(len(params), 12)
+
+    def test_validation(self):
+        """Unknown names and disallowed values raise."""
+        with self.assertRaises(ex.WrongParameterName):
+            schema.GLOBAL_SPIN.compile({'foo': '1'})
+        with self.assertRaises(ex.WrongParameterVal):
+            schema.GLOBAL_SPIN.compile({'quality': '9'})
+        with self.assertRaises(ex.WrongParameterVal):
+            schema.CALC_WORD_DENSITY.compile({'minlength': 'foo'})
+
+    def test_encoding(self):
+        """Values are coerced to UTF-8 strings and URL-encoded once."""
+        params = schema.GLOBAL_SPIN.compile(
+            {'quality': 5, 'spintidy': True, 'protectedterms': u'über'},
+            rewrite='1')
+        self.assertEquals(params['quality'], '5')
+        self.assertEquals(params['spintidy'], '1')
+        self.assertEquals(params['protectedterms'], '\xc3\xbcber')
+        self.assertIn('protectedterms=%C3%BCber', params.query)
+        self.assertIn('rewrite=1', params.query)
+
+    def test_interned(self):
+        """Equal parameters compile to the same object."""
+        params = {'quality': '3'}
+        compiled = schema.GLOBAL_SPIN.compile(params)
+        self.assertIs(schema.GLOBAL_SPIN.compile(dict(params)), compiled)
+        self.assertIs(schema.GLOBAL_SPIN.compile(compiled), compiled)
+        self.assertIs(schema.GLOBAL_SPIN.compile(compiled, rewrite='0'),
+                      compiled)
+        self.assertEquals(params, {'quality': '3'})
+
+        with self.assertRaises(TypeError):
+            compiled['quality'] = '4'
+
+    def test_other_schema(self):
+        """Parameters compiled with another schema are validated again."""
+        params = schema.compile('QueryStats', {'simple': '1'})
+        self.assertIs(params.schema, schema.QUERY_STATS)
+        with self.assertRaises(ex.WrongParameterName):
+            schema.GLOBAL_SPIN.compile(params)
+        with self.assertRaises(ex.WrongParameterName):
+            schema.GLOBAL_SPIN.compile(params, simple='1')
+
+        loose = schema.compile('Foo', {'quality': '9'})
+        with self.assertRaises(ex.WrongParameterVal):
+            schema.GLOBAL_SPIN.compile(loose)
+        profile = schema.SpinProfile(quality='3')
+        self.assertIs(schema.GLOBAL_SPIN.compile(profile), profile)
+
+    def test_unknown_method(self):
+        """Parameters of unknown methods are only encoded."""
+        self.assertEquals(
+            dict(schema.compile('Foo', {'bar': u'baz'})), {'bar': 'baz'})
+
+
+class TestSpinProfile(unittest.TestCase):
+
+    def test_variants(self):
+        """Profile holds query strings of both rewrite variants."""
+        profile = schema.SpinProfile({'quality': '3'}, protectedterms=u'Ovca')
+        self.assertEquals(profile['protectedterms'], 'Ovca')
+        self.assertIn('rewrite=0', profile.variants['0'].query)
+        self.assertIn('rewrite=1', profile.variants['1'].query)
+        self.assertIn('quality=3', profile.variants['1'].query)
+        self.assertIs(schema.GLOBAL_SPIN.compile(profile, rewrite='1'),
+                      profile.variants['1'])
+
+        with self.assertRaises(ex.WrongParameterVal):
+            schema.SpinProfile(quality='9')
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import SpinChimp
+from spinchimp import similarity
+
+import mock
+import unittest2 as unittest
+
+TEXT = u'The quick brown fox jumps over the lazy dog near the river bank.'
+
+
+class TestSimilarity(unittest.TestCase):
+
+    def test_shingles(self):
+        """Shingles ignore case and HTML tags."""
+        self.assertEquals(
+            similarity.shingles(u'<b>One</b> two three four'),
+            similarity.shingles(u'one TWO three four'),
+        )
+        self.assertEquals(len(similarity.shingles(u'one two three four')), 2)
+        self.assertEquals(len(similarity.shingles(u'one two')), 1)
+        self.assertEquals(similarity.shingles(u''), set())
+
+    def test_uniqueness(self):
+        """Uniqueness is one minus Jaccard similarity of shingles."""
+        self.assertEquals(similarity.uniqueness(TEXT, TEXT), 0.0)
+        self.assertEquals(similarity.uniqueness(TEXT, u'Something else'), 1.0)
+        self.assertAlmostEquals(
+            similarity.uniqueness(u'a b c d', u'a b c e'), 2 / 3.0)
+
+    def test_minhash(self):
+        """Signatures are fixed-size arrays estimating similarity."""
+        minhash = similarity.MinHash(num_perm=256)
+        signature = minhash.signature(TEXT)
+        self.assertEquals(signature.typecode, 'I')
+        self.assertEquals(len(signature), 256)
+        self.assertEquals(signature, similarity.MinHash(256).signature(TEXT))
+
+        variation = TEXT.replace(u'lazy', u'sleepy')
+        exact = similarity.uniqueness(TEXT, variation)
+        results = minhash.compare(
+            TEXT, [TEXT, variation, minhash.signature(u'Something else')])
+        self.assertEquals(results[0], 0.0)
+        self.assertAlmostEqual(results[1], exact, delta=0.1)
+        self.assertEquals(results[2], 1.0)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_spin_unique(self, request):
+        """Quality is lowered until the variation is unique enough."""
+        def respond(url, data, timeout):
+            if 'quality=2' in url:
+                return u'A fast brown fox leaps over the idle dog by the ' \
+                       u'river shore.'
+            return data.replace('lazy', 'idle')
+        request.side_effect = respond
+
+        sc = SpinChimp('foo@bar.com', 'test_api_key')
+        text, score = similarity.spin_unique(
+            sc, TEXT, 0.5, params={'quality': '3'})
+        self.assertEquals(request.call_count, 2)
+        self.assertGreaterEqual(score, 0.5)
+        self.assertIn(u'leaps', text)
+
+        request.reset_mock()
+        request.side_effect = lambda url, data, timeout: data
+        text, score = similarity.spin_unique(sc, TEXT, 0.5, attempts=3)
+        self.assertEquals(request.call_count, 3)
+        self.assertEquals((text, score), (TEXT, 0.0))
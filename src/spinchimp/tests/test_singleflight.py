@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import exceptions as ex
+from spinchimp.singleflight import SingleFlight
+
+import threading
+import time
+import unittest2 as unittest
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def _run(self, group, key, func, results):
+        def target():
+            try:
+                results.append(group.do(key, func))
+            except ex.SpinChimpError as e:
+                results.append(e)
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread
+
+    def test_shared(self):
+        """Concurrent calls with the same key share one call."""
+        group = SingleFlight()
+        calls = []
+
+        def func():
+            calls.append(1)
+            time.sleep(0.05)
+            return u'foo'
+
+        results = []
+        threads = [self._run(group, 'a', func, results) for i in range(5)]
+        for thread in threads:
+            thread.join()
+        self.assertEquals(results, [u'foo'] * 5)
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(group.stats(), {'calls': 1, 'shared': 4})
+
+        # the key is released after the call
+        self.assertEquals(group.do('a', lambda: u'bar'), u'bar')
+
+    def test_exception(self):
+        """Every caller gets the exception."""
+        group = SingleFlight()
+
+        def func():
+            time.sleep(0.05)
+            raise ex.NetworkError('timed out')
+
+        results = []
+        threads = [self._run(group, 'a', func, results) for i in range(3)]
+        for thread in threads:
+            thread.join()
+        self.assertEquals(len(results), 3)
+        for result in results:
+            self.assertIsInstance(result, ex.NetworkError)
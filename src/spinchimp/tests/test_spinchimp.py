@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 
 from spinchimp import SpinChimp
+from spinchimp import SpinProfile
+from spinchimp.cache import LRUCache
+from spinchimp.retry import RetryPolicy
+from spinchimp.scheduler import QuotaScheduler
 from spinchimp import exceptions as ex
 
 import unittest2 as unittest
 import mock
+import time
 
 
 class TestApi(unittest.TestCase):
@@ -25,12 +30,12 @@ class TestApi(unittest.TestCase):
         self.assertEquals(self.sc._aid, 'test_api_name')
         self.assertIsInstance(self.sc, SpinChimp)
 
-    @mock.patch('spinchimp.urllib2')
-    def test_unique_variation_default_call(self, urllib2):
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_unique_variation_default_call(self, request):
         """Test call of unique_variation() with default values."""
         # mock response from SpinChimp
         mocked_response = 'My cat is über cold.'
-        urllib2.urlopen.return_value.read.return_value = mocked_response
+        request.return_value = mocked_response
 
         # test call
         self.assertEquals(
@@ -38,12 +43,12 @@ class TestApi(unittest.TestCase):
             u'My cat is über cold.',
         )
 
-    @mock.patch('spinchimp.urllib2')
-    def test_text_with_spintax_default_call(self, urllib2):
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_text_with_spintax_default_call(self, request):
         """Test call of text_with_spintax_call() with default values."""
         # mock response from SpinChimp
         mocked_response = 'My cat is über {cold|cool}.'
-        urllib2.urlopen.return_value.read.return_value = mocked_response
+        request.return_value = mocked_response
 
         # test call
         self.assertEquals(
@@ -51,10 +56,10 @@ class TestApi(unittest.TestCase):
             u'My cat is über {cold|cool}.',
         )
 
-    @mock.patch('spinchimp.urllib2')
-    def test_errors(self, urllib2):
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_errors(self, request):
         mocked_response = 'failed:Credentials check result:InvalidEmail'
-        urllib2.urlopen.return_value.read.return_value = mocked_response
+        request.return_value = mocked_response
         with self.assertRaises(ex.AuthenticationError):
             self.sc._send_request(
                 'METHOD',
@@ -62,7 +67,7 @@ class TestApi(unittest.TestCase):
                 SpinChimp.DEFAULT_PARAMS_SPIN
             )
         mocked_response = 'failed:Credentials check result:MaxQueriesReached'
-        urllib2.urlopen.return_value.read.return_value = mocked_response
+        request.return_value = mocked_response
         with self.assertRaises(ex.QuotaLimitError):
             self.sc._send_request(
                 'METHOD',
@@ -70,7 +75,7 @@ class TestApi(unittest.TestCase):
                 SpinChimp.DEFAULT_PARAMS_SPIN
             )
         mocked_response = 'failed:Credentials check result:DatabaseFailure'
-        urllib2.urlopen.return_value.read.return_value = mocked_response
+        request.return_value = mocked_response
         with self.assertRaises(ex.InternalError):
             self.sc._send_request(
                 'METHOD',
@@ -78,7 +83,7 @@ class TestApi(unittest.TestCase):
                 SpinChimp.DEFAULT_PARAMS_SPIN
             )
         mocked_response = 'failed:There are no words in your article!'
-        urllib2.urlopen.return_value.read.return_value = mocked_response
+        request.return_value = mocked_response
         with self.assertRaises(ex.ArticleError):
             self.sc._send_request(
                 'METHOD',
@@ -86,10 +91,193 @@ class TestApi(unittest.TestCase):
                 SpinChimp.DEFAULT_PARAMS_SPIN
             )
         mocked_response = 'failed:Cars are foo!'
-        urllib2.urlopen.return_value.read.return_value = mocked_response
+        request.return_value = mocked_response
         with self.assertRaises(ex.UnknownError):
             self.sc._send_request(
                 'METHOD',
                 'Test text.',
                 SpinChimp.DEFAULT_PARAMS_SPIN
             )
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_spin_many(self, request):
+        """Test spin_many() returns results and errors in input order."""
+        def respond(url, data, timeout):
+            if not data:
+                return 'failed:There are no words in your article!'
+            return data.upper()
+        request.side_effect = respond
+
+        results = list(self.sc.spin_many(
+            [u'foo', u'', u'bar'], params={'quality': '3'}, mode='spintax'))
+        self.assertEquals(results[0], u'FOO')
+        self.assertIsInstance(results[1], ex.ArticleError)
+        self.assertEquals(results[2], u'BAR')
+
+        with self.assertRaises(ex.WrongParameterVal):
+            self.sc.spin_many([u'foo'], mode='foo')
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_params(self, request):
+        """Test params are sent with defaults and left unchanged."""
+        request.return_value = u'foo'
+        params = {'quality': u'3'}
+        self.sc.unique_variation(u'foo', params)
+        self.assertEquals(params, {'quality': u'3'})
+
+        url = request.call_args[0][0]
+        self.assertIn('quality=3', url)
+        self.assertIn('posmatch=3', url)
+        self.assertIn('rewrite=1', url)
+        self.assertIn('apikey=test_api_key', url)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_profile(self, request):
+        """Test a SpinProfile is accepted as params."""
+        request.return_value = u'foo'
+        profile = SpinProfile(quality='2')
+        self.sc.unique_variation(u'foo', profile)
+        self.sc.text_with_spintax(u'foo', profile)
+        urls = [call[0][0] for call in request.call_args_list]
+        self.assertIn(profile.variants['1'].query, urls[0])
+        self.assertIn(profile.variants['0'].query, urls[1])
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_local_protect(self, request):
+        """Test protected terms are replaced locally and restored."""
+        def respond(url, data, timeout):
+            self.assertIn('protectedterms=&', url)
+            self.assertIn('tagprotect=%5B%25%7C%25%5D', url)
+            self.assertEquals(data, 'My [%0%] is [%1%] cool.')
+            return u'My [%0%] is [%1%] cold.'
+        request.side_effect = respond
+
+        sc = SpinChimp('foo@bar.com', 'test_api_key', local_protect=True)
+        self.assertEquals(
+            sc.unique_variation(u'My cat is {über} cool.', {
+                'protectedterms': u'cat', 'tagprotect': '{|}'}),
+            u'My cat is {über} cold.',
+        )
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_cache(self, request):
+        """Test deterministic responses are served from cache."""
+        self.sc._cache = LRUCache()
+        request.return_value = 'My cat is über {cold|cool}.'
+
+        self.sc.text_with_spintax(u'My cat is über cool.')
+        self.sc.text_with_spintax(u'My cat is über cool.')
+        self.assertEquals(request.call_count, 1)
+
+        # random variations are never cached
+        self.sc.unique_variation(u'My cat is über cool.')
+        self.sc.unique_variation(u'My cat is über cool.')
+        self.assertEquals(request.call_count, 3)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_unspun_local(self, request):
+        """Test unspun() with local=True does not call the API."""
+        self.assertIn(
+            self.sc.unspun(u'My cat is über {cold|cool}.', local=True),
+            [u'My cat is über cold.', u'My cat is über cool.'],
+        )
+        self.assertEquals(
+            self.sc.unspun(u'{cold|cool}', dontincludeoriginal=1, local=True),
+            u'cool',
+        )
+        self.assertFalse(request.called)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_word_density_local(self, request):
+        """Test word_density() with local_density does not call the API."""
+        sc = SpinChimp('foo@bar.com', 'test_api_key', local_density=True)
+        self.assertEquals(
+            sc.word_density(u'cat, cat, dog'),
+            {'cat': '66.67', 'dog': '33.33'},
+        )
+        self.assertFalse(request.called)
+        with self.assertRaises(ex.WrongParameterVal):
+            sc.word_density(u'cat', minlength='foo')
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_chunked(self, request):
+        """Test chunked spinning learns the word limit from errors."""
+        def respond(url, data, timeout):
+            words = len(data.split())
+            if words > 2:
+                return 'failed:Article too long ({} words). Max is 2.'.format(
+                    words)
+            return data.upper()
+        request.side_effect = respond
+
+        self.assertEquals(
+            self.sc.unique_variation(u'One two.\n\nThree four five.',
+                                     chunked=True),
+            u'ONE TWO.\n\nTHREE FOUR FIVE.',
+        )
+        self.assertEquals(self.sc._max_words, 2)
+
+        with self.assertRaises(ex.ArticleError):
+            self.sc.unique_variation(u'One two three.')
+
+        # chunks that can not be split further are not sent
+        request.reset_mock()
+        with self.assertRaises(ex.ArticleError):
+            self.sc.unique_variation(
+                u'One New York City.', {'protectedterms': 'new york city'},
+                chunked=True)
+        self.assertFalse(request.called)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_chunked_rejected(self, request):
+        """The word limit is not lowered below the one the API states."""
+        request.return_value = \
+            'failed:Article too long (9 words). Max is 5.'
+        for i in range(3):
+            with self.assertRaises(ex.ArticleError):
+                self.sc.unique_variation(u'One two three.', chunked=True)
+        self.assertEquals(self.sc._max_words, 5)
+        self.assertEquals(request.call_count, 4)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_scheduler(self, request):
+        """Test requests are admitted by the quota scheduler."""
+        sc = SpinChimp('foo@bar.com', 'test_api_key',
+                       scheduler=QuotaScheduler())
+        request.side_effect = ['1', u'foo', u'bar']
+
+        self.assertEquals(sc.unique_variation(u'foo'), u'foo')
+        with self.assertRaises(ex.QuotaLimitError):
+            sc.unique_variation(u'bar')
+        self.assertEquals(request.call_count, 2)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_retry(self, request):
+        """Test transient errors are retried by the retry policy."""
+        sc = SpinChimp('foo@bar.com', 'test_api_key',
+                       retry=RetryPolicy(base_delay=0))
+        request.side_effect = [
+            ex.NetworkError('timed out'),
+            'failed:Credentials check result:DatabaseFailure',
+            u'foo',
+        ]
+        self.assertEquals(sc.unique_variation(u'foo'), u'foo')
+        self.assertEquals(request.call_count, 3)
+
+    @mock.patch('spinchimp.pool.ConnectionPool.request')
+    def test_single_flight(self, request):
+        """Test concurrent identical requests share one API call."""
+        sc = SpinChimp('foo@bar.com', 'test_api_key', single_flight=True)
+
+        def respond(url, data, timeout):
+            time.sleep(0.05)
+            return data
+        request.side_effect = respond
+
+        results = list(sc.spin_many([u'foo'] * 4, mode='spintax'))
+        self.assertEquals(results, [u'foo'] * 4)
+        self.assertEquals(request.call_count, 1)
+
+        # random variations are never shared
+        results = list(sc.spin_many([u'foo'] * 4, mode='unique'))
+        self.assertEquals(request.call_count, 5)
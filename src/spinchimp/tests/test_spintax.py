@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import exceptions as ex
+from spinchimp import spintax
+
+import unittest2 as unittest
+
+
+class TestSpintax(unittest.TestCase):
+
+    def test_parse(self):
+        """Nested groups are parsed, single alternatives are inlined."""
+        doc = spintax.parse(u'{a|{b|c} d}, {e}|f')
+        self.assertEquals(
+            doc.tree,
+            (((u'a',), (((u'b',), (u'c',)), u' d')), u', e|f'),
+        )
+
+    def test_parse_errors(self):
+        """Unbalanced braces raise SpintaxError."""
+        with self.assertRaises(ex.SpintaxError):
+            spintax.parse(u'{a|b')
+        with self.assertRaises(ex.SpintaxError):
+            spintax.parse(u'a|b}')
+
+    def test_variations(self):
+        """Variations are reproducible with a seed."""
+        doc = spintax.parse(u'{Hi|Hello} {world|{planet|globe} earth}!')
+        self.assertEquals(
+            list(doc.variations(10, seed=1)),
+            list(doc.variations(10, seed=1)),
+        )
+        self.assertEquals(
+            sorted(doc.variations(10, seed=1, unique=True)),
+            [u'Hello globe earth!', u'Hello planet earth!', u'Hello world!',
+             u'Hi globe earth!', u'Hi planet earth!', u'Hi world!'],
+        )
+
+    def test_dontincludeoriginal(self):
+        """Original (first) alternatives are never picked."""
+        doc = spintax.parse(u'{Hi|Hello} {world|{planet|globe} earth}!')
+        self.assertEquals(
+            set(doc.variations(20, dontincludeoriginal=True)),
+            set([u'Hello globe earth!']),
+        )
+
+    def test_reorderparagraphs(self):
+        """Paragraphs are shuffled, line breaks stay in place."""
+        text = spintax.spin(u'a\n\nb\nc', seed=3, reorderparagraphs=True)
+        self.assertEquals(sorted(text.split()), [u'a', u'b', u'c'])
+        self.assertEquals(text.count(u'\n'), 3)
+        self.assertEquals(text[1:3], u'\n\n')
+
+
+class TestEnumeration(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = spintax.parse(u'{Hi|Hello} {world|{planet|globe} earth}!')
+
+    def test_count(self):
+        """Count multiplies sequences and sums alternatives."""
+        self.assertEquals(self.doc.count(), 6)
+        self.assertEquals(self.doc.count(dontincludeoriginal=True), 1)
+        self.assertEquals(spintax.parse(u'no spintax').count(), 1)
+
+    def test_count_big(self):
+        """Counts are exact beyond machine integers."""
+        doc = spintax.parse(u'{a|b|c} ' * 100)
+        self.assertEquals(doc.count(), 3 ** 100)
+        self.assertEquals(doc.variation(3 ** 100 - 1), u'c ' * 100)
+
+    def test_variation(self):
+        """Indexes are decoded in the order of iteration."""
+        self.assertEquals(
+            [self.doc.variation(i) for i in range(6)],
+            list(self.doc),
+        )
+        self.assertEquals(self.doc.variation(2), u'Hi globe earth!')
+        with self.assertRaises(IndexError):
+            self.doc.variation(6)
+
+    def test_iterate(self):
+        """Ranges of variations do not overlap."""
+        self.assertEquals(
+            list(self.doc.iterate(0, 3)) + list(self.doc.iterate(3)),
+            list(self.doc),
+        )
+        self.assertEquals(len(set(self.doc)), 6)
+        self.assertEquals(
+            list(self.doc.iterate(dontincludeoriginal=True)),
+            [u'Hello globe earth!'],
+        )
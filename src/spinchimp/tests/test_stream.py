@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import SpinChimp
+from spinchimp import exceptions as ex
+from spinchimp import metrics
+from spinchimp import stream
+from spinchimp.testing import FakeServer
+
+import io
+import mmap
+import tempfile
+import unittest2 as unittest
+
+
+class TestStream(unittest.TestCase):
+
+    def test_length(self):
+        """Remaining bytes of strings and seekable files are known."""
+        self.assertEquals(stream.length('foo'), 3)
+        data = io.BytesIO('foo bar')
+        data.read(4)
+        self.assertEquals(stream.length(data), 3)
+        self.assertEquals(data.read(), 'bar')
+        self.assertIsNone(stream.length(iter(['foo'])))
+
+    def test_position(self):
+        self.assertEquals(stream.position(io.BytesIO('foo')), 0)
+        self.assertIsNone(stream.position(iter(['foo'])))
+
+    def test_blocks(self):
+        """Files are read in blocks, unicode blocks are encoded."""
+        self.assertEquals(list(stream.blocks(io.BytesIO('abcde'), 2)),
+                          ['ab', 'cd', 'e'])
+        self.assertEquals(list(stream.blocks([u'ü', '', 'b'])),
+                          ['\xc3\xbc', 'b'])
+
+    def test_decoder(self):
+        """Multi-byte characters split between blocks are decoded."""
+        output = io.StringIO()
+        decoder = stream.ResponseDecoder(output)
+        data = u'My cat is über cool.'.encode('utf-8')
+        for i in xrange(len(data)):
+            decoder.write(data[i])
+        self.assertEquals(decoder.close(), '')
+        self.assertEquals(output.getvalue(), u'My cat is über cool.')
+        self.assertEquals(decoder.size, len(data))
+
+    def test_decoder_short(self):
+        output = io.StringIO()
+        decoder = stream.ResponseDecoder(output)
+        decoder.write('OK')
+        self.assertEquals(decoder.close(), '')
+        self.assertEquals(output.getvalue(), u'OK')
+
+    def test_decoder_failed(self):
+        """Error responses are kept, not written to output."""
+        output = io.StringIO()
+        decoder = stream.ResponseDecoder(output)
+        for block in ('Fail', 'ed:No Email', ' specified'):
+            decoder.write(block)
+        self.assertEquals(decoder.close(), 'Failed:No Email specified')
+        self.assertEquals(output.getvalue(), u'')
+
+
+class TestSpinStream(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer(seed=1).start()
+        self.collector = metrics.MetricsCollector()
+        self.sc = SpinChimp('foo@bar.com', 'test_api_key',
+                            hooks=[self.collector])
+        self.sc.URL = self.server.url
+
+    def tearDown(self):
+        self.sc._pool.clear()
+        self.server.stop()
+
+    def test_file(self):
+        """Articles are sent from memory-mapped files."""
+        with tempfile.TemporaryFile() as f:
+            f.write(u'My cat is über cool.'.encode('utf-8'))
+            f.flush()
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            output = io.StringIO()
+            self.assertIsNone(
+                self.sc.spin_stream(source, output, mode='spintax'))
+            source.close()
+        self.assertEquals(output.getvalue(),
+                          u'My cat is {über|rebü} {cool|looc}.')
+
+        stats = self.collector.stats()['GlobalSpin']
+        self.assertEquals(stats['request_bytes'], 21)
+        self.assertEquals(stats['response_bytes'], 36)
+
+    def test_iterable(self):
+        """Bodies of unknown length are sent with chunked encoding."""
+        output = io.StringIO()
+        self.sc.spin_stream((p for p in [u'My cat ', u'is cool.']), output,
+                            mode='spintax')
+        self.assertEquals(output.getvalue(), u'My cat is {cool|looc}.')
+
+        # the connection is still usable
+        self.assertEquals(self.sc.text_with_spintax(u'cool'), u'{cool|looc}')
+
+    def test_error(self):
+        """API errors are raised, nothing is written to output."""
+        output = io.StringIO()
+        with self.assertRaises(ex.ArticleError):
+            self.sc.spin_stream(io.BytesIO(''), output)
+        self.assertEquals(output.getvalue(), u'')
+
+        with self.assertRaises(ex.WrongParameterVal):
+            self.sc.spin_stream(io.BytesIO(''), output, mode='foo')
+
+    def test_reconnect(self):
+        """Seekable bodies are sent again over a fresh connection."""
+        self.sc.text_with_spintax(u'cool')
+        for key, idle in self.sc._pool._idle.items():
+            for last_used, conn in idle:
+                conn.sock.close()
+
+        output = io.StringIO()
+        source = io.BytesIO('My cat is cool.')
+        self.sc.spin_stream(source, output, mode='spintax')
+        self.assertEquals(output.getvalue(), u'My cat is {cool|looc}.')
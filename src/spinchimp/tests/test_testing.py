@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+from spinchimp import SpinChimp
+from spinchimp import benchmark
+from spinchimp import exceptions as ex
+from spinchimp.testing import FakeServer
+
+import mock
+import time
+import unittest2 as unittest
+
+try:
+    import trollius
+except ImportError:  # pragma: no cover
+    trollius = None
+
+
+class TestFakeServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer(seed=1).start()
+        self.sc = SpinChimp('foo@bar.com', 'test_api_key')
+        self.sc.URL = self.server.url
+
+    def tearDown(self):
+        self.sc._pool.clear()
+        self.server.stop()
+
+    def test_methods(self):
+        """All API methods are emulated."""
+        self.assertEquals(self.sc.text_with_spintax(u'My cat is über cool.'),
+                          u'My cat is {über|rebü} {cool|looc}.')
+        self.assertIn(self.sc.unique_variation(u'Cool cat.'),
+                      [u'Cool cat.', u'looC cat.'])
+        self.assertEquals(self.sc.unspun(u'{cat|dog}', 1), u'dog')
+        self.assertEquals(self.sc.word_density(u'cat cat dog'),
+                          {'cat': '66.67', 'dog': '33.33'})
+        self.assertEquals(self.sc.quota_left_total(), u'100000')
+        self.assertEquals(self.sc.quota_all()['Remaining'], u'100000')
+        self.assertEquals(self.server.requests, 6)
+        with mock.patch.object(SpinChimp, 'URL', self.server.url):
+            self.assertEquals(SpinChimp.test_connection(self.sc._pool), 'OK')
+
+    def test_errors(self):
+        """Errors are reported as the API does."""
+        with self.assertRaises(ex.ArticleError):
+            self.sc.text_with_spintax(u'')
+        self.server.max_words = 2
+        with self.assertRaises(ex.ArticleError) as e:
+            self.sc.text_with_spintax(u'one two three')
+        self.assertEquals(e.exception.max_words, 2)
+        with self.assertRaises(ex.AuthenticationError):
+            sc = SpinChimp('', 'test_api_key')
+            sc.URL = self.server.url
+            sc.quota_all()
+
+        self.server.quota = 1
+        self.sc.text_with_spintax(u'foo')
+        with self.assertRaises(ex.QuotaLimitError):
+            self.sc.text_with_spintax(u'foo')
+
+        self.server.error_rate = 1.0
+        with self.assertRaises(ex.InternalError):
+            self.sc.quota_all()
+
+    def test_stop_open_connection(self):
+        """Handlers of connections clients keep alive end on stop()."""
+        server = FakeServer().start()
+        self.sc.URL = server.url
+        self.sc.text_with_spintax(u'foo')
+        self.assertEquals(len(server._server.connections), 1)
+        server.stop()
+        for i in xrange(100):
+            if not server._server.connections:
+                break
+            time.sleep(0.01)
+        self.assertEquals(server._server.connections, set())
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run(self):
+        """Every mode reports throughput and latency."""
+        with FakeServer() as server:
+            modes = [m for m in benchmark.MODES if trollius or m != 'async']
+            for mode in modes:
+                result = benchmark.run(mode, server, requests=10,
+                                       concurrency=2)
+                self.assertEquals(result['mode'], mode)
+                self.assertGreater(result['rps'], 0)
+                self.assertLessEqual(result['p50'], result['p99'])
+            self.assertEquals(server.requests, 10 * len(modes))
+
+    def test_run_isolated(self):
+        """A mode runs in a child process of its own."""
+        with FakeServer() as server:
+            result = benchmark.run('pooled', server, requests=5,
+                                   isolated=True)
+            self.assertEquals(result['requests'], 5)
+            self.assertGreater(result['max_rss'], 0)
+            self.assertEquals(server.requests, 5)